@@ -0,0 +1,42 @@
+"""added indexes for auth lookups: users.idempotency_key, lower(users.email), lower(users.username)
+
+Revision ID: 3c9b5e2f7a41
+Revises: 6314522737de
+Create Date: 2026-10-19 10:12:41.203517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9b5e2f7a41'
+down_revision: Union[str, None] = '6314522737de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # build the indexes without locking users against writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_idempotency_key', 'users', ['idempotency_key'],
+                        unique=True, schema='public',
+                        postgresql_concurrently=True)
+        op.create_index('ix_users_lower_email', 'users', [sa.text('lower(email)')],
+                        unique=False, schema='public',
+                        postgresql_concurrently=True)
+        op.create_index('ix_users_lower_username', 'users', [sa.text('lower(username)')],
+                        unique=False, schema='public',
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_lower_username', table_name='users',
+                      schema='public', postgresql_concurrently=True)
+        op.drop_index('ix_users_lower_email', table_name='users',
+                      schema='public', postgresql_concurrently=True)
+        op.drop_index('ix_users_idempotency_key', table_name='users',
+                      schema='public', postgresql_concurrently=True)
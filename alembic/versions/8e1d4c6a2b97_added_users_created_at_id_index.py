@@ -0,0 +1,32 @@
+"""added users (created_at, id) index for keyset pagination
+
+Revision ID: 8e1d4c6a2b97
+Revises: 3c9b5e2f7a41
+Create Date: 2026-10-19 11:02:17.518930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1d4c6a2b97'
+down_revision: Union[str, None] = '3c9b5e2f7a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # build the index without locking users against writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'],
+                        unique=False, schema='public',
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_created_at_id', table_name='users',
+                      schema='public', postgresql_concurrently=True)
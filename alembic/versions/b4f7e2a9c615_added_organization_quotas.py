@@ -0,0 +1,42 @@
+"""added users organization_id and organizations requests_per_minute
+
+Revision ID: b4f7e2a9c615
+Revises: 8e1d4c6a2b97
+Create Date: 2026-10-19 14:26:03.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f7e2a9c615'
+down_revision: Union[str, None] = '8e1d4c6a2b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('organizations', sa.Column('requests_per_minute', sa.Integer(), nullable=True), schema='public')
+    op.add_column('users', sa.Column('organization_id', sa.String(), nullable=True), schema='public')
+    op.create_foreign_key('users_organization_id_fkey', 'users', 'organizations',
+                          ['organization_id'], ['id'], source_schema='public',
+                          referent_schema='public', ondelete='SET NULL')
+    # build the index without locking users against writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_organization_id', 'users', ['organization_id'],
+                        unique=False, schema='public',
+                        postgresql_where=sa.text('organization_id IS NOT NULL'),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_organization_id', table_name='users',
+                      schema='public', postgresql_concurrently=True)
+    op.drop_constraint('users_organization_id_fkey', 'users', schema='public',
+                       type_='foreignkey')
+    op.drop_column('users', 'organization_id', schema='public')
+    op.drop_column('organizations', 'requests_per_minute', schema='public')
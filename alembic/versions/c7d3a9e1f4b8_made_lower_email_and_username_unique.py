@@ -0,0 +1,69 @@
+"""made lower(users.email) and lower(users.username) unique
+
+Revision ID: c7d3a9e1f4b8
+Revises: b4f7e2a9c615
+Create Date: 2026-10-20 09:41:17.530942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3a9e1f4b8'
+down_revision: Union[str, None] = 'b4f7e2a9c615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOWER_INDEXES = (
+    ('ix_users_lower_email', 'email'),
+    ('ix_users_lower_username', 'username'),
+)
+
+
+def check_duplicates(column: str) -> None:
+    """
+    Fails the upgrade if users differ only by the case of a column, those
+    accounts have to be merged or renamed by hand first.
+    """
+    duplicates = op.get_bind().execute(sa.text(
+        f'SELECT lower({column}), array_agg(id) FROM public.users '
+        f'GROUP BY lower({column}) HAVING count(*) > 1 LIMIT 20'
+    )).all()
+    if duplicates:
+        listed = '; '.join(f'{value}: {", ".join(ids)}'
+                           for value, ids in duplicates)
+        raise RuntimeError(
+            f'users with a {column} that differs only by case: {listed}'
+        )
+
+
+def replace_index(name: str, column: str, unique: bool) -> None:
+    """
+    Builds the new index next to the old one and swaps it in by name, so
+    logins are served by an index throughout.
+    """
+    op.create_index(f'{name}_new', 'users', [sa.text(f'lower({column})')],
+                    unique=unique, schema='public',
+                    postgresql_concurrently=True)
+    op.drop_index(name, table_name='users', schema='public',
+                  postgresql_concurrently=True)
+    op.execute(f'ALTER INDEX public.{name}_new RENAME TO {name}')
+
+
+def upgrade() -> None:
+    for _, column in LOWER_INDEXES:
+        check_duplicates(column)
+    # build the indexes without locking users against writes, a user
+    # registered meanwhile that clashes fails the build and is reported
+    with op.get_context().autocommit_block():
+        for name, column in LOWER_INDEXES:
+            replace_index(name, column, unique=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, column in LOWER_INDEXES:
+            replace_index(name, column, unique=False)
@@ -0,0 +1,25 @@
+import hmac
+from typing import Annotated, Optional
+from fastapi import Header, HTTPException, status
+
+from api.utils.settings import settings
+
+INTERNAL_API_KEYS = [
+    key.strip() for key in settings.INTERNAL_API_KEYS.split(',')
+    if key.strip()
+]
+
+
+async def require_internal_api_key(
+        x_internal_api_key: Annotated[Optional[str], Header()] = None):
+    """
+    Dependency allowing only internal services that send a known API key.
+    """
+    if x_internal_api_key:
+        for key in INTERNAL_API_KEYS:
+            if hmac.compare_digest(x_internal_api_key.encode(), key.encode()):
+                return
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail='Internal API key required'
+    )
@@ -1,47 +1,247 @@
+import time
 import asyncio
-from typing import AsyncIterator
+import random
+from uuid import uuid4
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from sqlalchemy.orm import (
     DeclarativeBase,
+    Session,
 )
 
-from sqlalchemy import MetaData, pool
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import MetaData, event, pool, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
+    AsyncEngine,
     AsyncSession,
     async_scoped_session,
     AsyncAttrs
 )
 from api.utils.settings import settings
+from api.utils.metrics import metrics
 
 # Create an asynchronous engine with future usage enabled
 class Base(AsyncAttrs, DeclarativeBase):
     metadata = MetaData(schema='public')
 
 DB_URL: str = settings.DB_URL
-engine = create_async_engine(
-    url=DB_URL,
-    future=True,
-    poolclass=pool.AsyncAdaptedQueuePool,
-    # The number of permanent connections to keep in the pool.
-    # This determines the base number of connections that will be created and maintained.
-    pool_size=5,
-    # The maximum number of connections that can be created 
-    # over and above the pool_size when all connections are in use.
-    max_overflow=10,
-    # The maximum time to wait for a connection from the pool if all 
-    # connections are busy before raising an error.
-    pool_timeout=30,
-    # Time in seconds to recycle (reconnect) a connection.
-    # This is useful to avoid issues with idle connections being closed by the database.
-    pool_recycle=18000
+DB_REPLICA_URLS: List[str] = [url.strip() for url in
+                              settings.DB_REPLICA_URLS.split(',') if url.strip()]
+# seconds a replica's replay is behind the primary, 0 when it is caught up
+REPLICA_LAG_QUERY = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
 )
+ENGINE_PROFILES = ('direct', 'pgbouncer', 'test')
+
+
+class InstrumentedQueuePool(pool.AsyncAdaptedQueuePool):
+    """
+    Queue pool that exports how long checkouts wait, how many connections
+    are checked out and how much of the overflow is in use.
+    """
+    # names the pool's metrics, set by build_engine
+    metrics_name: str = 'primary'
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            metrics.increment(f'db_pool_{self.metrics_name}_timeouts_total')
+            raise
+        finally:
+            metrics.observe(f'db_pool_{self.metrics_name}_checkout_wait_seconds',
+                            time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() replaces the pool with a new one of this class
+        new_pool = super().recreate()
+        new_pool.metrics_name = self.metrics_name
+        return new_pool
+
+    def record_usage(self) -> None:
+        """
+        Sets the checked out and overflow gauges.
+        """
+        metrics.set_gauge(f'db_pool_{self.metrics_name}_checked_out',
+                          self.checkedout())
+        # overflow() is negative while the pool is not full yet
+        metrics.set_gauge(f'db_pool_{self.metrics_name}_overflow',
+                          max(self.overflow(), 0))
+
+
+def engine_options(profile: str) -> Tuple[int, Dict]:
+    """
+    Gets the prepared statement cache size and engine arguments of a profile.
+
+    Profiles:
+        direct: a pool of connections straight to postgres.
+        pgbouncer: the same pool behind PgBouncer in transaction mode, where
+            a connection may change server between transactions, so no
+            statement is prepared under a reused name.
+        test: no pool, every checkout opens a new connection.
+    """
+    options: Dict = {'pool_pre_ping': bool(settings.DB_POOL_PRE_PING)}
+    if profile == 'test':
+        return settings.DB_STATEMENT_CACHE_SIZE, {**options,
+                                                  'poolclass': pool.NullPool}
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f'DB_ENGINE_PROFILE must be one of '
+                         f'{", ".join(ENGINE_PROFILES)}, got {profile}')
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        # The number of permanent connections to keep in the pool.
+        pool_size=settings.DB_POOL_SIZE,
+        # The maximum number of connections that can be created
+        # over and above the pool_size when all connections are in use.
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        # The maximum time to wait for a connection from the pool if all
+        # connections are busy before raising an error.
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        # Time in seconds to recycle (reconnect) a connection, so idle
+        # connections closed by the database are not used.
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+    if profile == 'pgbouncer':
+        options['connect_args'] = {
+            'statement_cache_size': 0,
+            'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__'
+        }
+        return 0, options
+    return settings.DB_STATEMENT_CACHE_SIZE, options
+
+
+def build_engine(url: str, name: str = 'primary') -> AsyncEngine:
+    """
+    Creates an asynchronous engine for the primary or a replica with the
+    DB_ENGINE_PROFILE settings.
+    """
+    statement_cache_size, options = engine_options(settings.DB_ENGINE_PROFILE)
+    async_engine = create_async_engine(
+        url=make_url(url).update_query_dict({
+            # keep the prepared statements of every hot query per connection
+            'prepared_statement_cache_size': str(statement_cache_size)
+        }),
+        future=True,
+        **options
+    )
+    sync_engine = async_engine.sync_engine
+    if isinstance(sync_engine.pool, InstrumentedQueuePool):
+        sync_engine.pool.metrics_name = name
+
+        # the engine's pool events carry over to a recreated pool
+        def record_usage(*args) -> None:
+            sync_engine.pool.record_usage()
+
+        event.listen(sync_engine, 'checkout', record_usage)
+        event.listen(sync_engine, 'checkin', record_usage)
+    return async_engine
+
+
+class ReplicaSet:
+    """
+    Read replica engines and how far each lags behind the primary.
+
+    A replica is only used while its last measured lag is within max_lag,
+    so reads fall back to the primary when replicas are behind or down.
+    """
+    def __init__(self, urls: List[str], max_lag: float):
+        self.engines: List[AsyncEngine] = [
+            build_engine(url, f'replica{index}') for index, url in enumerate(urls)
+        ]
+        self.max_lag = max_lag
+        # unknown until the first check
+        self._lags: List[float] = [float('inf')] * len(self.engines)
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """
+        Picks a replica that is caught up, or None.
+        """
+        caught_up = [engine for engine, lag in zip(self.engines, self._lags)
+                     if lag <= self.max_lag]
+        return random.choice(caught_up) if caught_up else None
+
+    async def check_lag(self) -> None:
+        """
+        Measures the lag of every replica.
+        """
+        for index, engine in enumerate(self.engines):
+            try:
+                async with engine.connect() as conn:
+                    lag = await conn.scalar(REPLICA_LAG_QUERY)
+                self._lags[index] = float(lag or 0)
+            except (OSError, SQLAlchemyError) as exc:
+                print(f'replica {index} unavailable: {exc}')
+                self._lags[index] = float('inf')
+
+    async def monitor(self, interval: int) -> None:
+        """
+        Measures replica lag every interval seconds.
+        """
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(interval)
+
+    async def dispose(self) -> None:
+        """
+        Closes the replica connection pools.
+        """
+        for engine in self.engines:
+            await engine.dispose()
+
+
+engine = build_engine(DB_URL)
+replica_set = ReplicaSet(DB_REPLICA_URLS, settings.DB_REPLICA_MAX_LAG)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain reads to a caught up replica.
+
+    Flushes, DML, locking reads and raw SQL go to the primary, and after
+    any of them every later read of the session goes to the primary too,
+    so a request always reads its own writes.
+    """
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.info.get('pinned'):
+            is_read = (
+                not self._flushing
+                and getattr(clause, 'is_select', False)
+                and getattr(clause, '_for_update_arg', None) is None
+            )
+            if is_read:
+                replica = replica_set.choose()
+                if replica is not None:
+                    return replica.sync_engine
+                return engine.sync_engine
+            # writes and anything else that may write pin the session
+            self.info['pinned'] = True
+        return engine.sync_engine
+
+
+def pin_to_primary(session: AsyncSession) -> None:
+    """
+    Sends every later query of a session to the primary.
+    """
+    session.info['pinned'] = True
+
+
+def reads_from_replica(session: AsyncSession) -> bool:
+    """
+    Returns True if the next read of a session may go to a replica.
+    """
+    return bool(replica_set.engines) and not session.info.get('pinned')
+
 
 # Create an asynchronous session factory
 async_session_factory = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     autoflush=False,
     expire_on_commit=False
 )
@@ -59,18 +259,51 @@ async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+def has_writes(session: AsyncSession) -> bool:
+    """
+    Returns True if a session has changes to commit.
+    """
+    # DML and locking reads pin a session to the primary, so a session
+    # that is not pinned and has no pending objects only read
+    return bool(session.info.get('pinned') or session.new
+                or session.dirty or session.deleted)
+
+
+async def release_db(session: AsyncSession) -> None:
+    """
+    Ends a session's database work and returns its connection to the pool.
+
+    The transaction is committed only if the session wrote, a read-only
+    transaction is just closed, and a session that never ran a query never
+    held a connection. Handlers call it once their queries are done so the
+    connection is free while the response is built; calling it again is a
+    no-op.
+    """
+    try:
+        if has_writes(session):
+            await session.commit()
+    except SQLAlchemyError:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
 async def get_db() -> AsyncIterator[AsyncSession]:
     """
     Dependency to provide a database session for each request.
-    Handles session lifecycle including commit and rollback.
+
+    The session checks out a connection on its first query, so requests
+    rejected before touching the database never take a pool slot. It is
+    committed only if it wrote, and rolled back if the request failed.
     """
-    async with AsyncScopedSession() as session:
-        try:
-            yield session
-            await session.commit()
-        except SQLAlchemyError:
-            await session.rollback()
-            raise
-        finally:
-            await AsyncScopedSession.remove()
-            await session.aclose()
+    session = AsyncScopedSession()
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    else:
+        await release_db(session)
+    finally:
+        await AsyncScopedSession.remove()
@@ -8,15 +8,15 @@ from datetime import datetime, timezone, timedelta
 from redis.lock import Lock
 import time
 import asyncio
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.db.redis_database import get_redis_sync
 from api.db.rabbitmq_database import get_rabbitmq_sync
 from api.utils.settings import settings
-from api.v1.models import User
+from api.v1.repositories import user_repository
 from api.db.database import get_db
 from api.utils.settings import settings
+from api.utils.user_cache import user_cache
 
 # RabbitMQ configuration constants
 EXCHANGE_NAME = 'login_attempt_exchange'
@@ -70,14 +70,13 @@ async def handle_lockout(user_id: str, db: AsyncSession):
                                +
                                timedelta(seconds=INITIAL_LOCKOUT_DURATION))
         
-        stmt = select(User).where(User.id == user_id).with_for_update()
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
+        user = await user_repository.get_lockout_state(db, user_id)
 
         if user and not user.is_blocked and not user.lockout_expires_at:
-            user.is_blocked = True
-            user.lockout_expires_at = lockout_expires_at
+            await user_repository.set_lockout(db, user_id, blocked=True,
+                                              expires_at=lockout_expires_at)
             await db.commit()
+            user_cache.invalidate(user_id)
             return
         elif user and user.is_blocked and user.lockout_expires_at:
             if attemtps_count % 5 == 0:
@@ -89,11 +88,18 @@ async def handle_lockout(user_id: str, db: AsyncSession):
             reset_failed_attempts(user_id)
 
 
+def failed_attempts_key(user_id: str) -> str:
+    """
+    Gets the redis key of a user's failed attempts count
+    """
+    return f'login_attempts:{user_id}'
+
+
 def increment_failed_attemps(user_id: str):
     """
     Increment failed attempts count
     """
-    key = f'login_attempts:{user_id}'
+    key = failed_attempts_key(user_id)
     lock_name = f'Lock_{user_id}'
 
     with get_redis_sync() as redis:
@@ -114,7 +120,7 @@ def get_failed_attempts(user_id: str):
     """
     Retrieve the count of failed attempts
     """
-    key = f'login_attempts:{user_id}'
+    key = failed_attempts_key(user_id)
     with get_redis_sync() as redis:
         attempts = redis.get(key)
         return int(attempts) if attempts else 0
@@ -124,21 +130,19 @@ async def set_new_lockout(user_id: str, penalty_duration: int, db: AsyncSession)
     Set new penalty duration for failed attempts.
     """
     now = datetime.now(timezone.utc)
-    stmt = select(User).where(
-        User.id == user_id
-    ).with_for_update()
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
-    if user:
-        user.lockout_expires_at = now + timedelta(minutes=penalty_duration)
-        user.is_blocked = True
-        await db.commit()
+    blocked = await user_repository.set_lockout(
+        db, user_id, blocked=True,
+        expires_at=now + timedelta(minutes=penalty_duration)
+    )
+    await db.commit()
+    if blocked:
+        user_cache.invalidate(user_id)
 
 def reset_failed_attempts(user_id: str):
     """
     Reset the failed attempts count.
     """
-    key = f'login_attempts:{user_id}'
+    key = failed_attempts_key(user_id)
     with get_redis_sync() as redis:
         redis.delete(key)
 
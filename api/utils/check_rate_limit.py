@@ -1,7 +1,34 @@
 from fastapi import Request, HTTPException, status
+from redis.commands.core import Script
 from datetime import datetime, timezone, timedelta
 
 from api.db.redis_database import get_redis_sync
+from api.utils.organization_quotas import Quota
+
+# seconds an organization's request count is kept for
+ORGANIZATION_WINDOW = 60
+
+# Counts a request against an organization's quota and returns the
+# seconds until the count resets once the quota is used up.
+# KEYS: organization counter key
+# ARGV: organization limit, window
+CHARGE_ORGANIZATION = Script(None, b"""
+local used = redis.call('INCR', KEYS[1])
+if used == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+if used > tonumber(ARGV[1]) then
+    return redis.call('TTL', KEYS[1])
+end
+return false
+""")
+
+
+def organization_quota_key(organization_id: str) -> str:
+    """
+    Gets the redis key of an organization's request count.
+    """
+    return f'organization:{organization_id}:requests'
 
 
 def check_rate_limits_sync(request: Request):
@@ -29,3 +56,26 @@ def check_rate_limits_sync(request: Request):
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     detail=f'Too many requests, try again in {wait_minutes:2f} minutes'
                 )
+
+
+def check_organization_quota_sync(quota: Quota):
+    """counts an authenticated request against its organization's quota
+
+    Args:
+        quota: the (organization id, requests per minute) of the user,
+            from organization_quotas.quota_for.
+    """
+    if not quota:
+        return
+    organization_id, limit = quota
+    with get_redis_sync() as redis:
+        retry_after = CHARGE_ORGANIZATION(
+            keys=[organization_quota_key(organization_id)],
+            args=[limit, ORGANIZATION_WINDOW],
+            client=redis
+        )
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f'Organization request quota exceeded, try again in {retry_after} seconds'
+        )
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Disposable email domain module
+
+The domains are compiled from a text list, one domain per line, into a
+hash table file that every worker maps read-only, so the table lives once
+in the page cache instead of once per process. A domain blocks itself and
+all of its subdomains, a '*.domain' line only its subdomains.
+
+    python -m api.utils.disposable_domains <domains.txt> <domains.bin>
+
+The table stores a 62 bit fingerprint of each domain instead of the
+domain, 8 bytes a slot at most half full, in native byte order after a
+header of magic, entry count and slot count (a power of two). Each slot
+holds the fingerprint, an occupied bit and the subdomains-only flag.
+"""
+import os
+import sys
+import mmap
+import time
+import struct
+import tempfile
+import threading
+from zlib import adler32, crc32
+from typing import Dict, Iterable, Optional
+
+from api.utils.settings import settings
+
+MAGIC = b'DDB2'
+HEADER = struct.Struct('=4sII')
+# the entry only blocks subdomains of its domain
+SUBDOMAINS_ONLY = 1
+OCCUPIED = 2
+FLAG_BITS = 2
+
+
+def normalize_domain(domain: str) -> bytes:
+    """
+    Gets the lower-cased UTF-8 form of a domain, decoding punycode labels
+    the way email addresses are normalized.
+
+    Raises:
+        UnicodeError: if a punycode label is invalid.
+    """
+    domain = domain.lower()
+    if 'xn--' in domain:
+        domain = domain.encode('ascii').decode('idna')
+    return domain.encode()
+
+
+def fingerprint(key: bytes) -> int:
+    """
+    Gets the 64 bit fingerprint of a normalized domain, its low 32 bits
+    pick the slot.
+    """
+    return adler32(key) << 32 | crc32(key)
+
+
+def parse_domains(lines: Iterable[str]) -> Dict[bytes, int]:
+    """
+    Parses a domain list into keys and their flags, skipping blank lines,
+    '#' comments and domains that cannot be decoded.
+    """
+    domains: Dict[bytes, int] = {}
+    for line in lines:
+        line = line.split('#', 1)[0].strip().rstrip('.')
+        if not line:
+            continue
+        flags = 0
+        if line.startswith('*.'):
+            line, flags = line[2:], SUBDOMAINS_ONLY
+        try:
+            key = normalize_domain(line)
+        except UnicodeError:
+            print(f'skipping invalid domain: {line}')
+            continue
+        # a plain entry also covers the subdomains a wildcard would
+        domains[key] = domains.get(key, flags) & flags
+    return domains
+
+
+def build_database(domains: Dict[bytes, int]) -> bytes:
+    """
+    Compiles keys and flags into a database file.
+    """
+    slot_count = 1
+    while slot_count < len(domains) * 2:
+        slot_count *= 2
+    mask = slot_count - 1
+    slots = [0] * slot_count
+    for key, flags in sorted(domains.items()):
+        key_fingerprint = fingerprint(key)
+        slot = key_fingerprint & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = ((key_fingerprint >> FLAG_BITS << FLAG_BITS)
+                       | OCCUPIED | flags)
+    return (HEADER.pack(MAGIC, len(domains), slot_count)
+            + struct.pack(f'={slot_count}Q', *slots))
+
+
+def write_database(source_path: str, path: str) -> int:
+    """
+    Compiles a domain list into a database file, replacing it atomically.
+
+    Returns:
+        the number of domains written.
+    """
+    with open(source_path, encoding='utf-8') as source:
+        domains = parse_domains(source)
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as database:
+        database.write(build_database(domains))
+    os.replace(database.name, path)
+    return len(domains)
+
+
+class DomainTable:
+    """
+    A memory mapped database file.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as database:
+            self._mmap = mmap.mmap(database.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        magic, self.count, slot_count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or slot_count & (slot_count - 1) or \
+                len(self._mmap) != HEADER.size + 8 * slot_count:
+            raise ValueError(f'{path} is not a disposable domain database')
+        self._mask = slot_count - 1
+        self._slots = memoryview(self._mmap)[HEADER.size:].cast('Q')
+
+    def find(self, key: bytes) -> Optional[int]:
+        """
+        Gets the flags of a normalized domain, or None if it is not listed.
+        """
+        slots = self._slots
+        mask = self._mask
+        key_fingerprint = adler32(key) << 32 | crc32(key)
+        slot = key_fingerprint & mask
+        key_fingerprint >>= FLAG_BITS
+        while True:
+            value = slots[slot]
+            if not value:
+                return None
+            if value >> FLAG_BITS == key_fingerprint:
+                return value & SUBDOMAINS_ONLY
+            slot = (slot + 1) & mask
+
+
+class DisposableDomains:
+    """
+    Disposable email domains, reloaded by a background thread when the
+    database file changes.
+
+    The file is compiled from its source list when it is missing or older
+    than the list, off the request path. A lookup fingerprints the domain
+    and each parent domain, one or two table probes each.
+    """
+    def __init__(self, path: str, source_path: str, reload_interval: int):
+        self.path = path
+        self.source_path = source_path
+        self.reload_interval = reload_interval
+        self._table: Optional[DomainTable] = None
+        self._version: Optional[int] = None
+
+    def __contains__(self, domain: str) -> bool:
+        """
+        Returns True if the domain or a parent domain is disposable.
+
+        Raises:
+            RuntimeError: if no database was loaded.
+        """
+        table = self._table
+        if table is None:
+            # never let every domain through because a file is missing
+            raise RuntimeError(
+                f'no disposable domain database loaded from {self.path}'
+            )
+        try:
+            key = normalize_domain(domain)
+        except UnicodeError:
+            return False
+        find = table.find
+        if find(key) == 0:
+            return True
+        # every entry blocks the subdomains of its domain, top level
+        # domains are never listed
+        start = key.find(b'.') + 1
+        end = key.find(b'.', start)
+        while start and end != -1:
+            if find(key[start:]) is not None:
+                return True
+            start, end = end + 1, key.find(b'.', end + 1)
+        return False
+
+    def load(self) -> None:
+        """
+        Loads the database on startup.
+
+        Raises:
+            RuntimeError: if neither the database nor its source list
+                could be loaded.
+        """
+        self.reload()
+        if self._table is None:
+            raise RuntimeError(
+                f'no disposable domain database loaded from {self.path}'
+            )
+
+    def reload(self) -> None:
+        """
+        Maps the database file again if it changed, compiling it first
+        from the source list if that is newer.
+        """
+        try:
+            source_version = (os.stat(self.source_path).st_mtime_ns
+                              if os.path.exists(self.source_path) else None)
+            version = (os.stat(self.path).st_mtime_ns
+                       if os.path.exists(self.path) else None)
+            if source_version is not None and (version is None
+                                               or source_version > version):
+                write_database(self.source_path, self.path)
+                version = os.stat(self.path).st_mtime_ns
+            if version is None or version == self._version:
+                return
+            # lookups holding the old table finish with it, it is unmapped
+            # once nothing references it
+            self._table = DomainTable(self.path)
+            self._version = version
+        except (OSError, ValueError) as exc:
+            # keep the last table that loaded
+            print(f'error loading disposable domains: {exc}')
+
+    def run(self) -> None:
+        """
+        Reloads the database every reload interval.
+        """
+        while True:
+            time.sleep(self.reload_interval)
+            self.reload()
+
+    def start(self) -> Optional[threading.Thread]:
+        """
+        Starts reloading the database in a daemon thread, unless the
+        reload interval is 0.
+        """
+        if self.reload_interval <= 0:
+            return None
+        reloader = threading.Thread(
+            target=self.run,
+            name='disposable-domains-reload',
+            daemon=True
+        )
+        reloader.start()
+        return reloader
+
+
+# create a process wide instance of the DisposableDomains class
+disposable_domains = DisposableDomains(
+    path=settings.DISPOSABLE_DOMAINS_PATH,
+    source_path=settings.DISPOSABLE_DOMAINS_SOURCE,
+    reload_interval=settings.DISPOSABLE_DOMAINS_RELOAD_INTERVAL
+)
+
+
+# Build a database: python -m api.utils.disposable_domains <domains.txt> <domains.bin>
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print('usage: python -m api.utils.disposable_domains <domains.txt> <domains.bin>')
+        sys.exit(1)
+    count = write_database(sys.argv[1], sys.argv[2])
+    print(f'wrote {count} domains to {sys.argv[2]}')
@@ -1,7 +1,163 @@
-import dns.resolver
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import aiodns
+from aiodns.error import DNSError
+from pycares.errno import ARES_ENODATA, ARES_ENOTFOUND
 from fastapi import HTTPException, status
 
 from api.db.redis_database import get_redis_sync
+from api.utils.settings import settings
+
+# answers that prove a domain has no mail servers, other errors are retried
+NO_MX_ERRORS = (ARES_ENODATA, ARES_ENOTFOUND)
+NO_MX_MESSAGE = 'Email domain does not have valid MX records.'
+
+
+def mx_cache_key(domain: str) -> str:
+    """
+    Gets the redis key of a domain's cached MX result.
+    """
+    return f'mx_{domain}'
+
+
+class MXResolver:
+    """
+    Checks email domains for MX records without blocking the event loop.
+
+    Results are kept in a bounded in-process LRU in front of the shared
+    mx_{domain} redis keys, both expiring with the TTL of the DNS answer.
+    Concurrent checks of a domain that is not cached share one query.
+    """
+    def __init__(self, max_size: int, min_ttl: int, max_ttl: int,
+                 negative_ttl: int, timeout: float):
+        self.max_size = max_size
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[bool, float]] = OrderedDict()
+        self._lookups: Dict[str, asyncio.Task] = {}
+        self._resolver: Optional[aiodns.DNSResolver] = None
+
+    async def has_mx(self, domain: str) -> bool:
+        """
+        Returns True if a domain has at least one mail server.
+
+        Raises:
+            DNSError: if the domain could not be checked.
+        """
+        deliverable = self._get_local(domain)
+        if deliverable is not None:
+            return deliverable
+        lookup = self._lookups.get(domain)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._lookup(domain))
+            self._lookups[domain] = lookup
+            lookup.add_done_callback(
+                lambda _: self._lookups.pop(domain, None)
+            )
+        # shield the shared lookup from a waiting request being cancelled
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, domain: str) -> bool:
+        """
+        Checks redis, then DNS, and caches the result in both.
+        """
+        key = mx_cache_key(domain)
+        try:
+            with get_redis_sync() as redis:
+                cached = redis.get(key)
+                ttl = redis.ttl(key) if cached else None
+        except Exception as exc:
+            print(f'error reading cached MX result: {exc}')
+            cached = ttl = None
+        if cached in ('0', '1'):
+            deliverable = cached == '1'
+            self._set_local(domain, deliverable,
+                            ttl if ttl and ttl > 0 else self.min_ttl)
+            return deliverable
+
+        try:
+            answers = await self._get_resolver().query(domain, 'MX')
+            # a null MX (RFC 7505) says the domain accepts no mail
+            deliverable = any(answer.host not in ('', '.')
+                              for answer in answers)
+            ttl = min((answer.ttl for answer in answers),
+                      default=self.negative_ttl)
+            ttl = max(self.min_ttl, min(ttl, self.max_ttl))
+        except DNSError as exc:
+            if exc.args[0] not in NO_MX_ERRORS:
+                raise
+            deliverable = False
+            ttl = self.negative_ttl
+        if not deliverable:
+            print(f"Domain not found or no answer for DNS query:  {domain}")
+
+        self._set_local(domain, deliverable, ttl)
+        try:
+            with get_redis_sync() as redis:
+                redis.set(key, '1' if deliverable else '0', ex=ttl)
+        except Exception as exc:
+            print(f'error caching MX result: {exc}')
+        return deliverable
+
+    def _get_resolver(self) -> aiodns.DNSResolver:
+        """
+        Gets a resolver bound to the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._resolver is None or self._resolver.loop is not loop:
+            self._resolver = aiodns.DNSResolver(loop=loop, timeout=self.timeout,
+                                                tries=1)
+        return self._resolver
+
+    def _get_local(self, domain: str) -> Optional[bool]:
+        """
+        Returns the in-process result of a domain, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return None
+            deliverable, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[domain]
+                return None
+            self._entries.move_to_end(domain)
+            return deliverable
+
+    def _set_local(self, domain: str, deliverable: bool, ttl: int) -> None:
+        """
+        Caches the result of a domain in-process.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[domain] = (deliverable, time.monotonic() + ttl)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drops every in-process result.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# create a process wide MX resolver
+mx_resolver = MXResolver(
+    max_size=settings.MX_CACHE_SIZE,
+    min_ttl=settings.MX_CACHE_MIN_TTL,
+    max_ttl=settings.MX_CACHE_MAX_TTL,
+    negative_ttl=settings.MX_CACHE_NEGATIVE_TTL,
+    timeout=settings.MX_LOOKUP_TIMEOUT
+)
 
 
 async def check_email_deliverability(email: str):
@@ -13,52 +169,17 @@ async def check_email_deliverability(email: str):
         email (str): The email address to check.
 
     Returns:
-        None: True if MX records were found.
+        None: if MX records were found.
     Raises:
         HTTPException: if MX not found
     """
-    print('email: ', email)
     # Extract the domain from the email address
-    domain = email.split('@')[1]
-    # define a cache key
-    domain_key = f'mx_{domain}'
-    error_message = "Email domain does not have valid MX records, contact your domain provider."
+    domain = email.split('@')[1].lower()
     try:
-        with get_redis_sync() as redis:
-            # Check cache first
-            cached_result = redis.get(domain_key)
-            # return if cache is valid
-            if cached_result and cached_result == '1':
-                return None
-            # raise exception if cache is invalid
-            elif cached_result == '0':
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail=error_message)
-
-            # perform the DNS lookup asynchronously
-            resolver = dns.resolver.Resolver()
-            resolver.timeout = 1  # Set a timeout for the DNS query
-            answers = resolver.query(domain, 'MX')
-
-            # Check if at least one MX record was found
-            if answers:
-                # Store result in cache
-                redis.set(domain_key, '1', ex=3600)
-                # return
-                return None
-            else:
-                print(f"Domain not found or no answer for DNS query:  {domain}")
-                # Cache failed result
-                redis.set(domain_key, '0', ex=3600)
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail="Email domain does not have valid MX records.")
-
-    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-        print(f"Domain not found or no answer for DNS query:  {domain}")
-        # Cache failed result
-        redis.set(domain_key, '0', ex=3600)
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Email domain does not have valid MX records.")
-    except Exception as exc:
+        deliverable = await mx_resolver.has_mx(domain)
+    except DNSError as exc:
         print(f"Error checking email deliverability: {exc}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if not deliverable:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=NO_MX_MESSAGE)
@@ -1,16 +1,15 @@
 from typing import Annotated, Optional
 import logging
 import logging.handlers
-from fastapi.responses import JSONResponse
 from fastapi import Request, status, HTTPException, Depends
 from fastapi.exceptions import RequestValidationError
-from fastapi.encoders import jsonable_encoder
 from sqlalchemy.exc import SQLAlchemyError
 from aioredis.exceptions import RedisError
 from celery.exceptions import CeleryError
 from aio_pika.exceptions import AMQPError
 
 from api.v1.services.auth import auth_service, User
+from api.utils.responses import ORJSONResponse
 
 
 FORMAT = '%(asctime)s %(clientip)-15s %(user)-8s %(message)s'
@@ -61,7 +60,7 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 'status': False,
@@ -87,7 +86,7 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 'status': False,
@@ -112,14 +111,14 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            content=jsonable_encoder({
+            content={
                 'status': False,
                 'status_code': status.HTTP_422_UNPROCESSABLE_ENTITY,
                 'detail': exc.errors(),
                 'body': exc.body
-            })
+            }
         )
 
     @staticmethod
@@ -138,7 +137,7 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 'status': False,
@@ -163,7 +162,7 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 'status': False,
@@ -188,7 +187,7 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 'status': False,
@@ -213,7 +212,7 @@ class GlobalExceptionHandler:
                 'user': current_user.first_name if current_user else None
             }
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 'status': False,
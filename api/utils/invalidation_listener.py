@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Cache invalidation listener module
+"""
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+from api.db.redis_database import get_redis_sync
+
+# functions called with the messages published on each invalidation channel
+channel_handlers: Dict[str, Callable[[str], None]] = {}
+# functions called when messages may have been missed while disconnected
+reset_handlers: List[Callable[[], None]] = []
+
+
+def on_channel(channel: str, handler: Callable[[str], None],
+               reset: Optional[Callable[[], None]] = None) -> None:
+    """
+    Registers a function to call with every message published on a channel,
+    and optionally one to call when messages may have been missed.
+    """
+    channel_handlers[channel] = handler
+    if reset:
+        on_reset(reset)
+
+
+def on_reset(handler: Callable[[], None]) -> None:
+    """
+    Registers a function to call when messages may have been missed.
+    """
+    reset_handlers.append(handler)
+
+
+def dispatch(channel: str, data: str) -> None:
+    """
+    Calls the handler of the channel a message was published on.
+    """
+    handler = channel_handlers.get(channel)
+    if handler:
+        handler(data)
+
+
+def reset() -> None:
+    """
+    Calls every reset handler, a failing one does not stop the others.
+    """
+    for handler in reset_handlers:
+        try:
+            handler()
+        except Exception as exc:
+            print(f'invalidation reset error: {exc}')
+
+
+def listen_for_invalidations() -> None:
+    """
+    Applies invalidations published by other processes to the local caches.
+    """
+    while True:
+        try:
+            with get_redis_sync() as redis:
+                pubsub = redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(*channel_handlers)
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        dispatch(message['channel'], message['data'])
+        except Exception as exc:
+            print(f'invalidation listener error: {exc}, reconnecting...')
+            # invalidations may have been missed while disconnected
+            reset()
+            time.sleep(5)
+
+
+def start_invalidation_listener() -> threading.Thread:
+    """
+    Starts the invalidation listener in a daemon thread.
+    """
+    listener = threading.Thread(
+        target=listen_for_invalidations,
+        name='invalidation-listener',
+        daemon=True
+    )
+    listener.start()
+    return listener
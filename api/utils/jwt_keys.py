@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+JWT signing keys module
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Optional
+from jose import jwk, JWTError
+from jose.constants import ALGORITHMS
+
+from api.utils.settings import settings
+
+ASYMMETRIC_ALGORITHMS = ALGORITHMS.RSA | ALGORITHMS.EC
+# seconds between key reloads triggered by tokens with an unknown kid, so
+# made up kids cannot make every request read the keys directory
+UNKNOWN_KID_RELOAD_INTERVAL = 10
+
+
+class KeyRing:
+    """
+    Holds the key tokens are signed with and the parsed keys they are
+    verified with.
+
+    HMAC algorithms use SECRET_KEY. RSA and EC algorithms load every
+    `<kid>.pem` private key in the keys directory: the active kid signs new
+    tokens and the others stay available to verify tokens signed before a
+    rotation. Their public keys are published as a JWKS.
+
+    The key files are read again every reload_interval seconds, and when a
+    token names a kid that is not loaded, so a key added during a rotation
+    is picked up without a restart.
+    """
+    def __init__(self, algorithm: str, keys_dir: str = '',
+                 active_kid: str = '', secret_key: str = '',
+                 reload_interval: int = 0):
+        self.algorithm = algorithm
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self.secret_key = secret_key
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self.load()
+        self._loaded_at = time.monotonic()
+
+    @property
+    def asymmetric(self) -> bool:
+        """
+        Returns True if tokens are signed with a private key.
+        """
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def load(self) -> None:
+        """
+        Parses the keys, call again after adding or removing a key file.
+        """
+        if not self.asymmetric:
+            key = jwk.construct(self.secret_key, self.algorithm)
+            with self._lock:
+                self.kid = None
+                self.signing_key = key
+                self._verification_keys = {None: key}
+                self.jwks = {'keys': []}
+                self.jwks_body = json.dumps(self.jwks).encode()
+            return
+
+        private_keys = {}
+        for file_name in sorted(os.listdir(self.keys_dir)):
+            kid, extension = os.path.splitext(file_name)
+            if extension != '.pem':
+                continue
+            with open(os.path.join(self.keys_dir, file_name)) as key_file:
+                private_keys[kid] = jwk.construct(key_file.read(), self.algorithm)
+        if not private_keys:
+            raise ValueError(f'no .pem keys found in {self.keys_dir}')
+        # sign with the newest key unless one is chosen
+        kid = self.active_kid or max(private_keys)
+        if kid not in private_keys:
+            raise ValueError(f'no key found for JWT_ACTIVE_KID {kid}')
+
+        verification_keys: Dict[Optional[str], object] = {}
+        public_jwks = []
+        for key_id, private_key in private_keys.items():
+            public_key = private_key.public_key()
+            verification_keys[key_id] = public_key
+            public_jwks.append({
+                **public_key.to_dict(),
+                'kid': key_id,
+                'use': 'sig'
+            })
+        jwks = {'keys': public_jwks}
+        with self._lock:
+            self.kid = kid
+            self.signing_key = private_keys[kid]
+            self._verification_keys = verification_keys
+            self.jwks = jwks
+            self.jwks_body = json.dumps(jwks).encode()
+
+    @property
+    def headers(self) -> Optional[Dict[str, str]]:
+        """
+        Gets the extra JWT headers of new tokens.
+        """
+        return {'kid': self.kid} if self.kid else None
+
+    def refresh(self, max_age: Optional[float] = None) -> bool:
+        """
+        Loads the key files again if they were loaded more than max_age
+        seconds ago, the reload_interval by default.
+
+        A failed reload keeps the current keys.
+
+        Returns:
+            True if the keys were reloaded.
+        """
+        if max_age is None:
+            max_age = self.reload_interval
+        if not self.asymmetric or not max_age:
+            return False
+        with self._lock:
+            if time.monotonic() - self._loaded_at < max_age:
+                return False
+            # concurrent callers keep using the current keys meanwhile
+            self._loaded_at = time.monotonic()
+        try:
+            self.load()
+        except Exception as exc:
+            print(f'error reloading jwt keys: {exc}')
+            return False
+        return True
+
+    @property
+    def jwks_etag(self) -> str:
+        """
+        Gets an ETag for the current JWKS.
+        """
+        return f'"{hashlib.sha256(self.jwks_body).hexdigest()[:32]}"'
+
+    def verification_key(self, kid: Optional[str]):
+        """
+        Gets the parsed key for a token's kid header.
+
+        Raises:
+            JWTError: if the kid is unknown.
+        """
+        if not self.asymmetric:
+            kid = None
+        key = self._verification_keys.get(kid)
+        if key is None and kid is not None \
+                and self.refresh(UNKNOWN_KID_RELOAD_INTERVAL):
+            key = self._verification_keys.get(kid)
+        if key is None:
+            raise JWTError(f'Unknown key id {kid}')
+        return key
+
+
+def generate_private_key(algorithm: str) -> bytes:
+    """
+    Generates a PEM private key for an RSA or EC algorithm.
+    """
+    if algorithm in ALGORITHMS.RSA:
+        import rsa
+        bits = {'RS256': 2048, 'RS384': 3072, 'RS512': 4096}[algorithm]
+        _, private_key = rsa.newkeys(bits)
+        return private_key.save_pkcs1()
+    if algorithm in ALGORITHMS.EC:
+        import ecdsa
+        curve = {
+            'ES256': ecdsa.NIST256p,
+            'ES384': ecdsa.NIST384p,
+            'ES512': ecdsa.NIST521p
+        }[algorithm]
+        return ecdsa.SigningKey.generate(curve=curve).to_pem()
+    raise ValueError(f'{algorithm} does not use a private key')
+
+
+@lru_cache(maxsize=None)
+def load_key_ring() -> KeyRing:
+    """
+    Builds the process wide key ring, loading the keys on first use.
+    """
+    return KeyRing(
+        algorithm=settings.ALGORITHM,
+        keys_dir=settings.JWT_KEYS_DIR,
+        active_kid=settings.JWT_ACTIVE_KID,
+        secret_key=settings.SECRET_KEY,
+        reload_interval=settings.JWT_KEYS_RELOAD_INTERVAL
+    )
+
+
+def get_key_ring() -> KeyRing:
+    """
+    Gets the process wide key ring, with its keys reloaded if they are
+    older than JWT_KEYS_RELOAD_INTERVAL.
+    """
+    key_ring = load_key_ring()
+    key_ring.refresh()
+    return key_ring
+
+
+# Generate a new signing key: python -m api.utils.jwt_keys [kid]
+if __name__ == "__main__":
+    new_kid = (sys.argv[1] if len(sys.argv) > 1
+               else datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S'))
+    os.makedirs(settings.JWT_KEYS_DIR, exist_ok=True)
+    path = os.path.join(settings.JWT_KEYS_DIR, f'{new_kid}.pem')
+    with open(path, 'wb') as new_key_file:
+        new_key_file.write(generate_private_key(settings.ALGORITHM))
+    os.chmod(path, 0o600)
+    print(f'wrote {path}')
+    print('keep JWT_ACTIVE_KID on the current key until every process and '
+          f'verifier has loaded the new one, then set JWT_ACTIVE_KID={new_kid}')
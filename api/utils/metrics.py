@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+In-process metrics module
+"""
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """
+    Keeps counters, gauges and timing summaries for this process.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increments a counter.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Sets a gauge to the current value.
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Records an observation, such as a duration in seconds.
+        """
+        with self._lock:
+            summary = self._summaries.setdefault(
+                name,
+                {'count': 0, 'sum': 0.0, 'max': 0.0}
+            )
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+
+    def snapshot(self) -> Dict:
+        """
+        Returns a copy of all metrics.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'summaries': {
+                    name: dict(summary)
+                    for name, summary in self._summaries.items()
+                }
+            }
+
+
+# create a process wide metrics instance
+metrics = Metrics()
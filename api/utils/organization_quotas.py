@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Organization request quota module
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.repositories import organization_repository
+from api.utils.settings import settings
+
+# the organization id and requests per minute of a user, None when the
+# user is in no organization or its quota is unlimited
+Quota = Optional[Tuple[str, int]]
+
+
+class OrganizationQuotas:
+    """
+    Organization quotas of users, looked up when a user is first seen.
+
+    A user's organization and quota is read with one primary key query and
+    kept in a bounded in-process LRU for ttl seconds, so a membership or
+    quota change takes effect within one ttl.
+    """
+    def __init__(self, default_limit: int, max_size: int, ttl: int):
+        self.default_limit = default_limit
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Quota, float]] = OrderedDict()
+
+    async def quota_for(self, user_id: str, db: AsyncSession) -> Quota:
+        """
+        Gets the organization id and requests per minute of a user.
+
+        Returns:
+            None if the user is in no organization, its quota is unlimited
+            or it could not be loaded.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        try:
+            row = await organization_repository.get_member_quota(db, user_id)
+        except Exception as exc:
+            # let the request through uncounted, the next one retries
+            print(f'error loading organization quota: {exc}')
+            return None
+        quota = None
+        if row is not None:
+            limit = (self.default_limit if row.requests_per_minute is None
+                     else row.requests_per_minute)
+            if limit:
+                quota = (row.organization_id, limit)
+        self._set(user_id, quota)
+        return quota
+
+    def _set(self, user_id: str, quota: Quota) -> None:
+        """
+        Caches the quota of a user.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (quota, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drops every cached quota.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# create an instance of the OrganizationQuotas class
+organization_quotas = OrganizationQuotas(
+    default_limit=settings.ORG_REQUESTS_PER_MINUTE,
+    max_size=settings.ORG_QUOTA_CACHE_SIZE,
+    ttl=settings.ORG_QUOTA_CACHE_TTL
+)
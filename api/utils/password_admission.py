@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Password hashing admission module
+"""
+import time
+import asyncio
+import functools
+import ipaddress
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict
+from fastapi import HTTPException, status
+
+from api.utils.metrics import metrics
+from api.utils.password_hashing import hash_concurrency
+from api.utils.settings import settings
+
+# clients in the same network prefix share one queue
+IPV4_PREFIX_LENGTH = 24
+IPV6_PREFIX_LENGTH = 64
+
+
+def get_client_key(client_ip: str) -> str:
+    """
+    Returns the network prefix that a client is queued under.
+    """
+    try:
+        address = ipaddress.ip_address(client_ip)
+    except ValueError:
+        # not an ip address, queue the client under its own name
+        return client_ip
+    prefix = IPV4_PREFIX_LENGTH if address.version == 4 else IPV6_PREFIX_LENGTH
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+class PasswordAdmission:
+    """
+    Limits how many password hashes run at once.
+
+    Work over the limit waits in a bounded queue that is served round-robin
+    across client prefixes, so one source cannot take every hashing slot.
+    A prefix may only hold max_queue_per_client places in the queue, work
+    over that is rejected for that prefix alone, so one source cannot
+    fill the queue either. When the queue is full, new work is rejected
+    immediately.
+    """
+    def __init__(self, max_concurrency: int, max_queue_size: int,
+                 max_queue_per_client: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.max_queue_per_client = max_queue_per_client
+        self._active = 0
+        self._queued = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = OrderedDict()
+
+    async def run(self, client_ip: str, func: Callable, *args):
+        """
+        Runs a password hashing function in a worker thread once a slot is free.
+
+        Raises:
+            HTTPException: 429 if the client's prefix has used up its share
+                of the queue, 503 if the queue is full.
+        """
+        if self._active < self.max_concurrency and not self._queues:
+            self._active += 1
+            metrics.observe('password_admission_wait_seconds', 0.0)
+        else:
+            await self._wait_for_slot(get_client_key(client_ip))
+        self._update_gauges()
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None,
+                functools.partial(func, *args)
+            )
+        finally:
+            self._release()
+
+    async def _wait_for_slot(self, key: str) -> None:
+        """
+        Queues the caller until a finishing task hands over its slot.
+        """
+        queue = self._queues.get(key)
+        if queue is not None and len(queue) >= self.max_queue_per_client:
+            metrics.increment('password_admission_client_rejected_total')
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail='Too many requests, try again later',
+                headers={'Retry-After': '1'}
+            )
+        if self._queued >= self.max_queue_size:
+            metrics.increment('password_admission_rejected_total')
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Server is busy, try again later',
+                headers={'Retry-After': '1'}
+            )
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(future)
+        self._queued += 1
+        self._update_gauges()
+        enqueued_at = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just before cancellation
+                self._release()
+            else:
+                self._remove(key, future)
+            raise
+        metrics.observe(
+            'password_admission_wait_seconds',
+            time.perf_counter() - enqueued_at
+        )
+
+    def _remove(self, key: str, future: asyncio.Future) -> None:
+        """
+        Removes a cancelled waiter from its queue.
+        """
+        queue = self._queues.get(key)
+        if queue and future in queue:
+            queue.remove(future)
+            self._queued -= 1
+            if not queue:
+                del self._queues[key]
+
+    def _release(self) -> None:
+        """
+        Hands the slot to the next client in round-robin order, or frees it.
+        """
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self._queued -= 1
+            if queue:
+                # serve the other clients before this one again
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        """
+        Exports the current slot and queue usage.
+        """
+        metrics.set_gauge('password_admission_active', self._active)
+        metrics.set_gauge('password_admission_queued', self._queued)
+
+
+# create a process wide admission queue for password hashing
+password_admission = PasswordAdmission(
+    max_concurrency=hash_concurrency(),
+    max_queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    max_queue_per_client=settings.PASSWORD_HASH_QUEUE_PER_CLIENT
+)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Password hashing module
+"""
+import os
+import json
+import time
+from typing import Dict, List
+from passlib.context import CryptContext
+from passlib.hash import argon2, bcrypt
+
+from api.db.redis_database import get_redis_sync
+from api.utils.settings import settings
+
+# password used when timing a hash, never stored
+CALIBRATION_PASSWORD = 'Calibration1234#'
+# lower bounds that calibration never goes below
+MIN_ARGON2_TIME_COST = 2
+MIN_BCRYPT_ROUNDS = 10
+# upper bounds so a slow machine cannot make calibration run forever
+MAX_ARGON2_TIME_COST = 20
+MAX_BCRYPT_ROUNDS = 16
+# argon2 memory_cost in KiB that a memory budget never goes below
+MIN_ARGON2_MEMORY_COST = 19456
+# redis key prefix the calibrated cost parameters are shared under
+CALIBRATION_KEY = 'password_hash_calibration'
+
+
+def hash_concurrency() -> int:
+    """
+    Returns how many passwords a process hashes at once.
+    """
+    return settings.PASSWORD_HASH_CONCURRENCY or os.cpu_count() or 1
+
+
+def get_schemes() -> List[str]:
+    """
+    Returns the configured password schemes, preferred scheme first.
+    """
+    schemes = [
+        scheme.strip() for scheme in settings.PASSWORD_SCHEMES.split(',')
+        if scheme.strip()
+    ]
+    if not schemes:
+        raise ValueError('PASSWORD_SCHEMES must list at least one scheme')
+    return schemes
+
+
+def get_cost_options(argon2_time_cost: int = settings.ARGON2_TIME_COST,
+                     argon2_memory_cost: int = settings.ARGON2_MEMORY_COST,
+                     argon2_parallelism: int = settings.ARGON2_PARALLELISM,
+                     bcrypt_rounds: int = settings.BCRYPT_ROUNDS) -> Dict:
+    """
+    Builds the CryptContext keyword options for the cost parameters.
+    """
+    return {
+        'argon2__type': 'ID',
+        'argon2__time_cost': argon2_time_cost,
+        'argon2__memory_cost': argon2_memory_cost,
+        'argon2__parallelism': argon2_parallelism,
+        'bcrypt__rounds': bcrypt_rounds,
+    }
+
+
+def build_password_context(**cost_options) -> CryptContext:
+    """
+    Builds the CryptContext for the configured schemes.
+
+    Hashes made with a scheme other than the first, or with outdated
+    cost parameters, are reported by `needs_update` so they can be
+    rehashed on the next successful login.
+    """
+    schemes = get_schemes()
+    options = get_cost_options(**cost_options)
+    # only pass options for schemes that are enabled
+    options = {
+        key: value for key, value in options.items()
+        if key.split('__')[0] in schemes
+    }
+    return CryptContext(
+        schemes=schemes,
+        deprecated='auto',
+        **options
+    )
+
+
+def configure_password_context(context: CryptContext, **cost_options) -> None:
+    """
+    Updates an existing CryptContext in place with new cost parameters.
+    """
+    context.load(build_password_context(**cost_options))
+
+
+def time_verify(handler, samples: int = 3) -> float:
+    """
+    Returns the best verify time in milliseconds for a configured handler.
+    """
+    hashed = handler.hash(CALIBRATION_PASSWORD)
+    best = float('inf')
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.verify(CALIBRATION_PASSWORD, hashed)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def calibrate_argon2(target_ms: int = settings.PASSWORD_HASH_TARGET_MS,
+                     memory_cost: int = settings.ARGON2_MEMORY_COST,
+                     parallelism: int = settings.ARGON2_PARALLELISM) -> int:
+    """
+    Picks the smallest argon2id time_cost whose verify time reaches target_ms
+    on this machine, keeping memory_cost and parallelism fixed.
+    """
+    time_cost = MIN_ARGON2_TIME_COST
+    while time_cost < MAX_ARGON2_TIME_COST:
+        handler = argon2.using(
+            type='ID',
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism
+        )
+        if time_verify(handler) >= target_ms:
+            break
+        time_cost += 1
+    return time_cost
+
+
+def calibrate_bcrypt(target_ms: int = settings.PASSWORD_HASH_TARGET_MS) -> int:
+    """
+    Picks the smallest bcrypt rounds whose verify time reaches target_ms
+    on this machine.
+    """
+    rounds = MIN_BCRYPT_ROUNDS
+    while rounds < MAX_BCRYPT_ROUNDS:
+        if time_verify(bcrypt.using(rounds=rounds)) >= target_ms:
+            break
+        rounds += 1
+    return rounds
+
+
+def budget_memory_cost(memory_cost: int = settings.ARGON2_MEMORY_COST,
+                       budget: int = settings.PASSWORD_HASH_MEMORY_BUDGET,
+                       concurrency: int = 0) -> int:
+    """
+    Lowers the argon2 memory_cost so that every concurrent hash of a
+    process fits in the memory budget, a budget of 0 keeps memory_cost.
+    """
+    if not budget:
+        return memory_cost
+    share = budget // (concurrency or hash_concurrency())
+    if share < MIN_ARGON2_MEMORY_COST:
+        print(f'password hashing memory budget of {budget}KiB is too small, '
+              f'using {MIN_ARGON2_MEMORY_COST}KiB per hash')
+    return max(MIN_ARGON2_MEMORY_COST, min(memory_cost, share))
+
+
+def calibrate_cost(target_ms: int = settings.PASSWORD_HASH_TARGET_MS) -> Dict:
+    """
+    Calibrates the cost parameters of every enabled scheme.
+
+    Returns:
+        keyword arguments accepted by `build_password_context`.
+    """
+    schemes = get_schemes()
+    cost = {}
+    if 'argon2' in schemes:
+        memory_cost = budget_memory_cost()
+        cost['argon2_memory_cost'] = memory_cost
+        cost['argon2_time_cost'] = calibrate_argon2(target_ms, memory_cost)
+    if 'bcrypt' in schemes:
+        cost['bcrypt_rounds'] = calibrate_bcrypt(target_ms)
+    return cost
+
+
+def calibration_key(target_ms: int = settings.PASSWORD_HASH_TARGET_MS) -> str:
+    """
+    Gets the redis key of the cost parameters calibrated for the current
+    settings, so changing them calibrates again.
+    """
+    return ':'.join(str(part) for part in (
+        CALIBRATION_KEY, settings.PASSWORD_SCHEMES, target_ms,
+        settings.ARGON2_MEMORY_COST, settings.ARGON2_PARALLELISM,
+        settings.PASSWORD_HASH_MEMORY_BUDGET, hash_concurrency()
+    ))
+
+
+def load_shared_cost(target_ms: int = settings.PASSWORD_HASH_TARGET_MS) -> Dict:
+    """
+    Gets the cost parameters shared by every process through redis, the
+    first process to start calibrates and stores them.
+
+    Workers calibrating on their own pick different costs, and each
+    would then rehash the passwords hashed by the others on every login.
+
+    Returns:
+        keyword arguments accepted by `build_password_context`, empty to
+        use the configured costs if redis is unreachable.
+    """
+    key = calibration_key(target_ms)
+    try:
+        with get_redis_sync() as redis:
+            stored = redis.get(key)
+        if stored is None:
+            calibrated = json.dumps(calibrate_cost(target_ms))
+            with get_redis_sync() as redis:
+                # keep the costs of a process that finished first
+                redis.set(key, calibrated, nx=True)
+                stored = redis.get(key)
+    except Exception as exc:
+        print(f'error loading shared password hashing costs: {exc}')
+        return {}
+    return json.loads(stored)
+
+
+# Run the calibration and print settings for the .env file
+if __name__ == "__main__":
+    target = settings.PASSWORD_HASH_TARGET_MS
+    print(f'calibrating password hashing for a {target}ms verify time...')
+    calibrated = calibrate_cost(target)
+    if 'argon2_time_cost' in calibrated:
+        print(f"ARGON2_TIME_COST={calibrated['argon2_time_cost']}")
+        print(f"ARGON2_MEMORY_COST={calibrated['argon2_memory_cost']}")
+        print(f'ARGON2_PARALLELISM={settings.ARGON2_PARALLELISM}')
+    if 'bcrypt_rounds' in calibrated:
+        print(f"BCRYPT_ROUNDS={calibrated['bcrypt_rounds']}")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+JSON response module
+
+Responses are rendered with orjson, and a pydantic model straight to JSON
+bytes by its pydantic-core serializer. A route that returns its response
+model through model_response skips FastAPI re-validating the model,
+dumping it to a dict and encoding the dict again.
+"""
+from typing import Any, Mapping, Optional
+import orjson
+from fastapi import status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+from starlette.background import BackgroundTask
+
+
+def encode_default(value: Any) -> Any:
+    """
+    Converts a value orjson cannot serialize, such as a pydantic model,
+    bytes or the exception in a validation error's context.
+    """
+    return to_jsonable_python(value, fallback=str)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    A JSON response serialized with orjson or pydantic-core.
+    """
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content,
+                                                           by_alias=True)
+        return orjson.dumps(content, default=encode_default,
+                            option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(model: BaseModel,
+                   status_code: int = status.HTTP_200_OK,
+                   headers: Optional[Mapping[str, str]] = None,
+                   background: Optional[BackgroundTask] = None
+                   ) -> ORJSONResponse:
+    """
+    Wraps a route's response model in a response.
+
+    The model must be an instance of the route's response_model, FastAPI
+    does not check or filter a response that is returned to it.
+    """
+    return ORJSONResponse(model, status_code=status_code, headers=headers,
+                          background=background)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Per-user session registry module
+"""
+import sys
+import time
+import threading
+from typing import Dict, List, Tuple
+
+from api.db.redis_database import get_redis_sync
+from api.utils.invalidation_listener import on_reset
+from api.utils.settings import settings
+from api.utils.token_cache import publish_user_revocation, on_user_revocation
+
+# refresh tokens are the longest lived tokens of a session
+SESSIONS_TTL = 60 * 60 * 24 * max(settings.REFRESH_TOKEN_EXPIRE,
+                                   settings.REMEMBER_ME_EXPIRE)
+
+
+def sessions_key(user_id: str) -> str:
+    """
+    Gets the redis key of a user's sorted set of token ids.
+    """
+    return f'sessions:{user_id}'
+
+
+def generation_key(user_id: str) -> str:
+    """
+    Gets the redis key of a user's session generation counter.
+    """
+    return f'session_gen:{user_id}'
+
+
+class GenerationCache:
+    """
+    In-process cache of each user's session generation.
+
+    Tokens carry the generation they were issued in, and revoking every
+    session of a user only increments the counter, so checking a token
+    is a dict lookup while the cached value is fresh.
+    """
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._generations: Dict[str, Tuple[int, float]] = {}
+
+    def get(self, user_id: str) -> int:
+        """
+        Gets a user's current session generation.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._generations.get(user_id)
+        if cached and cached[1] > now:
+            return cached[0]
+        with get_redis_sync() as redis:
+            generation = int(redis.get(generation_key(user_id)) or 0)
+        with self._lock:
+            self._generations[user_id] = (generation, now + self.ttl)
+        return generation
+
+    def get_many(self, user_ids: List[str]) -> Dict[str, int]:
+        """
+        Gets the current session generation of many users with one lookup.
+        """
+        now = time.monotonic()
+        generations: Dict[str, int] = {}
+        missing: List[str] = []
+        with self._lock:
+            for user_id in set(user_ids):
+                cached = self._generations.get(user_id)
+                if cached and cached[1] > now:
+                    generations[user_id] = cached[0]
+                else:
+                    missing.append(user_id)
+        if missing:
+            with get_redis_sync() as redis:
+                values = redis.mget([generation_key(user_id)
+                                     for user_id in missing])
+            with self._lock:
+                for user_id, value in zip(missing, values):
+                    generations[user_id] = int(value or 0)
+                    self._generations[user_id] = (generations[user_id],
+                                                  now + self.ttl)
+        return generations
+
+    def set(self, user_id: str, generation: int) -> None:
+        """
+        Caches a generation that was just read from redis.
+        """
+        with self._lock:
+            self._generations[user_id] = (generation,
+                                          time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Drops a user's cached generation.
+        """
+        with self._lock:
+            self._generations.pop(user_id, None)
+
+    def clear(self) -> None:
+        """
+        Drops every cached generation.
+        """
+        with self._lock:
+            self._generations.clear()
+
+
+generation_cache = GenerationCache(ttl=settings.TOKEN_CACHE_TTL)
+# drop generations bumped by other processes
+on_user_revocation(generation_cache.invalidate)
+# and every generation if the listener may have missed a revoke-all
+on_reset(generation_cache.clear)
+
+
+def get_session_generation(user_id: str) -> int:
+    """
+    Gets the session generation new tokens of a user are issued in.
+    """
+    return generation_cache.get(user_id)
+
+
+def get_session_generations(user_ids: List[str]) -> Dict[str, int]:
+    """
+    Gets the session generations of many users.
+    """
+    return generation_cache.get_many(user_ids)
+
+
+def queue_generation_read(pipe, user_id: str) -> None:
+    """
+    Queues reading a user's session generation on a redis pipeline, pass
+    its result to read_generation.
+    """
+    pipe.get(generation_key(user_id))
+
+
+def read_generation(user_id: str, value) -> int:
+    """
+    Gets the generation queued by queue_generation_read and caches it.
+    """
+    generation = int(value or 0)
+    generation_cache.set(user_id, generation)
+    return generation
+
+
+def queue_session(pipe, user_id: str, jti: str, token_type: str,
+                  expire_in: int) -> None:
+    """
+    Queues registering a token in the user's session index on a redis pipeline.
+    """
+    key = sessions_key(user_id)
+    pipe.zadd(key, {session_member(jti, token_type): int(time.time()) + expire_in})
+    pipe.expire(key, SESSIONS_TTL)
+
+
+def session_member(jti: str, token_type: str) -> str:
+    """
+    Gets the member a token is kept under in its user's session index.
+    """
+    return f'{jti}:{token_type}'
+
+
+def queue_session_removal(pipe, user_id: str, jti: str,
+                          token_type: str) -> None:
+    """
+    Queues removing a revoked token from the user's session index on a
+    redis pipeline.
+    """
+    pipe.zrem(sessions_key(user_id), session_member(jti, token_type))
+
+
+def register_session(user_id: str, jti: str, token_type: str,
+                     expire_in: int) -> None:
+    """
+    Registers a token in the user's session index.
+    """
+    try:
+        with get_redis_sync() as redis:
+            pipe = redis.pipeline()
+            queue_session(pipe, user_id, jti, token_type, expire_in)
+            pipe.execute()
+    except Exception as exc:
+        print(exc)
+
+
+def list_sessions(user_id: str) -> List[Dict]:
+    """
+    Lists the unexpired tokens of a user.
+    """
+    now = int(time.time())
+    key = sessions_key(user_id)
+    with get_redis_sync() as redis:
+        pipe = redis.pipeline()
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zrangebyscore(key, now, '+inf', withscores=True)
+        _, members = pipe.execute()
+    sessions = []
+    for member, expires_at in members:
+        jti, token_type = member.rsplit(':', 1)
+        sessions.append({
+            'jti': jti,
+            'token_type': token_type,
+            'expires_at': int(expires_at)
+        })
+    return sessions
+
+
+def revoke_all_sessions(user_id: str) -> int:
+    """
+    Revokes every token of a user by bumping the session generation.
+
+    Returns:
+        the new session generation.
+    """
+    with get_redis_sync() as redis:
+        pipe = redis.pipeline()
+        pipe.incr(generation_key(user_id))
+        pipe.delete(sessions_key(user_id))
+        generation, _ = pipe.execute()
+    publish_user_revocation(user_id)
+    return generation
+
+
+# Revoke every session of a user: python -m api.utils.session_registry <user_id>
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print('usage: python -m api.utils.session_registry <user_id>')
+        sys.exit(1)
+    new_generation = revoke_all_sessions(sys.argv[1])
+    print(f'revoked all sessions of {sys.argv[1]}, generation {new_generation}')
@@ -1,8 +1,36 @@
+from pathlib import Path
 from decouple import config
 
+# the project root, relative data paths are resolved against it rather
+# than the working directory
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+
+def project_path(path: str) -> str:
+    """
+    Gets the absolute path of a path relative to the project root.
+    """
+    return str(BASE_DIR / path)
+
 
 class Settings:
     DB_URL: str = str(config('DB_URL'))
+    # comma separated read replica urls, reads use DB_URL if empty
+    DB_REPLICA_URLS: str = str(config('DB_REPLICA_URLS', default=''))
+    # seconds a replica may lag behind before reads fall back to the primary
+    DB_REPLICA_MAX_LAG: float = float(config('DB_REPLICA_MAX_LAG', default=1.0))
+    DB_REPLICA_CHECK_INTERVAL: int = int(config('DB_REPLICA_CHECK_INTERVAL', default=5))
+    # prepared statements asyncpg keeps per connection
+    DB_STATEMENT_CACHE_SIZE: int = int(config('DB_STATEMENT_CACHE_SIZE', default=256))
+    # 'direct', 'pgbouncer' (transaction mode, no prepared statement cache)
+    # or 'test' (no connection pool)
+    DB_ENGINE_PROFILE: str = str(config('DB_ENGINE_PROFILE', default='direct'))
+    DB_POOL_SIZE: int = int(config('DB_POOL_SIZE', default=5))
+    DB_MAX_OVERFLOW: int = int(config('DB_MAX_OVERFLOW', default=10))
+    DB_POOL_TIMEOUT: float = float(config('DB_POOL_TIMEOUT', default=30))
+    DB_POOL_RECYCLE: int = int(config('DB_POOL_RECYCLE', default=18000))
+    # test connections with a round trip on checkout
+    DB_POOL_PRE_PING: str = str(config('DB_POOL_PRE_PING', default=''))
     REDIS_URL: str = str(config('REDIS_URL'))
     RABBITMQ_URL: str = str(config('RABBITMQ_URL'))
 
@@ -17,8 +45,30 @@ class Settings:
     REGISTER_MAX_ATTEMPTS: int = int(config('REGISTER_MAX_ATTEMPTS'))
     OTHERS_MAX_ATTEMPTS: int = int(config('OTHERS_MAX_ATTEMPTS'))
 
+    # requests per minute shared by all users of an organization without its
+    # own quota, 0 for no limit
+    ORG_REQUESTS_PER_MINUTE: int = int(config('ORG_REQUESTS_PER_MINUTE', default=600))
+    # users whose organization quota is kept in process, and for how long
+    ORG_QUOTA_CACHE_SIZE: int = int(config('ORG_QUOTA_CACHE_SIZE', default=100000))
+    ORG_QUOTA_CACHE_TTL: int = int(config('ORG_QUOTA_CACHE_TTL', default=60))
+
     SECRET_KEY: str = str(config('SECRET_KEY'))
     ALGORITHM: str = str(config('ALGORITHM'))
+    # directory of <kid>.pem private keys for RS256/ES256 signing
+    JWT_KEYS_DIR: str = str(config('JWT_KEYS_DIR', default='keys'))
+    # kid of the signing key, the newest key is used if empty
+    JWT_ACTIVE_KID: str = str(config('JWT_ACTIVE_KID', default=''))
+    # seconds between reads of the key files, 0 loads them once
+    JWT_KEYS_RELOAD_INTERVAL: int = int(config('JWT_KEYS_RELOAD_INTERVAL', default=60))
+    JWKS_MAX_AGE: int = int(config('JWKS_MAX_AGE', default=300))
+    # 2 issues compact fingerprinted tokens, 1 the original format
+    TOKEN_FORMAT_VERSION: int = int(config('TOKEN_FORMAT_VERSION', default=2))
+    # key for token fingerprints, SECRET_KEY is used if empty
+    TOKEN_FINGERPRINT_KEY: str = str(config('TOKEN_FINGERPRINT_KEY', default=''))
+
+    # comma separated keys internal services send in X-Internal-API-Key
+    INTERNAL_API_KEYS: str = str(config('INTERNAL_API_KEYS', default=''))
+    INTROSPECTION_MAX_TOKENS: int = int(config('INTROSPECTION_MAX_TOKENS', default=100))
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(config('ACCESS_TOKEN_EXPIRE_MINUTES'))
     REFRESH_TOKEN_EXPIRE: int = int(config('REFRESH_TOKEN_EXPIRE'))
     REMEMBER_ME_EXPIRE: int = int(config('REMEMBER_ME_EXPIRE'))
@@ -27,4 +77,64 @@ class Settings:
     MAX_PENALTY_DURATION: int = int(config('MAX_PENALTY_DURATION'))
     LOCKOUT_THRESHOLD: int = int(config('LOCKOUT_THRESHOLD'))
 
+    # password hashing, the first scheme is used for new hashes
+    PASSWORD_SCHEMES: str = str(config('PASSWORD_SCHEMES', default='argon2,bcrypt'))
+    ARGON2_TIME_COST: int = int(config('ARGON2_TIME_COST', default=3))
+    ARGON2_MEMORY_COST: int = int(config('ARGON2_MEMORY_COST', default=65536))
+    ARGON2_PARALLELISM: int = int(config('ARGON2_PARALLELISM', default=4))
+    BCRYPT_ROUNDS: int = int(config('BCRYPT_ROUNDS', default=12))
+    PASSWORD_HASH_TARGET_MS: int = int(config('PASSWORD_HASH_TARGET_MS', default=250))
+    # calibrate the cost parameters on startup instead of using the values above
+    PASSWORD_HASH_AUTOTUNE: str = str(config('PASSWORD_HASH_AUTOTUNE', default=''))
+    # concurrent password hashes per process, 0 uses the cpu count
+    PASSWORD_HASH_CONCURRENCY: int = int(config('PASSWORD_HASH_CONCURRENCY', default=0))
+    # KiB that the concurrent argon2 hashes of a process may use together,
+    # calibration lowers ARGON2_MEMORY_COST to fit, 0 means no limit
+    PASSWORD_HASH_MEMORY_BUDGET: int = int(config('PASSWORD_HASH_MEMORY_BUDGET', default=1048576))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(config('PASSWORD_HASH_QUEUE_SIZE', default=100))
+    # queued password hashes a single /24 or /64 client prefix may hold
+    PASSWORD_HASH_QUEUE_PER_CLIENT: int = int(config('PASSWORD_HASH_QUEUE_PER_CLIENT', default=10))
+
+    # bulk user import: rows per batch, hashing processes (0 uses the cpu
+    # count) and how many row errors are reported
+    USER_IMPORT_CHUNK_SIZE: int = int(config('USER_IMPORT_CHUNK_SIZE', default=1000))
+    USER_IMPORT_WORKERS: int = int(config('USER_IMPORT_WORKERS', default=0))
+    USER_IMPORT_MAX_ERRORS: int = int(config('USER_IMPORT_MAX_ERRORS', default=100))
+    # user listing page size limit, and rows fetched per round trip on export
+    USERS_PAGE_MAX_SIZE: int = int(config('USERS_PAGE_MAX_SIZE', default=1000))
+    USERS_EXPORT_BATCH_SIZE: int = int(config('USERS_EXPORT_BATCH_SIZE', default=1000))
+
+    # verified token cache, a size of 0 disables it
+    TOKEN_CACHE_SIZE: int = int(config('TOKEN_CACHE_SIZE', default=10000))
+    TOKEN_CACHE_TTL: int = int(config('TOKEN_CACHE_TTL', default=30))
+
+    # in-process and redis cache of the user fields authenticated requests need
+    USER_CACHE_SIZE: int = int(config('USER_CACHE_SIZE', default=10000))
+    USER_CACHE_TTL: int = int(config('USER_CACHE_TTL', default=30))
+    USER_CACHE_REDIS_TTL: int = int(config('USER_CACHE_REDIS_TTL', default=300))
+
+    # compiled disposable email domains, rebuilt from the source list when
+    # it is newer, and how often workers check either file for changes
+    DISPOSABLE_DOMAINS_PATH: str = project_path(config('DISPOSABLE_DOMAINS_PATH', default='data/disposable_domains.bin'))
+    DISPOSABLE_DOMAINS_SOURCE: str = project_path(config('DISPOSABLE_DOMAINS_SOURCE', default='data/disposable_domains.txt'))
+    DISPOSABLE_DOMAINS_RELOAD_INTERVAL: int = int(config('DISPOSABLE_DOMAINS_RELOAD_INTERVAL', default=30))
+
+    # term lists usernames are checked against
+    OFFENSIVE_WORDS_PATH: str = project_path(config('OFFENSIVE_WORDS_PATH', default='data/offensive_words.txt'))
+    RESERVED_USERNAMES_PATH: str = project_path(config('RESERVED_USERNAMES_PATH', default='data/reserved_usernames.txt'))
+
+    # MX results of email domains, cached in-process and in redis for the
+    # TTL of the DNS answer kept within these bounds, and for
+    # MX_CACHE_NEGATIVE_TTL seconds for domains without mail servers
+    MX_CACHE_SIZE: int = int(config('MX_CACHE_SIZE', default=10000))
+    MX_CACHE_MIN_TTL: int = int(config('MX_CACHE_MIN_TTL', default=60))
+    MX_CACHE_MAX_TTL: int = int(config('MX_CACHE_MAX_TTL', default=86400))
+    MX_CACHE_NEGATIVE_TTL: int = int(config('MX_CACHE_NEGATIVE_TTL', default=600))
+    MX_LOOKUP_TIMEOUT: float = float(config('MX_LOOKUP_TIMEOUT', default=1.0))
+
+    # 'allowlist' stores every issued jti, 'denylist' only stores revoked jtis
+    TOKEN_REVOCATION_MODE: str = str(config('TOKEN_REVOCATION_MODE', default='allowlist'))
+    DENYLIST_FILTER_CAPACITY: int = int(config('DENYLIST_FILTER_CAPACITY', default=100000))
+    DENYLIST_SYNC_INTERVAL: int = int(config('DENYLIST_SYNC_INTERVAL', default=60))
+
 settings = Settings()
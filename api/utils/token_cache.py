@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Verified token cache module
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.db.redis_database import get_redis_sync
+from api.utils.invalidation_listener import on_channel
+from api.utils.settings import settings
+
+# redis channel that revoked jtis are published on
+REVOCATION_CHANNEL = 'jti_revocations'
+# redis channel that users whose sessions were all revoked are published on
+USER_REVOCATION_CHANNEL = 'user_revocations'
+# functions called with every jti revoked by any process
+revocation_handlers: List[Callable[[str], None]] = []
+# functions called with every user whose sessions were all revoked
+user_revocation_handlers: List[Callable[[str], None]] = []
+
+
+def hash_token(token: str) -> str:
+    """
+    Hashes a token so raw tokens are never kept in memory as keys.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of claims for tokens that already passed signature and
+    revocation checks.
+
+    Entries live until the cache ttl or the token's exp, whichever comes
+    first, and are dropped as soon as their jti is revoked.
+
+    Every revocation bumps a generation, a token checked before the last
+    revocation is not cached since the revocation may have been its own.
+    """
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[dict, float]] = OrderedDict()
+        self._jti_keys: Dict[str, str] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        Gets the generation to read before checking a token's revocation.
+        """
+        return self._generation
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        Returns the cached claims of a token, or None.
+        """
+        if not self.max_size:
+            return None
+        key = hash_token(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            claims, expires_at = entry
+            if expires_at <= now:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, token: str, claims: dict,
+            generation: Optional[int] = None) -> None:
+        """
+        Caches the claims of a verified token.
+
+        Args:
+            token: the raw token.
+            claims: its decoded claims.
+            generation: the generation read before the token's revocation
+                was checked, the token is not cached if a jti was revoked
+                since.
+        """
+        if not self.max_size:
+            return
+        key = hash_token(token)
+        expires_at = time.time() + self.ttl
+        if claims.get('exp'):
+            expires_at = min(expires_at, float(claims['exp']))
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            if claims.get('jti'):
+                self._jti_keys[claims['jti']] = key
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate_jti(self, jti: str) -> None:
+        """
+        Drops the cached claims of a revoked jti.
+        """
+        with self._lock:
+            self._generation += 1
+            key = self._jti_keys.get(jti)
+            if key:
+                self._pop(key)
+
+    def clear(self) -> None:
+        """
+        Drops every cached token.
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._jti_keys.clear()
+
+    def _pop(self, key: str) -> None:
+        """
+        Removes an entry, the lock must be held.
+        """
+        claims, _ = self._entries.pop(key)
+        jti = claims.get('jti')
+        if jti and self._jti_keys.get(jti) == key:
+            del self._jti_keys[jti]
+
+
+def on_revocation(handler: Callable[[str], None]) -> None:
+    """
+    Registers a function to call with every revoked jti.
+    """
+    revocation_handlers.append(handler)
+
+
+def handle_revocation(jti: str) -> None:
+    """
+    Applies a revoked jti to the local cache and handlers.
+    """
+    verified_token_cache.invalidate_jti(jti)
+    for handler in revocation_handlers:
+        handler(jti)
+
+
+def publish_revocation(jti: str) -> None:
+    """
+    Tells every process to drop a revoked jti from its cache.
+    """
+    handle_revocation(jti)
+    try:
+        with get_redis_sync() as redis:
+            redis.publish(REVOCATION_CHANNEL, jti)
+    except Exception as exc:
+        print(f'error publishing revocation: {exc}')
+
+
+def on_user_revocation(handler: Callable[[str], None]) -> None:
+    """
+    Registers a function to call with every user whose sessions were revoked.
+    """
+    user_revocation_handlers.append(handler)
+
+
+def handle_user_revocation(user_id: str) -> None:
+    """
+    Applies a revoke-all of a user's sessions to the local handlers.
+    """
+    for handler in user_revocation_handlers:
+        handler(user_id)
+
+
+def publish_user_revocation(user_id: str) -> None:
+    """
+    Tells every process that all sessions of a user were revoked.
+    """
+    handle_user_revocation(user_id)
+    try:
+        with get_redis_sync() as redis:
+            redis.publish(USER_REVOCATION_CHANNEL, user_id)
+    except Exception as exc:
+        print(f'error publishing user revocation: {exc}')
+
+
+# create a process wide cache of verified tokens
+verified_token_cache = VerifiedTokenCache(
+    max_size=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL
+)
+# drop tokens revoked by other processes, and every token if revocations
+# may have been missed
+on_channel(REVOCATION_CHANNEL, handle_revocation,
+           reset=verified_token_cache.clear)
+on_channel(USER_REVOCATION_CHANNEL, handle_user_revocation)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Token claims module
+
+Version 1 tokens carry the client ip and full User-Agent header with long
+claim names. Version 2 tokens replace them with a short keyed fingerprint
+and use short claim names and integer timestamps, so they are smaller to
+send, sign and decode. Both are expanded to the version 1 claim names
+after decoding, so the rest of the app reads claims the same way.
+"""
+import hmac
+import base64
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from api.utils.settings import settings
+
+TOKEN_FORMAT_VERSION: int = settings.TOKEN_FORMAT_VERSION
+FINGERPRINT_KEY: bytes = (settings.TOKEN_FINGERPRINT_KEY
+                          or settings.SECRET_KEY).encode()
+
+TOKEN_TYPES = {'access': 'a', 'refresh': 'r'}
+SHORT_TOKEN_TYPES = {short: name for name, short in TOKEN_TYPES.items()}
+
+
+def fingerprint(ip: Optional[str], user_agent: Optional[str]) -> str:
+    """
+    Gets a short keyed hash of the attributes a token is bound to.
+    """
+    message = f'{ip or ""}\n{user_agent or ""}'.encode()
+    digest = hmac.new(FINGERPRINT_KEY, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b'=').decode()
+
+
+def build_claims(user_id: str, token_type: str, jti: str, issued_at: datetime,
+                 expires_at: datetime, ip: Optional[str],
+                 user_agent: Optional[str], generation: int) -> dict:
+    """
+    Builds the claims of a new token in the configured format.
+    """
+    if TOKEN_FORMAT_VERSION == 1:
+        return {
+            'user_id': user_id,
+            'token_type': token_type,
+            'jti': jti,
+            'iat': issued_at,
+            'ip': ip,
+            'user_agent': user_agent,
+            'exp': expires_at,
+            'gen': generation
+        }
+    return {
+        'v': 2,
+        'sub': user_id,
+        'typ': TOKEN_TYPES[token_type],
+        'jti': jti,
+        'iat': int(issued_at.timestamp()),
+        'exp': int(expires_at.timestamp()),
+        'fp': fingerprint(ip, user_agent),
+        'gen': generation
+    }
+
+
+def expand_claims(claims: dict) -> dict:
+    """
+    Expands decoded claims of either format to the version 1 claim names.
+    """
+    if claims.get('v') != 2:
+        return claims
+    return {
+        'v': 2,
+        'user_id': claims.get('sub'),
+        'token_type': SHORT_TOKEN_TYPES.get(claims.get('typ'), ''),
+        'jti': claims.get('jti'),
+        'iat': claims.get('iat'),
+        'exp': claims.get('exp'),
+        'fp': claims.get('fp'),
+        'gen': claims.get('gen', 0)
+    }
+
+
+def binding_error(claims: dict, ip: Optional[str],
+                  user_agent: Optional[str]) -> Optional[str]:
+    """
+    Checks that a token is used by the client it was issued to.
+
+    Returns:
+        None if the binding matches, otherwise the reason it does not.
+    """
+    if claims.get('v') == 2:
+        if not hmac.compare_digest(claims.get('fp') or '',
+                                   fingerprint(ip, user_agent)):
+            return 'Token binding mismatch'
+        return None
+    if claims.get('ip') != ip:
+        return 'IP address mismatch'
+    if claims.get('user_agent') != user_agent:
+        return 'User-Agent mismatch'
+    return None
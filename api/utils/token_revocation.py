@@ -1,17 +1,179 @@
+import time
+import threading
+from typing import List, Optional, Tuple
+
 from api.db.redis_database import get_redis_sync
+from api.utils.bloom_filter import BloomFilter
+from api.utils.invalidation_listener import on_reset
+from api.utils.settings import settings
+from api.utils.session_registry import (queue_session_removal, sessions_key,
+                                        session_member)
+from api.utils.token_cache import publish_revocation, on_revocation
+
+DENYLIST_MODE: bool = settings.TOKEN_REVOCATION_MODE == 'denylist'
+# sorted set of revoked jtis scored by their token's exp
+REVOKED_JTIS_KEY = 'revoked_jtis'
+# marks a refresh jti as exchanged unless it already was, deactivates it
+# and removes it from its user's sessions
+ROTATE_REFRESH_SCRIPT = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    redis.call('DEL', KEYS[2])
+    redis.call('ZREM', KEYS[3], ARGV[2])
+    return 1
+end
+return 0
+"""
 
-def store_jti_in_cache(jti: str, exp: int, token_type: str) -> None:
+
+class RevokedJtiFilter:
     """
-    Caches the jti on jwt token generation.
+    Local Bloom filter of revoked jtis, rebuilt from redis periodically by
+    a background thread.
+
+    A jti that is not in the filter was never revoked, so redis only
+    needs to be asked about jtis the filter reports as maybe revoked.
+    Until the filter is built, and after revocations may have been missed,
+    every jti is reported as maybe revoked.
+    """
+    def __init__(self, capacity: int, sync_interval: int):
+        self.capacity = capacity
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._filter: Optional[BloomFilter] = None
+        # jtis added while a rebuild is reading redis, replayed into it
+        self._pending: Optional[List[str]] = None
+        self._resets = 0
+        self._resync = threading.Event()
+
+    def add(self, jti: str) -> None:
+        """
+        Adds a revoked jti to the filter.
+        """
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+            if self._pending is not None:
+                self._pending.append(jti)
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """
+        Returns False if the jti is certainly not revoked.
+        """
+        with self._lock:
+            return self._filter is None or jti in self._filter
+
+    def reset(self) -> None:
+        """
+        Drops the filter after revocations may have been missed, and has
+        it rebuilt right away.
+        """
+        with self._lock:
+            self._filter = None
+            self._resets += 1
+        self._resync.set()
+
+    def sync(self) -> bool:
+        """
+        Rebuilds the filter from the unexpired jtis in redis.
+
+        Returns:
+            False if the filter was kept, because redis failed or the
+            filter was reset during the rebuild.
+        """
+        with self._lock:
+            self._pending = []
+            resets = self._resets
+        now = time.time()
+        try:
+            with get_redis_sync() as redis:
+                pipe = redis.pipeline()
+                pipe.zremrangebyscore(REVOKED_JTIS_KEY, '-inf', now)
+                pipe.zrangebyscore(REVOKED_JTIS_KEY, now, '+inf')
+                _, revoked = pipe.execute()
+        except Exception as exc:
+            print(f'error syncing revoked jtis: {exc}')
+            # keep the current filter and retry on the next interval
+            with self._lock:
+                self._pending = None
+            return False
+        # leave room for revocations until the next sync
+        new_filter = BloomFilter(max(self.capacity, 2 * len(revoked)))
+        new_filter.update(revoked)
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if resets != self._resets:
+                return False
+            new_filter.update(pending)
+            self._filter = new_filter
+        return True
+
+    def run(self) -> None:
+        """
+        Rebuilds the filter every sync interval, or as soon as it is reset.
+        """
+        while True:
+            self.sync()
+            self._resync.wait(self.sync_interval)
+            self._resync.clear()
+
+    def start(self) -> threading.Thread:
+        """
+        Starts rebuilding the filter in a daemon thread.
+        """
+        syncer = threading.Thread(
+            target=self.run,
+            name='revoked-jti-sync',
+            daemon=True
+        )
+        syncer.start()
+        return syncer
+
+
+revoked_jti_filter = RevokedJtiFilter(
+    capacity=settings.DENYLIST_FILTER_CAPACITY,
+    sync_interval=settings.DENYLIST_SYNC_INTERVAL
+)
+# add jtis revoked by other processes to the local filter
+on_revocation(revoked_jti_filter.add)
+# rebuild the filter if the listener missed revocations while reconnecting
+on_reset(revoked_jti_filter.reset)
+
+
+def get_ttl(exp: int, token_type: str) -> int:
+    """
+    Gets the lifetime in seconds of a token type.
     """
     if token_type == 'access':
-        expire_at = 60 * exp
-    else:
-        expire_at = 60 * 60 * 24 * exp
+        return 60 * exp
+    return 60 * 60 * 24 * exp
+
+
+def queue_jti_in_cache(pipe, jti: str, expire_in: int, token_type: str) -> None:
+    """
+    Queues caching the jti on a redis pipeline.
+
+    Args:
+        pipe: a redis pipeline or client.
+        jti: the token id.
+        expire_in: seconds until the token expires.
+        token_type: access or refresh.
+    """
+    if DENYLIST_MODE:
+        # only revoked jtis are stored in denylist mode
+        return
     key: str = f'jti_{jti}_{token_type}'
+    pipe.set(key, 'active', ex=expire_in)
+
+
+def store_jti_in_cache(jti: str, expire_in: int, token_type: str) -> None:
+    """
+    Caches the jti on jwt token generation.
+    """
+    if DENYLIST_MODE:
+        return
     try:
         with get_redis_sync() as redis:
-            redis.set(key, 'active', ex=expire_at)
+            queue_jti_in_cache(redis, jti, expire_in, token_type)
     except Exception as exc:
         print(exc)
 
@@ -20,6 +182,17 @@ def check_active_jti(jti: str, token_type: str) -> bool:
     """
     Check if the JTI (token ID) is active in the cache.
     """
+    if DENYLIST_MODE:
+        if not revoked_jti_filter.might_be_revoked(jti):
+            return True
+        key: str = f'revoked_jti_{jti}'
+        try:
+            with get_redis_sync() as redis:
+                return not redis.exists(key)
+        except Exception as exc:
+            print(exc)
+            return False
+
     key: str = f'jti_{jti}_{token_type}'
     try:
         with get_redis_sync() as redis:
@@ -28,11 +201,108 @@ def check_active_jti(jti: str, token_type: str) -> bool:
         print(exc)
         return False
 
-def revoke_jti(jti: str, token_type: str):
+def check_active_jtis(tokens: List[Tuple[str, str]]) -> List[bool]:
     """
-    Revokes token.
+    Checks many (jti, token_type) pairs with one pipelined redis lookup.
+    """
+    if DENYLIST_MODE:
+        active = [True] * len(tokens)
+        # only ask redis about jtis the filter reports as maybe revoked
+        maybe_revoked = [
+            index for index, (jti, _) in enumerate(tokens)
+            if revoked_jti_filter.might_be_revoked(jti)
+        ]
+        if not maybe_revoked:
+            return active
+        try:
+            with get_redis_sync() as redis:
+                pipe = redis.pipeline(transaction=False)
+                for index in maybe_revoked:
+                    pipe.exists(f'revoked_jti_{tokens[index][0]}')
+                results = pipe.execute()
+        except Exception as exc:
+            print(exc)
+            results = [True] * len(maybe_revoked)
+        for index, revoked in zip(maybe_revoked, results):
+            active[index] = not revoked
+        return active
+
+    if not tokens:
+        return []
+    try:
+        with get_redis_sync() as redis:
+            pipe = redis.pipeline(transaction=False)
+            for jti, token_type in tokens:
+                pipe.get(f'jti_{jti}_{token_type}')
+            return [value == 'active' for value in pipe.execute()]
+    except Exception as exc:
+        print(exc)
+        return [False] * len(tokens)
+
+
+def rotated_jti_key(jti: str) -> str:
+    """
+    Gets the redis key marking a refresh jti as already exchanged.
     """
-    key = f"jti_{jti}_{token_type}"
+    return f'rotated_jti_{jti}'
 
+
+def is_rotated_jti(jti: str) -> bool:
+    """
+    Checks if a refresh jti was already exchanged for new tokens.
+    """
+    with get_redis_sync() as redis:
+        return bool(redis.exists(rotated_jti_key(jti)))
+
+
+def rotate_refresh_jti(jti: str, exp: int, user_id: str) -> bool:
+    """
+    Marks a refresh jti as exchanged, deactivates it and removes it from
+    the user's sessions in one atomic step.
+
+    Returns:
+        False if the jti had already been exchanged.
+    """
+    expire_in = max(int(exp) - int(time.time()), 1)
+    with get_redis_sync() as redis:
+        rotated = redis.eval(
+            ROTATE_REFRESH_SCRIPT,
+            3,
+            rotated_jti_key(jti),
+            f'jti_{jti}_refresh',
+            sessions_key(user_id),
+            expire_in,
+            session_member(jti, 'refresh')
+        )
+    return bool(rotated)
+
+
+def revoke_jti(jti: str, token_type: str, exp: Optional[int] = None,
+               user_id: Optional[str] = None):
+    """
+    Revokes token.
+
+    Args:
+        jti: the token id.
+        token_type: access or refresh.
+        exp: the token's expiry timestamp, required in denylist mode so the
+            revocation is kept only as long as the token is valid.
+        user_id: the token's user, whose session list the token is
+            removed from.
+    """
     with get_redis_sync() as redis:
-        redis.delete(key)
+        pipe = redis.pipeline()
+        if DENYLIST_MODE:
+            now = int(time.time())
+            exp = int(exp) if exp else now + get_ttl(
+                settings.REFRESH_TOKEN_EXPIRE, 'refresh'
+            )
+            pipe.set(f'revoked_jti_{jti}', '1', ex=max(exp - now, 1))
+            pipe.zadd(REVOKED_JTIS_KEY, {jti: exp})
+        else:
+            pipe.delete(f"jti_{jti}_{token_type}")
+        if user_id:
+            queue_session_removal(pipe, user_id, jti, token_type)
+        pipe.execute()
+    # drop the token from every process's verified token cache
+    publish_revocation(jti)
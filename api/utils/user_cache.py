@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Cached user lookup module
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from api.db.redis_database import get_redis_sync
+from api.utils.settings import settings
+from api.utils.invalidation_listener import on_channel
+from api.v1.schemas.user import CurrentUser
+
+# redis channel that users whose cached fields changed are published on
+USER_CACHE_CHANNEL = 'user_cache_invalidations'
+# seconds an invalidated user cannot be cached in redis again, so a
+# request that read the user before the change cannot cache the old row
+TOMBSTONE_TTL = 5
+TOMBSTONE = ''
+
+
+def user_cache_key(user_id: str) -> str:
+    """
+    Gets the redis key of a user's cached fields.
+    """
+    return f'user:{user_id}'
+
+
+class UserCache:
+    """
+    Read-through cache of the user fields authenticated requests need.
+
+    A bounded in-process LRU sits in front of a shared redis copy, so most
+    requests neither query the database nor call redis. Writers call
+    invalidate after committing, which drops the redis copy and the copy
+    in every process.
+    """
+    def __init__(self, max_size: int, ttl: int, redis_ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[CurrentUser, float]] = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[CurrentUser]:
+        """
+        Returns the cached fields of a user, or None.
+        """
+        user = self._get_local(user_id)
+        if user is not None:
+            return user
+        try:
+            with get_redis_sync() as redis:
+                value = redis.get(user_cache_key(user_id))
+        except Exception as exc:
+            print(f'error reading cached user: {exc}')
+            return None
+        if not value:
+            return None
+        user = CurrentUser.model_validate_json(value)
+        self._set_local(user)
+        return user
+
+    def set(self, user: CurrentUser) -> CurrentUser:
+        """
+        Caches the fields of a user read from the database.
+        """
+        try:
+            with get_redis_sync() as redis:
+                # NX keeps a tombstone or a newer copy in place
+                cached = redis.set(user_cache_key(user.id),
+                                   user.model_dump_json(),
+                                   ex=self.redis_ttl, nx=True)
+        except Exception as exc:
+            print(f'error caching user: {exc}')
+            return user
+        if cached:
+            self._set_local(user)
+        return user
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Drops a user's cached fields in every process.
+        """
+        self.drop(user_id)
+        try:
+            with get_redis_sync() as redis:
+                pipe = redis.pipeline()
+                pipe.set(user_cache_key(user_id), TOMBSTONE, ex=TOMBSTONE_TTL)
+                pipe.publish(USER_CACHE_CHANNEL, user_id)
+                pipe.execute()
+        except Exception as exc:
+            print(f'error invalidating cached user: {exc}')
+
+    def drop(self, user_id: str) -> None:
+        """
+        Drops a user's cached fields in this process.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """
+        Drops every user cached in this process.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _get_local(self, user_id: str) -> Optional[CurrentUser]:
+        """
+        Returns a user from the in-process cache, or None.
+        """
+        if not self.max_size:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not entry:
+                return None
+            user, expires_at = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def _set_local(self, user: CurrentUser) -> None:
+        """
+        Adds a user to the in-process cache.
+        """
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL,
+    redis_ttl=settings.USER_CACHE_REDIS_TTL
+)
+# drop users changed by other processes
+on_channel(USER_CACHE_CHANNEL, user_cache.drop, reset=user_cache.clear)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Username matcher module
+
+Offensive words and reserved usernames are compiled into one Aho-Corasick
+automaton, so checking a username is a single pass over its characters
+whatever the number of terms.
+"""
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List
+
+from api.utils.settings import settings
+
+# the username contains an offensive word
+OFFENSIVE = 1
+# the whole username is reserved
+RESERVED = 2
+
+
+def normalize_username(username: str) -> str:
+    """
+    Normalizes a username or term the way usernames are stored.
+    """
+    return unicodedata.normalize('NFKC', username).lower()
+
+
+class AhoCorasick:
+    """
+    Finds every term in a text in one pass.
+
+    Terms are tagged with kinds, a search returns the kinds of the terms
+    found. A RESERVED term only counts when it is the whole text.
+    """
+    def __init__(self, terms: Dict[str, int]):
+        # the trie of the terms, state 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._depth: List[int] = [0]
+        # kinds of the terms that end at a state
+        self._own: List[int] = [0]
+        for term, kinds in terms.items():
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._depth.append(self._depth[state] + 1)
+                    self._own.append(0)
+                state = next_state
+            self._own[state] |= kinds
+
+        # fail links point to the longest proper suffix that is in the trie,
+        # and a state also reports the offensive terms of its suffixes
+        self._fail: List[int] = [0] * len(self._goto)
+        self._out: List[int] = [kinds & OFFENSIVE for kinds in self._own]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] |= self._out[self._fail[next_state]]
+                queue.append(next_state)
+
+    def search(self, text: str) -> int:
+        """
+        Gets the kinds of the terms found in a text.
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        state = 0
+        found = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found |= out[state]
+        if self._depth[state] == len(text):
+            found |= self._own[state] & RESERVED
+        return found
+
+
+def read_terms(path: str) -> List[str]:
+    """
+    Reads a term list, one term per line, skipping blank lines and '#'
+    comments.
+
+    Raises:
+        OSError: if the list cannot be read, so a missing list stops the
+            startup instead of letting every username through.
+    """
+    with open(path, encoding='utf-8') as terms:
+        return [line.split('#', 1)[0].strip() for line in terms
+                if line.split('#', 1)[0].strip()]
+
+
+def build_matcher(offensive_words: Iterable[str],
+                  reserved_usernames: Iterable[str]) -> AhoCorasick:
+    """
+    Compiles the offensive words and reserved usernames, normalized like
+    usernames, into one automaton.
+    """
+    terms: Dict[str, int] = {}
+    for word in offensive_words:
+        word = normalize_username(word)
+        terms[word] = terms.get(word, 0) | OFFENSIVE
+    for username in reserved_usernames:
+        username = normalize_username(username)
+        terms[username] = terms.get(username, 0) | RESERVED
+    terms.pop('', None)
+    return AhoCorasick(terms)
+
+
+# compiled once per process
+username_matcher = build_matcher(
+    read_terms(settings.OFFENSIVE_WORDS_PATH),
+    read_terms(settings.RESERVED_USERNAMES_PATH)
+)
@@ -16,3 +16,6 @@ class Organization(Mixin, Base):
     name: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
     description: Mapped[str] = mapped_column(String(150), nullable=False)
     owner_email: Mapped[str] = mapped_column(String(50), nullable=False)
+    # requests its users may make per minute, ORG_REQUESTS_PER_MINUTE if
+    # unset and no limit if 0
+    requests_per_minute: Mapped[int] = mapped_column(nullable=True)
@@ -1,18 +1,17 @@
-from sqlalchemy import String, DateTime
+from sqlalchemy import String, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import mapped_column, Mapped
 from passlib.context import CryptContext
 from datetime import datetime
+from typing import Optional, Tuple
 
 from api.v1.models.base_model import Mixin
 from api.db.database import Base
 from api.utils.settings import settings
+from api.utils.password_hashing import build_password_context
 
 SECRET_KEY: str = settings.SECRET_KEY
 
-password_context: CryptContext = CryptContext(
-    schemes=['bcrypt'],
-    deprecated='auto'
-)
+password_context: CryptContext = build_password_context()
 
 class User(Mixin, Base):
     email: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
@@ -25,10 +24,14 @@ class User(Mixin, Base):
     is_blocked: Mapped[bool] = mapped_column(default=False)
     blocked_reason: Mapped[str] = mapped_column(nullable=True)
     lockout_expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    organization_id: Mapped[str] = mapped_column(
+        ForeignKey('organizations.id', ondelete='SET NULL'),
+        nullable=True
+    )
 
     def set_password(self, plain_password: str) -> None:
         '''
-        Hashes user password using bcrypt
+        Hashes user password using the preferred password scheme
         '''
         if not isinstance(plain_password, str) or not plain_password:
             raise ValueError(f'{plain_password} must be a string')
@@ -45,3 +48,45 @@ class User(Mixin, Base):
             secret=plain_password,
             hash=self.password
         )
+
+    def verify_and_update_password(self, plain_password: str) -> bool:
+        '''
+        Compares the hashed password with provided password, and rehashes
+        the password when its scheme or cost parameters are outdated.
+        '''
+        valid, new_hash = verify_and_update_password_hash(plain_password,
+                                                          self.password)
+        if valid and new_hash:
+            self.password = new_hash
+        return valid
+
+
+def verify_and_update_password_hash(plain_password: str,
+                                    password_hash: str) -> Tuple[bool, Optional[str]]:
+    '''
+    Compares a password hash with provided password
+
+    Returns:
+        whether the password is valid, and a new hash if the hash's scheme
+        or cost parameters are outdated.
+    '''
+    if not plain_password:
+        raise ValueError(f'{plain_password} must be provided')
+    return password_context.verify_and_update(
+        secret=plain_password,
+        hash=password_hash
+    )
+
+
+# replayed registrations are found by their idempotency key
+Index('ix_users_idempotency_key', User.idempotency_key, unique=True)
+# login input is lower-cased, so emails and usernames are matched with
+# lower(), and are unique regardless of case so a login finds one user
+Index('ix_users_lower_email', func.lower(User.email), unique=True)
+Index('ix_users_lower_username', func.lower(User.username), unique=True)
+# users are listed in (created_at, id) order
+Index('ix_users_created_at_id', User.created_at, User.id)
+# deleting an organization sets its members' organization_id without
+# scanning every user
+Index('ix_users_organization_id', User.organization_id,
+      postgresql_where=User.organization_id.is_not(None))
@@ -0,0 +1,2 @@
+from api.v1.repositories.user import user_repository
+from api.v1.repositories.organization import organization_repository
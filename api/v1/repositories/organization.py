@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Organization repository module
+"""
+from typing import Optional
+from sqlalchemy import Row, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.models import Organization, User
+
+organizations = Organization.__table__
+users = User.__table__
+
+# the organization and quota of a user, no row if it is in none
+MEMBER_QUOTA = select(
+    users.c.organization_id,
+    organizations.c.requests_per_minute
+).join_from(
+    users, organizations, users.c.organization_id == organizations.c.id
+).where(users.c.id == bindparam('user_id'))
+
+
+class OrganizationRepository:
+    """
+    Organization queries.
+    """
+    async def get_member_quota(self, db: AsyncSession,
+                               user_id: str) -> Optional[Row]:
+        """
+        Gets the organization_id and requests_per_minute of a user's
+        organization.
+        """
+        result = await db.execute(MEMBER_QUOTA, {'user_id': user_id})
+        return result.one_or_none()
+
+
+# create an instance of the OrganizationRepository class
+organization_repository = OrganizationRepository()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+User repository module
+
+Core statements for the hottest user queries. They return plain rows
+with only the columns the caller needs instead of User objects, and are
+built once so SQLAlchemy compiles each of them a single time and asyncpg
+reuses its prepared statement on every connection.
+"""
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from sqlalchemy import (Row, String, any_, bindparam, func, or_, select, text,
+                        tuple_, union_all, update)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.models import User
+
+users = User.__table__
+
+# the fields of the current user of an authenticated request
+CURRENT_USER_COLUMNS = (
+    users.c.id,
+    users.c.username,
+    users.c.first_name,
+    users.c.last_name,
+    users.c.is_active,
+    users.c.is_blocked,
+    users.c.lockout_expires_at,
+)
+# the fields login checks and returns
+LOGIN_COLUMNS = (
+    users.c.id,
+    users.c.email,
+    users.c.username,
+    users.c.first_name,
+    users.c.last_name,
+    users.c.password,
+    users.c.is_active,
+    users.c.is_blocked,
+    users.c.lockout_expires_at,
+)
+
+USER_BY_ID = select(*CURRENT_USER_COLUMNS).where(
+    users.c.id == bindparam('user_id')
+)
+# each branch probes one lower() index and a matching email wins
+USER_BY_LOGIN = union_all(
+    select(*LOGIN_COLUMNS).where(
+        func.lower(users.c.email) == bindparam('login')
+    ),
+    select(*LOGIN_COLUMNS).where(
+        func.lower(users.c.username) == bindparam('login')
+    )
+).limit(1)
+LOCKOUT_STATE = select(
+    users.c.is_blocked,
+    users.c.lockout_expires_at
+).where(users.c.id == bindparam('user_id')).with_for_update()
+SET_LOCKOUT = update(users).where(
+    users.c.id == bindparam('user_id')
+).values(
+    is_blocked=bindparam('blocked'),
+    lockout_expires_at=bindparam('expires_at')
+)
+SET_PASSWORD = update(users).where(
+    users.c.id == bindparam('user_id')
+).values(password=bindparam('password_hash'))
+# the lower-cased emails and usernames of a batch that are already taken
+EXISTING_LOGINS = select(
+    func.lower(users.c.email).label('email'),
+    func.lower(users.c.username).label('username')
+).where(or_(
+    func.lower(users.c.email) == any_(bindparam('emails', type_=ARRAY(String))),
+    func.lower(users.c.username) == any_(bindparam('usernames',
+                                                   type_=ARRAY(String)))
+))
+
+# the fields users are listed and exported with
+LIST_COLUMNS = (
+    users.c.id,
+    users.c.email,
+    users.c.username,
+    users.c.first_name,
+    users.c.last_name,
+    users.c.is_active,
+    users.c.is_blocked,
+    users.c.created_at,
+)
+FIRST_USERS_PAGE = select(*LIST_COLUMNS).order_by(
+    users.c.created_at,
+    users.c.id
+).limit(bindparam('limit'))
+# keyset pagination: the page after the last (created_at, id) seen
+NEXT_USERS_PAGE = FIRST_USERS_PAGE.where(
+    tuple_(users.c.created_at, users.c.id) >
+    tuple_(bindparam('after_created_at'), bindparam('after_id'))
+)
+ALL_USERS = select(*LIST_COLUMNS)
+
+# the columns bulk imported users are copied with, the rest use defaults
+IMPORT_COLUMNS = (
+    'id',
+    'email',
+    'username',
+    'first_name',
+    'last_name',
+    'password',
+    'idempotency_key',
+    'is_active',
+    'is_blocked',
+)
+_import_columns = ', '.join(IMPORT_COLUMNS)
+CREATE_IMPORT_TABLE = text(
+    f'CREATE TEMP TABLE users_import ON COMMIT DROP AS '
+    f'SELECT {_import_columns} FROM public.users WITH NO DATA'
+)
+INSERT_IMPORTED = text(
+    f'INSERT INTO public.users ({_import_columns}) '
+    f'SELECT {_import_columns} FROM users_import ON CONFLICT DO NOTHING'
+)
+
+
+class UserRepository:
+    """
+    Hot path user queries that bypass the ORM.
+    """
+    async def get_current_user(self, db: AsyncSession,
+                               user_id: str) -> Optional[Row]:
+        """
+        Gets the fields of CurrentUser for a user id.
+        """
+        result = await db.execute(USER_BY_ID, {'user_id': user_id})
+        return result.one_or_none()
+
+    async def get_by_login(self, db: AsyncSession, login: str) -> Optional[Row]:
+        """
+        Gets a user by lower-cased email or username.
+        """
+        result = await db.execute(USER_BY_LOGIN, {'login': login})
+        return result.one_or_none()
+
+    async def get_lockout_state(self, db: AsyncSession,
+                                user_id: str) -> Optional[Row]:
+        """
+        Gets and locks a user's is_blocked and lockout_expires_at.
+        """
+        result = await db.execute(LOCKOUT_STATE, {'user_id': user_id})
+        return result.one_or_none()
+
+    async def set_lockout(self, db: AsyncSession, user_id: str, blocked: bool,
+                          expires_at: Optional[datetime]) -> bool:
+        """
+        Blocks or unblocks a user.
+
+        Returns:
+            False if there is no user with the id.
+        """
+        result = await db.execute(SET_LOCKOUT, {
+            'user_id': user_id,
+            'blocked': blocked,
+            'expires_at': expires_at
+        })
+        return result.rowcount > 0
+
+    async def set_password(self, db: AsyncSession, user_id: str,
+                           password_hash: str) -> None:
+        """
+        Saves a new password hash.
+        """
+        await db.execute(SET_PASSWORD, {
+            'user_id': user_id,
+            'password_hash': password_hash
+        })
+
+    async def get_existing_logins(self, db: AsyncSession, emails: List[str],
+                                  usernames: List[str]) -> List[Row]:
+        """
+        Gets the users that already have one of the emails or usernames,
+        which are passed and returned lower-cased.
+        """
+        result = await db.execute(EXISTING_LOGINS, {
+            'emails': emails,
+            'usernames': usernames
+        })
+        return result.all()
+
+    async def copy_users(self, db: AsyncSession,
+                         records: Sequence[Tuple]) -> int:
+        """
+        Loads users with COPY, skipping any that conflict with existing users.
+
+        Records are tuples in IMPORT_COLUMNS order. They are copied into a
+        temporary table, then inserted from it, so a user registered
+        meanwhile does not fail the whole batch. The caller commits.
+
+        Returns:
+            the number of users inserted.
+        """
+        conn = await db.connection()
+        # start the transaction through SQLAlchemy so COPY runs inside it
+        await conn.execute(CREATE_IMPORT_TABLE)
+        raw_connection = await conn.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            'users_import',
+            records=records,
+            columns=IMPORT_COLUMNS
+        )
+        result = await conn.execute(INSERT_IMPORTED)
+        return result.rowcount
+
+    async def list_users(self, db: AsyncSession, limit: int,
+                         after: Optional[Tuple[datetime, str]] = None
+                         ) -> List[Row]:
+        """
+        Gets a page of users in (created_at, id) order.
+
+        Args:
+            after: the (created_at, id) of the last user of the previous page.
+        """
+        if after is None:
+            result = await db.execute(FIRST_USERS_PAGE, {'limit': limit})
+        else:
+            result = await db.execute(NEXT_USERS_PAGE, {
+                'limit': limit,
+                'after_created_at': after[0],
+                'after_id': after[1]
+            })
+        return result.all()
+
+    async def stream_users(self, db: AsyncSession,
+                           batch_size: int) -> AsyncIterator[Sequence[Row]]:
+        """
+        Streams every user from a server-side cursor in batches.
+        """
+        result = await db.stream(
+            ALL_USERS.execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+
+
+# create an instance of the UserRepository class
+user_repository = UserRepository()
@@ -1,9 +1,12 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, status, Request
+from typing import Annotated, Literal, Optional
+from fastapi import APIRouter, Depends, status, Request, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.utils.check_rate_limit import check_rate_limits_sync
+from api.utils.check_rate_limit import (check_rate_limits_sync,
+                                        check_organization_quota_sync)
+from api.utils.organization_quotas import organization_quotas
 from api.utils.background.producer import send_to_queue_sync
 from api.v1.services.auth import (RegisterUserResponse,
                                   auth_service,
@@ -11,9 +14,21 @@ from api.v1.services.auth import (RegisterUserResponse,
                                   oauth2_scheme,
                                   OAuth2,
                                   AccessToken,
-                                  LogOutResponse)
-from api.db.database import get_db
-from api.v1.schemas.user import LoginUserSchema, LoginUserResponse
+                                  LogOutResponse,
+                                  SessionsResponse,
+                                  RefreshToken,
+                                  RefreshTokenResponse,
+                                  IntrospectTokensSchema,
+                                  IntrospectionResponse)
+from api.v1.services.user_import import (user_import_service,
+                                         ImportUsersResponse)
+from api.core.dependencies.internal_auth import require_internal_api_key
+from api.db.database import get_db, release_db
+from api.utils.settings import settings
+from api.utils.responses import model_response
+from api.v1.schemas.user import (LoginUserSchema,
+                                 LoginUserResponse,
+                                 UsersPageResponse)
 
 
 auth = APIRouter(prefix='/auth', tags=['AUTH'])
@@ -31,13 +46,13 @@ async def login(request: Request,
     path: str = request.url.path
     message_body: str = f'{user_ip},{path}'
     send_to_queue_sync(message_body)
-    return await auth_service.login_user(
+    return model_response(await auth_service.login_user(
         username=login_schema.username,
         password=login_schema.password,
         request=request,
         db=db,
         remember_me=login_schema.remember_me
-    )
+    ))
 
 
 @auth.post('/register',
@@ -53,9 +68,10 @@ async def register(request: Request,
     path: str = request.url.path
     message_body: str = f'{user_ip},{path}'
     send_to_queue_sync(message_body)
-    return await auth_service.create(
+    return model_response(await auth_service.create(
         user_schema=register_schema,
-        db=db)
+        db=db,
+        request=request), status.HTTP_201_CREATED)
 
 @auth.post('/token',
            status_code=status.HTTP_200_OK,
@@ -72,13 +88,81 @@ async def token(request: Request,
     message_body: str = f'{user_ip},{path}'
     send_to_queue_sync(message_body)
     
-    return await auth_service.oauth2_authenticate(
+    return model_response(await auth_service.oauth2_authenticate(
         username=form_data.username,
         password=form_data.password,
         db=db,
         request=request
+    ))
+
+@auth.post('/refresh',
+           status_code=status.HTTP_200_OK,
+           response_model=RefreshTokenResponse)
+async def refresh(request: Request,
+                  refresh_schema: RefreshToken,
+                  db: Annotated[AsyncSession, Depends(get_db)]):
+    """Exchanges a refresh token for new tokens.
+    """
+    check_rate_limits_sync(request)
+    user_ip: str = request.client.host
+    path: str = request.url.path
+    message_body: str = f'{user_ip},{path}'
+    send_to_queue_sync(message_body)
+    return model_response(await auth_service.refresh_tokens(
+        refresh_token=refresh_schema.refresh_token,
+        request=request,
+        db=db
+    ))
+
+@auth.post('/introspect',
+           status_code=status.HTTP_200_OK,
+           response_model=IntrospectionResponse,
+           dependencies=[Depends(require_internal_api_key)])
+async def introspect(introspect_schema: IntrospectTokensSchema):
+    """Checks a batch of tokens for internal services.
+    """
+    # internal services are trusted with their own rate limits
+    return model_response(
+        await auth_service.introspect_tokens(introspect_schema.tokens)
     )
 
+@auth.post('/users/import',
+           status_code=status.HTTP_200_OK,
+           response_model=ImportUsersResponse,
+           dependencies=[Depends(require_internal_api_key)])
+async def import_users(request: Request,
+                       db: Annotated[AsyncSession, Depends(get_db)],
+                       file_format: Optional[Literal['csv', 'ndjson']] = None):
+    """Imports users from a streamed CSV or NDJSON body.
+    """
+    if file_format is None:
+        content_type: str = request.headers.get('content-type', '')
+        file_format = 'csv' if 'csv' in content_type else 'ndjson'
+    return model_response(await user_import_service.import_users(
+        request.stream(), file_format, db
+    ))
+
+@auth.get('/users',
+          status_code=status.HTTP_200_OK,
+          response_model=UsersPageResponse,
+          dependencies=[Depends(require_internal_api_key)])
+async def list_users(db: Annotated[AsyncSession, Depends(get_db)],
+                     limit: Annotated[int, Query(
+                         ge=1, le=settings.USERS_PAGE_MAX_SIZE)] = 100,
+                     cursor: Optional[str] = None):
+    """Lists users a page at a time, pass next_cursor to get the next page.
+    """
+    return model_response(await auth_service.fetch_all(db, limit, cursor))
+
+@auth.get('/users/export',
+          status_code=status.HTTP_200_OK,
+          dependencies=[Depends(require_internal_api_key)])
+async def export_users():
+    """Streams every user as NDJSON.
+    """
+    return StreamingResponse(auth_service.export_users(),
+                             media_type='application/x-ndjson')
+
 @auth.get('/logout',
           status_code=status.HTTP_200_OK,
           response_model=LogOutResponse)
@@ -87,7 +171,55 @@ async def logout(token: Annotated[OAuth2, Depends(oauth2_scheme)]
     """
     Logs out a user.
     """
-    return await auth_service.logout_user(str(token), request)
+    return model_response(await auth_service.logout_user(str(token), request))
+
+@auth.get('/sessions',
+          status_code=status.HTTP_200_OK,
+          response_model=SessionsResponse)
+async def sessions(request: Request,
+                   token: Annotated[OAuth2, Depends(oauth2_scheme)],
+                   db: Annotated[AsyncSession, Depends(get_db)]):
+    """Lists the active sessions of the current user.
+    """
+    check_rate_limits_sync(request)
+    user_ip: str = request.client.host
+    path: str = request.url.path
+    message_body: str = f'{user_ip},{path}'
+    send_to_queue_sync(message_body)
+    user = await auth_service.get_current_active_user(
+        token=token,
+        request=request,
+        db=db)
+    quota = await organization_quotas.quota_for(user.id, db)
+    # the rest of the request only needs redis
+    await release_db(db)
+    # count the request against the user's organization too
+    check_organization_quota_sync(quota)
+    return model_response(await auth_service.get_sessions(user))
+
+@auth.post('/sessions/revoke',
+           status_code=status.HTTP_200_OK,
+           response_model=LogOutResponse)
+async def revoke_sessions(request: Request,
+                          token: Annotated[OAuth2, Depends(oauth2_scheme)],
+                          db: Annotated[AsyncSession, Depends(get_db)]):
+    """Logs out every session of the current user.
+    """
+    check_rate_limits_sync(request)
+    user_ip: str = request.client.host
+    path: str = request.url.path
+    message_body: str = f'{user_ip},{path}'
+    send_to_queue_sync(message_body)
+    user = await auth_service.get_current_active_user(
+        token=token,
+        request=request,
+        db=db)
+    quota = await organization_quotas.quota_for(user.id, db)
+    # the rest of the request only needs redis
+    await release_db(db)
+    # count the request against the user's organization too
+    check_organization_quota_sync(quota)
+    return model_response(await auth_service.revoke_sessions(user))
 
 @auth.post('/others',
            status_code=status.HTTP_200_OK)
@@ -101,8 +233,13 @@ async def get(request: Request,
     path: str = request.url.path
     message_body: str = f'{user_ip},{path}'
     send_to_queue_sync(message_body)
-    await auth_service.get_current_active_user(
+    user = await auth_service.get_current_active_user(
         token=token,
         request=request,
         db=db)
+    quota = await organization_quotas.quota_for(user.id, db)
+    # the rest of the request only needs redis
+    await release_db(db)
+    # count the request against the user's organization too
+    check_organization_quota_sync(quota)
     return {'message': 'others route attempt recorded'}
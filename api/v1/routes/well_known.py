@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Request, Response, status
+
+from api.utils.jwt_keys import get_key_ring
+from api.utils.settings import settings
+
+
+well_known = APIRouter(prefix='/.well-known', tags=['WELL KNOWN'])
+
+@well_known.get('/jwks.json',
+                status_code=status.HTTP_200_OK)
+async def jwks(request: Request):
+    """Serves the public keys that tokens are signed with.
+    """
+    key_ring = get_key_ring()
+    headers = {
+        'Cache-Control': f'public, max-age={settings.JWKS_MAX_AGE}',
+        'ETag': key_ring.jwks_etag
+    }
+    if request.headers.get('if-none-match') == key_ring.jwks_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+    return Response(content=key_ring.jwks_body,
+                    media_type='application/json',
+                    headers=headers)
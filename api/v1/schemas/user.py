@@ -5,11 +5,15 @@ from pydantic import (BaseModel,
                       ConfigDict,
                       model_validator,
                       StringConstraints,
-                      EmailStr,
                       Field)
 from email_validator import validate_email, EmailNotValidError
-from bleach import clean
 import unicodedata
+from datetime import datetime
+
+from api.utils.settings import settings
+from api.utils.disposable_domains import disposable_domains
+from api.utils.username_matcher import (OFFENSIVE, RESERVED,
+                                        normalize_username, username_matcher)
 
 TESTING = config('TESTING')
 
@@ -18,15 +22,65 @@ if TESTING:
 else:
     TEST = False
 
+# allowed special characters for password
+PASSWORD_ALLOWED = '!@#&-_,.'
+PASSWORD_ALLOWED_CHARS = frozenset(PASSWORD_ALLOWED)
+ASCII_LOWERCASE = frozenset('abcdefghijklmnopqrstuvwxyz')
+ASCII_UPPERCASE = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+ASCII_DIGITS = frozenset('0123456789')
+# white space and characters not allowed in first_name and last_name
+NAME_DISALLOWED = re.compile(r'[ 1234567890!@~`#$%^&*()_+=\-,.<>/?"\\|]')
+# white space and characters not allowed in username
+USERNAME_DISALLOWED = re.compile(r'[ !@~`#$%^&*()_+=,.<>/?"\\|]')
+EMAIL_PATTERN = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+
+
+def check_characters(value: str, field: str, disallowed: re.Pattern) -> None:
+    """
+    Raises a ValueError naming the first disallowed character of a field.
+    """
+    match = disallowed.search(value)
+    if match:
+        if match.group() == ' ':
+            raise ValueError(f'use of white space is not allowed in {field}')
+        raise ValueError(f'{match.group()} is not allowed in {field}')
+
+
+def check_password_strength(password: str) -> None:
+    """
+    Raises a ValueError for the first character class a password lacks.
+    """
+    chars = set(password)
+    if password.isascii():
+        has_lower = not chars.isdisjoint(ASCII_LOWERCASE)
+        has_upper = not chars.isdisjoint(ASCII_UPPERCASE)
+        has_digit = not chars.isdisjoint(ASCII_DIGITS)
+    else:
+        has_lower = any(char.islower() for char in chars)
+        has_upper = any(char.isupper() for char in chars)
+        has_digit = any(char.isdigit() for char in chars)
+    if not has_lower:
+        raise ValueError(f'{password} must contain at least one lowercase letter')
+    if not has_upper:
+        raise ValueError(f'{password} must contain at least one uppercase letter')
+    if not has_digit:
+        raise ValueError(f'{password} must contain at least one digit character')
+    if chars.isdisjoint(PASSWORD_ALLOWED_CHARS):
+        raise ValueError(f'{password} must contain at least one of these special characters {PASSWORD_ALLOWED}')
+
+
 class RegisterUserSchema(BaseModel):
+    # validate_fields validates and normalizes the email, so it is not
+    # parsed a second time as an EmailStr
     email: Annotated[
-        EmailStr,
+        str,
         StringConstraints(
             min_length=11,
             strip_whitespace=True,
             strict=True
         )
-    ] = Field(examples=['Johnson@example.com'])
+    ] = Field(examples=['Johnson@example.com'],
+              json_schema_extra={'format': 'email'})
     username: Annotated[
         str,
         StringConstraints(
@@ -78,92 +132,50 @@ class RegisterUserSchema(BaseModel):
     def validate_fields(cls, values: dict):
         """
         Validates all fields
+
+        The email domain's MX records are not looked up here, callers check
+        them with check_email_deliverability without blocking the event loop.
         """
         password: str = values.get('password', '')
         confirm_password = values.get('confirm_password', '')
-        email: EmailStr = values.get('email', '')
+        email: str = values.get('email', '')
         first_name: str = values.get('first_name', '')
         last_name: str = values.get('last_name', '')
         username: str = values.get('username', '')
 
-        # not allowed characters for username, first_name, and last_name
-        name_disallowed_char = '1234567890!@~`#$%^&*()_+=-,.<>/?"\|'
-        # allowed special characters for password
-        password_allowed = '!@#&-_,.'
-        # emails liable to fraud
-        blacklisted_domains = [
-            'example.com', 'mailinator.com', 'tempmail.com'
-        ]
-        # offensive words
-        offensive_words = [
-            'fuck', 'ass', 'pussy'
-        ]
-        # reserved usernames
-        reserved_usernames = [
-            'admin', 'root', 'superuser', 'superadmin'
-        ]
-
-        # check for reserved username
-        if username in reserved_usernames:
+        # check for reserved usernames and offensive words in one pass
+        found = username_matcher.search(normalize_username(username))
+        if found & RESERVED:
             raise ValueError('Username is reserved and cannot be used')
+        if found & OFFENSIVE:
+            raise ValueError('Username contains offensive language')
+
+        check_characters(first_name, 'first_name', NAME_DISALLOWED)
+        check_characters(last_name, 'last_name', NAME_DISALLOWED)
+        check_characters(username, 'username', USERNAME_DISALLOWED)
 
-        # check for offfensive words
-        for word in offensive_words:
-            if word in username:
-                raise ValueError('Username contains offensive language')
-
-        for c in first_name:
-            if c == ' ':
-                raise ValueError('use of white space is not allowed in first_name')
-            if c in name_disallowed_char:
-                raise ValueError(f'{c} is not allowed in first_name')
-        for c in last_name:
-            if c == ' ':
-                raise ValueError('use of white space is not allowed in last_name')
-            if c in name_disallowed_char:
-                raise ValueError(f'{c} is not allowed in last_name')
-        for c in username:
-            if c == ' ':
-                raise ValueError('use of white space is not allowed in username')
-            if c in '!@~`#$%^&*()_+=,.<>/?"\|':
-                raise ValueError(f'{c} is not allowed in username')
-
-        values['first_name'] = clean(first_name.lower())
         values['first_name'] = unicodedata.normalize('NFKC', first_name)
-        
-        values['last_name'] = clean(last_name.lower())
         values['last_name'] = unicodedata.normalize('NFKC', last_name)
-
-        values['username'] = clean(username.lower())
         values['username'] = unicodedata.normalize('NFKC', username)
 
         try:
-            email_regex = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-            pattern = re.compile(email_regex)
             email = validate_email(
                 email,
-                check_deliverability=True,
+                check_deliverability=False,
                 test_environment=TEST
             ).normalized
-            if not pattern.match(email):
+            if not EMAIL_PATTERN.match(email):
                 raise ValueError(f'{email} is invalid')
             values['email'] = email
         except EmailNotValidError as exc:
             raise ValueError(exc)
 
         email_domain = email.split('@')[1]
-        if email_domain in blacklisted_domains:
+        if email_domain in disposable_domains:
             raise ValueError(f'{email_domain} is not allowed for registration')
 
-        if not any(char for char in password if char.islower()):
-            raise ValueError(f'{password} must contain at least one lowercase letter')
-        if not any(char for char in password if char.isupper()):
-            raise ValueError(f'{password} must contain at least one uppercase letter')
-        if not any(char for char in password if char.isdigit()):
-            raise ValueError(f'{password} must contain at least one digit character')
-        if not any(char for char in password if char in password_allowed):
-            raise ValueError(f'{password} must contain at least one of these special characters {password_allowed}')
-        if any(char for char in password if char == ' '):
+        check_password_strength(password)
+        if ' ' in password:
             raise ValueError(f"{password} cannot contain a white space character")
         if password != confirm_password:
             raise ValueError(f'{password} and {confirm_password} must match')
@@ -180,6 +192,18 @@ class UserBase(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class CurrentUser(BaseModel):
+    id: str
+    username: str
+    first_name: str
+    last_name: str
+    is_active: bool
+    is_blocked: bool
+    lockout_expires_at: Optional[datetime] = None
+
+    # instances are shared between requests through the user cache
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
 class RegisterUserResponse(BaseModel):
     status_code: int = Field(examples=[201])
     message: str = Field(examples=['Successful'])
@@ -192,6 +216,15 @@ class AccessToken(BaseModel):
 class RefreshToken(BaseModel):
     refresh_token: str = Field(examples=['12wxc3.55v44f3A.4f5gh5n67yn...'])
 
+class TokenPairData(BaseModel):
+    access_token: str = Field(examples=['12wxc3.55v44f3A.4f5gh5n67yn...'])
+    refresh_token: str = Field(examples=['12wxc3.55v44f3A.4f5gh5n67yn...'])
+
+class RefreshTokenResponse(BaseModel):
+    status_code: int = Field(examples=[200])
+    message: str = Field(examples=['Token refreshed'])
+    data: TokenPairData
+
 class LoginUserData(BaseModel):
     user: UserBase
     access_token: str = Field(examples=['12wxc3.55v44f3A.4f5gh5n67yn...'])
@@ -234,21 +267,89 @@ class LoginUserSchema(BaseModel):
         username: str = values.get('username', '')
         password: str = values.get('password', '')
 
-        password_allowed = '!@#&-_,.'
-
         values['username'] = username.lower()
 
-        if not any(char for char in password if char.islower()):
-            raise ValueError(f'{password} must contain at least one lowercase letter')
-        if not any(char for char in password if char.isupper()):
-            raise ValueError(f'{password} must contain at least one uppercase letter')
-        if not any(char for char in password if char.isdigit()):
-            raise ValueError(f'{password} must contain at least one digit character')
-        if not any(char for char in password if char in password_allowed):
-            raise ValueError(f'{password} must contain at least one of these special characters {password_allowed}')
+        check_password_strength(password)
 
         return values
 
 class LogOutResponse(BaseModel):
     status_code: int
     message: str
+
+class IntrospectTokenItem(BaseModel):
+    token: str = Field(examples=['12wxc3.55v44f3A.4f5gh5n67yn...'])
+    # the client the token was presented by, checked against the token
+    # binding, which covers both so they are given together or not at all
+    ip: Optional[str] = Field(default=None, examples=['203.0.113.7'])
+    user_agent: Optional[str] = Field(default=None, examples=['Mozilla/5.0'])
+
+    @model_validator(mode='after')
+    def validate_client(self):
+        """
+        Validates the client is given in full.
+        """
+        if (self.ip is None) != (self.user_agent is None):
+            raise ValueError('ip and user_agent must be given together')
+        return self
+
+class IntrospectTokensSchema(BaseModel):
+    tokens: Annotated[
+        List[IntrospectTokenItem],
+        Field(min_length=1, max_length=settings.INTROSPECTION_MAX_TOKENS)
+    ]
+
+class IntrospectionResult(BaseModel):
+    active: bool = Field(examples=[True])
+    user_id: Optional[str] = Field(default=None, examples=['1234ed.4455tf...'])
+    token_type: Optional[str] = Field(default=None, examples=['access'])
+    jti: Optional[str] = Field(default=None, examples=['9b2f6c1e-...'])
+    iat: Optional[int] = Field(default=None, examples=[1726500000])
+    exp: Optional[int] = Field(default=None, examples=[1726500600])
+
+class IntrospectionResponse(BaseModel):
+    status_code: int = Field(examples=[200])
+    message: str = Field(examples=['Successful'])
+    data: List[IntrospectionResult]
+
+class SessionData(BaseModel):
+    jti: str = Field(examples=['9b2f6c1e-...'])
+    token_type: str = Field(examples=['access'])
+    expires_at: int = Field(examples=[1726500000])
+
+class SessionsResponse(BaseModel):
+    status_code: int = Field(examples=[200])
+    message: str = Field(examples=['Successful'])
+    data: List[SessionData]
+
+class ImportUserError(BaseModel):
+    line: int = Field(examples=[12])
+    error: str = Field(examples=['email already exists.'])
+
+class ImportUsersData(BaseModel):
+    imported: int = Field(default=0, examples=[998])
+    failed: int = Field(default=0, examples=[2])
+    # users registered by someone else while the import ran
+    skipped: int = Field(default=0, examples=[0])
+    errors: List[ImportUserError] = Field(default_factory=list)
+
+class ImportUsersResponse(BaseModel):
+    status_code: int = Field(examples=[200])
+    message: str = Field(examples=['Successful'])
+    data: ImportUsersData
+
+class UserListItem(UserBase):
+    is_active: bool = Field(examples=[True])
+    is_blocked: bool = Field(examples=[False])
+    created_at: datetime = Field(examples=['2024-09-10T20:25:22.804186+00:00'])
+
+class UsersPageData(BaseModel):
+    users: List[UserListItem]
+    # pass as cursor to get the next page, None on the last page
+    next_cursor: Optional[str] = Field(default=None,
+                                       examples=['WyIyMDI0LTA5LTEwVDIw...'])
+
+class UsersPageResponse(BaseModel):
+    status_code: int = Field(examples=[200])
+    message: str = Field(examples=['Successful'])
+    data: UsersPageData
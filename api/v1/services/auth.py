@@ -2,36 +2,104 @@
 """
 Auth Service module
 """
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, status, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import func, select, or_
+from sqlalchemy.dialects.postgresql import insert
 from jose import jwt, JWTError
+from redis.exceptions import RedisError
 import hashlib
+import json
+import base64
 from uuid import uuid4
 
 from api.v1.models import User
+from api.v1.models.user import verify_and_update_password_hash
+from api.v1.repositories import user_repository
 from api.core.base.async_services import AsyncServices
 from api.v1.schemas.user import(RegisterUserSchema,
                                 RegisterUserResponse,
                                 AccessToken,
+                                RefreshToken,
+                                TokenPairData,
+                                RefreshTokenResponse,
                                 UserBase,
+                                CurrentUser,
                                 LoginUserData,
                                 LoginUserResponse,
-                                LogOutResponse)
+                                LogOutResponse,
+                                SessionData,
+                                SessionsResponse,
+                                IntrospectTokenItem,
+                                IntrospectTokensSchema,
+                                IntrospectionResult,
+                                IntrospectionResponse,
+                                UserListItem,
+                                UsersPageData,
+                                UsersPageResponse)
 from api.utils.settings import settings
+from api.db.database import (async_session_factory, pin_to_primary,
+                             reads_from_replica, release_db)
 from api.utils.background.producer import handle_login_attempt
-from api.utils.auth_rate_limits import reset_failed_attempts
+from api.utils.auth_rate_limits import reset_failed_attempts, failed_attempts_key
+from api.db.redis_database import get_redis_sync
 from api.utils.email_dns_resolver import check_email_deliverability
+from api.utils.password_admission import password_admission
+from api.utils.token_cache import verified_token_cache
+from api.utils.user_cache import user_cache
+from api.utils.jwt_keys import get_key_ring
+from api.utils.token_claims import build_claims, expand_claims, binding_error
+from api.utils.session_registry import (get_session_generation,
+                                        get_session_generations,
+                                        queue_generation_read,
+                                        read_generation,
+                                        queue_session,
+                                        register_session,
+                                        list_sessions,
+                                        revoke_all_sessions)
 from api.utils.token_revocation import (store_jti_in_cache,
+                                        queue_jti_in_cache,
+                                        rotate_refresh_jti,
+                                        is_rotated_jti,
                                         check_active_jti,
+                                        check_active_jtis,
                                         revoke_jti)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/v1/auth/token')
 
+# build the token lifetimes once, not on every token
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+REMEMBER_ME_LIFETIME = timedelta(days=settings.REMEMBER_ME_EXPIRE)
+REFRESH_TOKEN_LIFETIME = timedelta(days=settings.REFRESH_TOKEN_EXPIRE)
+
+
+def token_store_unavailable(exc: RedisError) -> HTTPException:
+    """
+    Gets the error for a token exchange that could not reach redis, no
+    tokens are issued without checking for reuse.
+    """
+    print(f'token store error: {exc}')
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail='Token service unavailable, try again later'
+    )
+
+
+def token_lifetime(token_type: str, remember_me: bool = False) -> timedelta:
+    """
+    Gets how long a new access or refresh token is valid for.
+    """
+    if token_type == 'access':
+        # a long lived access token if remeber_me is true
+        return REMEMBER_ME_LIFETIME if remember_me else ACCESS_TOKEN_LIFETIME
+    if token_type == 'refresh':
+        return REFRESH_TOKEN_LIFETIME
+    raise ValueError('token-type must either be access or refresh')
+
 async def generate_idempotency_key(username: str, email: str):
     """
     Generates an idempotency key
@@ -39,29 +107,63 @@ async def generate_idempotency_key(username: str, email: str):
     key = f"{email}:{username}"
     return hashlib.sha256(key.encode()).hexdigest()
 
+def registration_conflicts_lookup(email: str, username: str,
+                                  idempotency_key: Optional[str] = None):
+    """
+    Builds the lookup of every user a registration conflicts with.
+    """
+    # emails and usernames are unique regardless of case
+    conditions = [
+        func.lower(User.email) == email.lower(),
+        func.lower(User.username) == username.lower()
+    ]
+    if idempotency_key:
+        conditions.append(User.idempotency_key == idempotency_key)
+    return select(User).where(or_(*conditions))
+
+def encode_cursor(created_at: datetime, user_id: str) -> str:
+    """
+    Encodes the position after a user as an opaque page cursor.
+    """
+    position = json.dumps([created_at.isoformat(), user_id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decodes a page cursor into the (created_at, id) to list users after.
+    """
+    try:
+        created_at, user_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), str(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Invalid cursor')
+
+def get_client_ip(request: Optional[Request]) -> str:
+    """
+    Gets the client ip of a request
+    """
+    if request and request.client:
+        return request.client.host
+    return 'unknown'
+
 class AuthService(AsyncServices):
     """
     Service class for authentication
     """
     async def create(
         self, user_schema: RegisterUserSchema,
-        db: AsyncSession):
+        db: AsyncSession,
+        request: Optional[Request] = None):
         """
         Create
         """
         await check_email_deliverability(user_schema.email)
-        # check if request had been made and successful with idempotency_key
+        # the key a replay of this registration is recognised by
         idempotency_key: str = await generate_idempotency_key(
             user_schema.username,
             user_schema.email
         )
-        # returns a success response if idempotency jey already exists
-        idempotency_response = await self.check_idempotency(idempotency_key, db)
-        if idempotency_response:
-            # return response to user
-            return idempotency_response
-        # throws a 409 if username or email already exists
-        await self.check_user_exists(user_schema, db)
         # create a user model for the new user
         new_user: User = User(
             **user_schema.model_dump(
@@ -72,14 +174,45 @@ class AuthService(AsyncServices):
             )
         )
         new_user.idempotency_key = idempotency_key
-        # set a passwpord for the new user and save
-        new_user.set_password(user_schema.password)
-        db.add(new_user)
+        # set a passwpord for the new user
+        await password_admission.run(
+            get_client_ip(request),
+            new_user.set_password,
+            user_schema.password
+        )
+        # insert the user unless the email, username or key already exists
+        stmt = insert(User).values(
+            email=new_user.email,
+            username=new_user.username,
+            first_name=new_user.first_name,
+            last_name=new_user.last_name,
+            password=new_user.password,
+            idempotency_key=idempotency_key
+        ).on_conflict_do_nothing().returning(
+            User.id,
+            User.email,
+            User.username,
+            User.first_name,
+            User.last_name
+        )
+        result = await db.execute(stmt)
+        created = result.one_or_none()
         await db.commit()
+        if not created:
+            # returns a success response for a replay, throws a 409 otherwise
+            replay_response = await self.check_user_exists(user_schema, db,
+                                                           idempotency_key)
+            if replay_response:
+                return replay_response
+            # the conflicting user was removed after the insert
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='registration conflict, try again.'
+            )
 
         # create a pydantic model from the new user
         user = UserBase.model_validate(
-            new_user,
+            created,
             from_attributes=True
         )
 
@@ -102,11 +235,38 @@ class AuthService(AsyncServices):
             user = result.scalar_one_or_none()
             return user
 
-    async def fetch_all(self):
+    async def fetch_all(self, db: AsyncSession, limit: int,
+                        cursor: Optional[str] = None):
         """
-        Fetch all
+        Fetch a page of users in (created_at, id) order.
         """
-        pass
+        after = decode_cursor(cursor) if cursor else None
+        rows = await user_repository.list_users(db, limit, after)
+        users = [UserListItem.model_validate(row) for row in rows]
+        # a full page may be followed by more users
+        next_cursor = None
+        if len(users) == limit:
+            next_cursor = encode_cursor(users[-1].created_at, users[-1].id)
+        return UsersPageResponse(
+            status_code=status.HTTP_200_OK,
+            message='Successful',
+            data=UsersPageData(users=users, next_cursor=next_cursor)
+        )
+
+    async def export_users(self) -> AsyncIterator[bytes]:
+        """
+        Streams every user as NDJSON.
+
+        The session is opened here rather than taken from the request, as
+        the body is streamed after the request's dependencies have exited.
+        """
+        async with async_session_factory() as db:
+            async for batch in user_repository.stream_users(
+                    db, settings.USERS_EXPORT_BATCH_SIZE):
+                yield ''.join(
+                    UserListItem.model_validate(row).model_dump_json() + '\n'
+                    for row in batch
+                ).encode()
 
     async def update(self):
         """
@@ -120,50 +280,43 @@ class AuthService(AsyncServices):
         """
         pass
 
-    async def check_idempotency(self, idempotency_key: str, db: AsyncSession):
-        """
-        Checks if the idempotency key already exists in the database.
-        Returns a response if the user has already been registered.
-        """
-        stmt = select(User).where(
-            User.idempotency_key == idempotency_key
-        )
-        result = await db.execute(stmt)
-        user_exists = result.scalar_one_or_none()
-        if user_exists:
-            user = UserBase.model_validate(
-                user_exists,
-                from_attributes=True
-            )
-            return RegisterUserResponse(
-                status_code=status.HTTP_201_CREATED,
-                message='User already registered',
-                data=user
-            )
-        
-
     async def check_user_exists(self, user_schema: RegisterUserSchema,
-                                db: AsyncSession):
+                                db: AsyncSession,
+                                idempotency_key: Optional[str] = None):
         """
         Checks if a user already exists with the provided email and also username.
+        Returns a response if the user has already been registered with the
+        idempotency key.
         """
+        # find every user the registration conflicts with in one lookup
+        stmt = registration_conflicts_lookup(user_schema.email,
+                                             user_schema.username,
+                                             idempotency_key)
+        result = await db.execute(stmt)
+        users = result.scalars().all()
+        # check if request had been made and successful with idempotency_key
+        for user_exists in users:
+            if idempotency_key and user_exists.idempotency_key == idempotency_key:
+                user = UserBase.model_validate(
+                    user_exists,
+                    from_attributes=True
+                )
+                return RegisterUserResponse(
+                    status_code=status.HTTP_201_CREATED,
+                    message='User already registered',
+                    data=user
+                )
         # check if user's email already registered.
-        email_stmt = select(User).where(
-            User.email == user_schema.email
-        )
-        email_result = await db.execute(email_stmt)
-        if email_result.scalar_one_or_none():
+        if any(user.email.lower() == user_schema.email.lower()
+               for user in users):
             message = 'email already exists.'
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail=message
             )
         # check if user's username already registered.
-        username_stmt = select(User).where(
-            User.username == user_schema.username 
-        )
-        username_result = await db.execute(username_stmt)
-        if username_result.scalar_one_or_none():
+        if any(user.username.lower() == user_schema.username.lower()
+               for user in users):
             message = 'username already taken.'
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
@@ -175,9 +328,10 @@ class AuthService(AsyncServices):
         token: Annotated[OAuth2, Depends(oauth2_scheme)],
         request: Request,
         db: AsyncSession
-    ) -> User:
+    ) -> CurrentUser:
         """
         Rtrieve the current user from the provided token.
+        Only the fields in CurrentUser are returned, read through the user cache.
         """
         # decode the token
         claims: dict = await self.verify_jwt_token(
@@ -190,10 +344,17 @@ class AuthService(AsyncServices):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail='cannot use refresh token')
         # use the user_id to search for the user
-        user_id = claims.get('user_id')
-        stmt = select(User).where(User.id == user_id)
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
+        return await self.load_current_user(claims.get('user_id'), db)
+
+    async def load_current_user(self, user_id: str,
+                                db: AsyncSession) -> CurrentUser:
+        """
+        Loads the CurrentUser fields of a user through the user cache.
+        """
+        cached_user = user_cache.get(user_id)
+        if cached_user:
+            return cached_user
+        user = await user_repository.get_current_user(db, user_id)
         # raise an exception if no user with id is found
         if not user:
             raise HTTPException(
@@ -201,25 +362,33 @@ class AuthService(AsyncServices):
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-            # return the user
-        return user
+            # cache and return the user
+        return user_cache.set(CurrentUser.model_validate(user))
 
     async def get_current_active_user(
         self,
         token: Annotated[OAuth2, Depends(oauth2_scheme)],
         request: Request,
         db: AsyncSession
-    ) -> User:
+    ) -> CurrentUser:
         """
         Retrieves active users.
         """
-        # check the current time
-        now = datetime.now(timezone.utc)
         # retrieve the current user
-        user: User = await self.get_current_user(
+        user: CurrentUser = await self.get_current_user(
             token=token,
             request=request,
             db=db)
+        self.check_user_status(user)
+        # return active user
+        return user
+
+    def check_user_status(self, user: CurrentUser) -> None:
+        """
+        Rejects blocked and inactive users.
+        """
+        # check the current time
+        now = datetime.now(timezone.utc)
         # check if user is blocked
         if user.is_blocked:
             message = 'Account locked due to multiple failed login attempts'
@@ -237,27 +406,27 @@ class AuthService(AsyncServices):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f'User is Inactive'
             )
-        # return active user
-        return user
 
     async def authenticate_user(self,
                                 username: str,
                                 password: str,
-                                db: AsyncSession):
+                                db: AsyncSession,
+                                request: Optional[Request] = None,
+                                reset_attempts: bool = True):
         """
         Authenticates a user.
+
+        When reset_attempts is False the caller is responsible for
+        clearing the user's failed login attempts.
         """
         # set the current time
         now = datetime.now(timezone.utc)
-        # retrieve the user using username or password
-        stmt = select(User).where(
-            or_(
-                User.email == username,
-                User.username == username
-            )
-        )
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
+        # retrieve the user using username or email
+        user = await user_repository.get_by_login(db, username)
+        if not user and reads_from_replica(db):
+            # a user who just registered may not be on the replica yet
+            pin_to_primary(db)
+            user = await user_repository.get_by_login(db, username)
         # if no user with provided details is found
         if not user:
             # raise an exception
@@ -283,7 +452,12 @@ class AuthService(AsyncServices):
             )
 
         # check if the user provided the right password
-        password_valid = user.verify_password(password)
+        password_valid, new_hash = await password_admission.run(
+            get_client_ip(request),
+            verify_and_update_password_hash,
+            password,
+            user.password
+        )
         # check if password is correct
         if not password_valid:
             # pass the user_id to increment and handle failed login attempts
@@ -295,12 +469,20 @@ class AuthService(AsyncServices):
             )
 
         # remove/reset the user_id from failed attempt after a successful login
-        reset_failed_attempts(user.id)
+        if reset_attempts:
+            reset_failed_attempts(user.id)
+        # save the password if it was rehashed with the current parameters
+        if new_hash:
+            await user_repository.set_password(db, user.id, new_hash)
         # unblock user after lock-time expires and user login is successful
-        if user.is_blocked or user.lockout_expires_at:
-            user.is_blocked = False
-            user.lockout_expires_at = None
+        unblock = bool(user.is_blocked or user.lockout_expires_at)
+        if unblock:
+            await user_repository.set_lockout(db, user.id, blocked=False,
+                                              expires_at=None)
+        if new_hash or unblock:
             await db.commit()
+        if unblock:
+            user_cache.invalidate(user.id)
         # return user
         return user
 
@@ -310,23 +492,22 @@ class AuthService(AsyncServices):
         Logs in a user.
         """
         # check for correct login fields
-        logged_in_user = await self.authenticate_user(username, password, db)
+        logged_in_user = await self.authenticate_user(username, password,
+                                                      db, request,
+                                                      reset_attempts=False)
+        # the rest only needs redis, free the connection for other requests
+        await release_db(db)
         # create a pydantic model for user
         user = UserBase.model_validate(
             logged_in_user,
             from_attributes=True
         )
-        # generate access token
-        access_token = await self.generate_jwt_token(
-            logged_in_user,
-            request=request,
-            remember_me=remember_me
-        )
-        # generate refresh token
-        refresh_token = await self.generate_jwt_token(
-            logged_in_user,
+        # register the tokens and reset failed attempts in one round trip
+        access_token, refresh_token = self.issue_token_pair(
+            logged_in_user.id,
             request=request,
-            token_type='refresh'
+            remember_me=remember_me,
+            reset_attempts=True
         )
         # create a response and return to he user
         user_data = LoginUserData(
@@ -350,7 +531,8 @@ class AuthService(AsyncServices):
         Authenticates a user for the openapi docs usage.
         """
         # authenticate a user using provided username and password
-        user = await self.authenticate_user(username, password, db)
+        user = await self.authenticate_user(username, password, db, request)
+        await release_db(db)
         # generate access token
         access_token = await self.generate_jwt_token(
             user,
@@ -361,6 +543,136 @@ class AuthService(AsyncServices):
             access_token=access_token
         )
 
+    async def refresh_tokens(self, refresh_token: str, request: Request,
+                             db: AsyncSession):
+        """
+        Exchanges a refresh token for a new access and refresh token.
+
+        The refresh token can only be used once. Presenting a rotated
+        token again means it leaked, so every session of the user is revoked.
+        Blocked and inactive users get no new tokens.
+        """
+        try:
+            claims: dict = self.decode_jwt_token(refresh_token)
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token"
+            )
+        if claims.get('token_type') != 'refresh':
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail='refresh token required')
+        user_id: str = claims.get('user_id', '')
+        jti: str = claims.get('jti', '')
+        try:
+            # check for reuse before the revocation check rejects the token
+            reused = is_rotated_jti(jti)
+            if reused:
+                revoke_all_sessions(user_id)
+        except RedisError as exc:
+            raise token_store_unavailable(exc)
+        if reused:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Refresh token reuse detected, all sessions revoked'
+            )
+        # check revocation, session generation, ip and user-agent
+        await self.verify_jwt_token(token=refresh_token, request=request)
+        user = await self.load_current_user(user_id, db)
+        await release_db(db)
+        self.check_user_status(user)
+        try:
+            # only one concurrent exchange of the same token can win
+            rotated = rotate_refresh_jti(jti, claims.get('exp', 0), user_id)
+            if not rotated:
+                revoke_all_sessions(user_id)
+        except RedisError as exc:
+            raise token_store_unavailable(exc)
+        if not rotated:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Refresh token reuse detected, all sessions revoked'
+            )
+        verified_token_cache.invalidate_jti(jti)
+
+        access_token, new_refresh_token = self.issue_token_pair(
+            user_id,
+            request=request
+        )
+
+        return RefreshTokenResponse(
+            status_code=status.HTTP_200_OK,
+            message='Token refreshed',
+            data=TokenPairData(
+                access_token=access_token,
+                refresh_token=new_refresh_token
+            )
+        )
+
+    async def introspect_tokens(self, items: List[IntrospectTokenItem]):
+        """
+        Checks many tokens for internal services.
+
+        Signatures are checked locally and the revocation state of every
+        token not already in the verified token cache is read with one
+        pipelined redis lookup.
+        """
+        decoded: Dict[int, dict] = {}
+        unchecked: List[int] = []
+        generation = verified_token_cache.generation
+        for index, item in enumerate(items):
+            claims = verified_token_cache.get(item.token)
+            if claims is None:
+                try:
+                    claims = self.decode_jwt_token(item.token)
+                except JWTError:
+                    continue
+                unchecked.append(index)
+            decoded[index] = claims
+
+        # Check if the JTIs have been revoked
+        active_jtis = check_active_jtis([
+            (decoded[index].get('jti', ''), decoded[index].get('token_type', ''))
+            for index in unchecked
+        ])
+        for index, active in zip(unchecked, active_jtis):
+            if active:
+                verified_token_cache.set(items[index].token, decoded[index],
+                                         generation)
+            else:
+                del decoded[index]
+
+        # Check if every session of the users has been revoked
+        generations = get_session_generations([
+            claims.get('user_id', '') for claims in decoded.values()
+        ])
+        results = []
+        for index, item in enumerate(items):
+            claims = decoded.get(index)
+            active = (
+                claims is not None
+                and claims.get('gen', 0) >= generations[claims.get('user_id', '')]
+                # only check the binding when the caller knows the client
+                and (item.ip is None
+                     or binding_error(claims, item.ip, item.user_agent) is None)
+            )
+            if not active:
+                results.append(IntrospectionResult(active=False))
+                continue
+            results.append(IntrospectionResult(
+                active=True,
+                user_id=claims.get('user_id'),
+                token_type=claims.get('token_type'),
+                jti=claims.get('jti'),
+                iat=claims.get('iat'),
+                exp=claims.get('exp')
+            ))
+        return IntrospectionResponse(
+            status_code=status.HTTP_200_OK,
+            message='Successful',
+            data=results
+        )
+
     async def logout_user(self, token: str, request: Request):
         """
 
@@ -374,103 +686,210 @@ class AuthService(AsyncServices):
         if not jti:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail='User must be logged in.')
-        revoke_jti(jti, token_type)
+        revoke_jti(jti, token_type, claims.get('exp'), claims.get('user_id'))
         return LogOutResponse(
             status_code=status.HTTP_200_OK,
             message='Logout successful'
         )
         
 
+    async def get_sessions(self, user: CurrentUser):
+        """
+        Lists the active sessions of a user.
+        """
+        sessions = [
+            SessionData(**session) for session in list_sessions(user.id)
+        ]
+        return SessionsResponse(
+            status_code=status.HTTP_200_OK,
+            message='Successful',
+            data=sessions
+        )
+
+    async def revoke_sessions(self, user: CurrentUser):
+        """
+        Revokes every session of a user.
+        """
+        revoke_all_sessions(user.id)
+        return LogOutResponse(
+            status_code=status.HTTP_200_OK,
+            message='All sessions revoked'
+        )
+
+    def issue_token_pair(self, user_id: str, request: Request,
+                         remember_me: bool = False,
+                         reset_attempts: bool = False) -> Tuple[str, str]:
+        """
+        Issues an access and a refresh token with one redis round trip.
+
+        Both jtis are cached and registered as sessions, and the session
+        generation the tokens are signed with is read, in one transaction,
+        so the tokens are signed once it returns.
+
+        Args:
+            reset_attempts: also clear the user's failed login attempts.
+
+        Returns:
+            the access token and the refresh token.
+        """
+        now = datetime.now(timezone.utc)
+        access_jti, refresh_jti = str(uuid4()), str(uuid4())
+        access_expire_in = int(token_lifetime('access', remember_me)
+                               .total_seconds())
+        refresh_expire_in = int(token_lifetime('refresh').total_seconds())
+        with get_redis_sync() as redis:
+            pipe = redis.pipeline()
+            queue_jti_in_cache(pipe, access_jti, access_expire_in, 'access')
+            queue_jti_in_cache(pipe, refresh_jti, refresh_expire_in, 'refresh')
+            queue_session(pipe, user_id, access_jti, 'access',
+                          access_expire_in)
+            queue_session(pipe, user_id, refresh_jti, 'refresh',
+                          refresh_expire_in)
+            if reset_attempts:
+                pipe.delete(failed_attempts_key(user_id))
+            queue_generation_read(pipe, user_id)
+            generation = read_generation(user_id, pipe.execute()[-1])
+        access_token, _, _ = self.build_jwt_token(
+            user_id,
+            request=request,
+            now=now,
+            remember_me=remember_me,
+            jti=access_jti,
+            generation=generation
+        )
+        refresh_token, _, _ = self.build_jwt_token(
+            user_id,
+            request=request,
+            now=now,
+            token_type='refresh',
+            jti=refresh_jti,
+            generation=generation
+        )
+        return access_token, refresh_token
+
     async def generate_jwt_token(self, user: User, request: Request,
                                  token_type: str = 'access',
                                  remember_me: bool = False) -> str:
         """
         Generate access/refresh token.
         """
+        token, jti, expire_in = self.build_jwt_token(
+            user.id,
+            request=request,
+            now=datetime.now(timezone.utc),
+            token_type=token_type,
+            remember_me=remember_me
+        )
+        store_jti_in_cache(jti, expire_in, token_type)
+        register_session(user.id, jti, token_type, expire_in)
+        return token
+
+    def build_jwt_token(self, user_id: str, request: Request, now: datetime,
+                        token_type: str = 'access',
+                        remember_me: bool = False,
+                        jti: Optional[str] = None,
+                        generation: Optional[int] = None
+                        ) -> Tuple[str, str, int]:
+        """
+        Build and sign an access/refresh token without caching its jti.
+
+        Args:
+            jti: the token id, a new one if not given.
+            generation: the user's session generation, looked up if not given.
+
+        Returns:
+            the token, its jti and the seconds until it expires.
+        """
         # Generate JTI (JWT ID)
-        jti = str(uuid4())
-        # set the current time
-        now = datetime.now(timezone.utc)
+        jti = jti or str(uuid4())
         # Get the client IP address
         user_ip = request.client.host
         # Get the User-Agent header
         user_agent = request.headers.get('user-agent')
 
         # set expiry time based on the token-type to generate
-        if token_type == 'access':
-            # check if remeber_me is true
-            if remember_me:
-                exp: int = settings.REMEMBER_ME_EXPIRE
-                # set a long lived access token
-                access_expire = now + timedelta(days=exp)
-            else:
-                # if remeber_me is false
-                exp: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES
-                # set a short lived accesss token
-                access_expire = now + timedelta(minutes=exp)
-        elif token_type == 'refresh':
-            exp = settings.REFRESH_TOKEN_EXPIRE
-            refresh_expire = now + timedelta(days=exp)
-        else:
-            raise ValueError('token-type must either be access or refresh')
-        
+        lifetime = token_lifetime(token_type, remember_me)
+        if generation is None:
+            generation = get_session_generation(user_id)
+
         # set the payloads to be encoded
-        claims = {
-            'user_id': user.id,
-            'token_type': token_type,
-            'jti': jti,
-            'iat': now,
-            'ip': user_ip,
-            'user_agent': user_agent,
-            'exp': (access_expire
-                    if token_type == 'access'
-                    else refresh_expire)
-        }
+        claims = build_claims(
+            user_id=user_id,
+            token_type=token_type,
+            jti=jti,
+            issued_at=now,
+            expires_at=now + lifetime,
+            ip=user_ip,
+            user_agent=user_agent,
+            # tokens from an older generation are revoked
+            generation=generation
+        )
         # generate and return the token
+        key_ring = get_key_ring()
         token = jwt.encode(
             claims=claims,
-            key=settings.SECRET_KEY,
-            algorithm=settings.ALGORITHM
+            key=key_ring.signing_key,
+            algorithm=key_ring.algorithm,
+            headers=key_ring.headers
         )
-        store_jti_in_cache(jti, exp, token_type)
-        return token
+        return token, jti, int(lifetime.total_seconds())
+
+    def decode_jwt_token(self, token: str) -> dict:
+        """
+        Decode a JWT token, checking only its signature and expiry.
+        Claims of every token format are returned with the same names.
+
+        Raises:
+            JWTError: if the token is invalid.
+        """
+        # decode and return the token with the key it was signed with.
+        key_ring = get_key_ring()
+        header: dict = jwt.get_unverified_header(token)
+        claims: dict = jwt.decode(
+            token=token,
+            key=key_ring.verification_key(header.get('kid')),
+            algorithms=[key_ring.algorithm]
+        )
+        return expand_claims(claims)
 
     async def verify_jwt_token(self, token: str, request: Request) -> dict:
         """
         Verify JWT token and check if the JTI is still active (i.e., not revoked).
         """
         try:
-            # decode and return the token.
-            claims: dict = jwt.decode(
-                token=token,
-                key=settings.SECRET_KEY,
-                algorithms=[settings.ALGORITHM]
-            )
-            token_type = claims.get('token_type', '')
-            # Check if the JTI has been revoked
-            jti = claims.get('jti', '')
-            if not check_active_jti(jti, token_type):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token has been revoked"
-            )
+            # skip decoding and revocation lookup for a recently verified token
+            claims: Optional[dict] = verified_token_cache.get(token)
+            if claims is None:
+                generation = verified_token_cache.generation
+                claims = self.decode_jwt_token(token)
+                token_type = claims.get('token_type', '')
+                # Check if the JTI has been revoked
+                jti = claims.get('jti', '')
+                if not check_active_jti(jti, token_type):
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail="Token has been revoked"
+                )
+                verified_token_cache.set(token, claims, generation)
 
-            # Validate IP address
-            token_ip = claims.get('ip')
-            request_ip = request.client.host
-            if token_ip != request_ip:
+            # Check if every session of the user has been revoked
+            user_generation = get_session_generation(claims.get('user_id', ''))
+            if claims.get('gen', 0) < user_generation:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="IP address mismatch"
+                    detail="Token has been revoked"
                 )
 
-            # Validate User-Agent
-            token_user_agent = claims.get('user_agent')
-            request_user_agent = request.headers.get('user-agent')
-            if token_user_agent != request_user_agent:
+            # Validate IP address and User-Agent
+            mismatch = binding_error(
+                claims,
+                ip=request.client.host,
+                user_agent=request.headers.get('user-agent')
+            )
+            if mismatch:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="User-Agent mismatch"
+                    detail=mismatch
                 )
 
             return claims
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+User import service module
+"""
+import os
+import sys
+import csv
+import json
+import asyncio
+import multiprocessing
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db.database import async_session_factory
+from api.v1.models.base_model import get_id
+from api.v1.models.user import password_context
+from api.v1.repositories import user_repository
+from api.v1.schemas.user import (RegisterUserSchema,
+                                 ImportUserError,
+                                 ImportUsersData,
+                                 ImportUsersResponse)
+from api.v1.services.auth import generate_idempotency_key
+from api.utils.disposable_domains import disposable_domains
+from api.utils.email_dns_resolver import check_email_deliverability
+from api.utils.settings import settings
+
+FILE_FORMATS = ('csv', 'ndjson')
+# bytes read from an import file at a time
+READ_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=4)
+def load_context(config: str) -> CryptContext:
+    """
+    Builds a password context from its configuration string.
+    """
+    return CryptContext.from_string(config)
+
+
+def hash_passwords(passwords: List[str], config: str) -> List[str]:
+    """
+    Hashes a batch of passwords in a worker process with the server
+    process's hashing parameters.
+    """
+    context = load_context(config)
+    return [context.hash(password) for password in passwords]
+
+
+async def split_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Splits a byte stream into lines, blank ones included.
+    """
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Splits a byte stream into numbered, non-empty lines.
+    """
+    line_number = 0
+    async for line in split_lines(chunks):
+        line_number += 1
+        if line.strip():
+            yield line_number, line
+
+
+class PendingLines(deque):
+    """
+    Numbered lines waiting for a csv reader. The reader's input ends while
+    it is empty and resumes once more lines are added.
+    """
+    def __init__(self):
+        super().__init__()
+        # the numbers of the lines the reader took since the last reset
+        self.taken: List[int] = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self:
+            raise StopIteration
+        line_number, text = self.popleft()
+        self.taken.append(line_number)
+        return text
+
+
+async def iter_csv_rows(chunks: AsyncIterable[bytes]
+                        ) -> AsyncIterator[Tuple[int, Optional[List[str]],
+                                                 Optional[str]]]:
+    """
+    Parses a CSV byte stream with a single csv reader, so a quoted field
+    may span lines.
+
+    Lines are handed to the reader once every quote they open is closed,
+    so it never reaches the end of its input inside a record.
+
+    Yields:
+        the first line number, values and error of each non-empty row,
+        either values or error is None.
+    """
+    pending = PendingLines()
+    reader = csv.reader(pending)
+    undecodable: Dict[int, str] = {}
+    line_number = quotes = 0
+    async for line in split_lines(chunks):
+        line_number += 1
+        if not pending and not line.strip():
+            continue
+        try:
+            text = line.decode()
+        except UnicodeDecodeError as exc:
+            text = line.decode(errors='replace')
+            undecodable[line_number] = str(exc)
+        if line_number == 1:
+            text = text.lstrip('\ufeff')
+        pending.append((line_number, text + '\n'))
+        quotes += text.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        while pending:
+            first_line = pending[0][0]
+            pending.taken.clear()
+            try:
+                values, error = next(reader), None
+            except csv.Error as exc:
+                values, error = None, str(exc)
+            for taken in pending.taken:
+                error = error or undecodable.pop(taken, None)
+            if error:
+                yield first_line, None, error
+            elif values:
+                yield first_line, values, None
+    if pending:
+        yield pending[0][0], None, 'unterminated quoted field'
+
+
+def parse_json_record(line: bytes) -> dict:
+    """
+    Parses one NDJSON line into registration values.
+
+    Raises:
+        ValueError: if the line cannot be parsed.
+    """
+    record = json.loads(line.decode().lstrip('\ufeff'))
+    if not isinstance(record, dict):
+        raise ValueError('each line must be a JSON object')
+    return record
+
+
+async def iter_records(chunks: AsyncIterable[bytes], file_format: str
+                       ) -> AsyncIterator[Tuple[int, Optional[dict],
+                                                Optional[str]]]:
+    """
+    Parses a CSV or NDJSON byte stream into registration values.
+
+    Yields:
+        the line number, values and error of each record, either values
+        or error is None.
+    """
+    if file_format == 'csv':
+        header: Optional[List[str]] = None
+        async for line_number, values, error in iter_csv_rows(chunks):
+            if error:
+                yield line_number, None, error
+            elif header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                yield (line_number, None,
+                       f'expected {len(header)} columns, got {len(values)}')
+            else:
+                yield line_number, dict(zip(header, values)), None
+        return
+    async for line_number, line in iter_lines(chunks):
+        try:
+            record = parse_json_record(line)
+        except ValueError as exc:
+            yield line_number, None, str(exc)
+            continue
+        yield line_number, record, None
+
+
+def validate_records(batch: List[Tuple[int, dict]]
+                     ) -> Tuple[List[Tuple[int, RegisterUserSchema]],
+                                List[ImportUserError]]:
+    """
+    Validates a batch of records, email domains are checked once per batch.
+    """
+    users = []
+    errors = []
+    for line_number, record in batch:
+        # imported users do not confirm their password
+        record.setdefault('confirm_password', record.get('password'))
+        try:
+            users.append((line_number,
+                          RegisterUserSchema.model_validate(record)))
+        except ValidationError as exc:
+            message = '; '.join(error['msg'] for error in exc.errors())
+            errors.append(ImportUserError(line=line_number, error=message))
+        except (TypeError, ValueError) as exc:
+            # a validator got a value of the wrong type
+            errors.append(ImportUserError(line=line_number, error=str(exc)))
+    return users, errors
+
+
+class UserImportService:
+    """
+    Imports users from CSV or NDJSON streams in batches.
+
+    Each batch is validated with RegisterUserSchema, checked against
+    existing users with one query, hashed across a shared process pool of
+    a fixed number of workers and loaded
+    with COPY, so the cost per user is a share of a few round trips and
+    the hash itself.
+    """
+    def __init__(self, chunk_size: int, workers: int, max_errors: int):
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.max_errors = max_errors
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        """
+        Gets the hashing pool every import shares, starting it on first use.
+
+        Its workers are spawned rather than forked, so they do not inherit
+        the threads and connections of the server process.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        """
+        Stops the hashing pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def import_users(self, chunks: AsyncIterable[bytes],
+                           file_format: str, db: AsyncSession):
+        """
+        Imports every user in a stream.
+        """
+        if file_format not in FILE_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f'file format must be one of {", ".join(FILE_FORMATS)}'
+            )
+        summary = ImportUsersData()
+        # deliverability of every email domain seen so far
+        domains: Dict[str, Optional[str]] = {}
+        batch: List[Tuple[int, dict]] = []
+        async for line_number, record, error in iter_records(chunks,
+                                                             file_format):
+            if error:
+                self.add_errors(summary, [
+                    ImportUserError(line=line_number, error=error)
+                ])
+                continue
+            batch.append((line_number, record))
+            if len(batch) >= self.chunk_size:
+                await self.import_batch(batch, db, domains, summary)
+                batch = []
+        if batch:
+            await self.import_batch(batch, db, domains, summary)
+
+        return ImportUsersResponse(
+            status_code=status.HTTP_200_OK,
+            message='Import complete',
+            data=summary
+        )
+
+    async def import_batch(self, batch: List[Tuple[int, dict]],
+                           db: AsyncSession,
+                           domains: Dict[str, Optional[str]],
+                           summary: ImportUsersData) -> None:
+        """
+        Validates, dedupes, hashes and loads one batch of records.
+        """
+        users, errors = await asyncio.to_thread(validate_records, batch)
+        self.add_errors(summary, errors)
+
+        # check each new email domain once instead of once per user
+        for domain in {user.email.split('@')[1] for _, user in users}:
+            if domain in domains:
+                continue
+            try:
+                await check_email_deliverability(f'user@{domain}')
+                domains[domain] = None
+            except HTTPException as exc:
+                domains[domain] = str(exc.detail or
+                                      'Email domain could not be checked.')
+
+        # find every email and username of the batch that is taken at once
+        # emails and usernames are unique regardless of case
+        existing = await user_repository.get_existing_logins(
+            db,
+            [user.email.lower() for _, user in users],
+            [user.username.lower() for _, user in users]
+        )
+        taken_emails = {row.email for row in existing}
+        taken_usernames = {row.username for row in existing}
+        new_users: List[RegisterUserSchema] = []
+        errors = []
+        for line_number, user in users:
+            domain_error = domains[user.email.split('@')[1]]
+            if domain_error:
+                errors.append(ImportUserError(line=line_number,
+                                              error=domain_error))
+            elif user.email.lower() in taken_emails:
+                errors.append(ImportUserError(line=line_number,
+                                              error='email already exists.'))
+            elif user.username.lower() in taken_usernames:
+                errors.append(ImportUserError(line=line_number,
+                                              error='username already taken.'))
+            else:
+                # later duplicates in the same file are rejected too
+                taken_emails.add(user.email.lower())
+                taken_usernames.add(user.username.lower())
+                new_users.append(user)
+        self.add_errors(summary, errors)
+        if not new_users:
+            return
+
+        # spread the hashing over every worker process
+        passwords = [user.password for user in new_users]
+        size = -(-len(passwords) // self.workers)
+        pool = self.get_pool()
+        config = password_context.to_string()
+        loop = asyncio.get_running_loop()
+        hashed_parts = await asyncio.gather(*(
+            loop.run_in_executor(pool, hash_passwords,
+                                 passwords[start:start + size], config)
+            for start in range(0, len(passwords), size)
+        ))
+        hashes = [password_hash for part in hashed_parts
+                  for password_hash in part]
+
+        records = [
+            (
+                get_id(),
+                user.email,
+                user.username,
+                user.first_name,
+                user.last_name,
+                password_hash,
+                await generate_idempotency_key(user.username, user.email),
+                True,
+                False
+            )
+            for user, password_hash in zip(new_users, hashes)
+        ]
+        inserted = await user_repository.copy_users(db, records)
+        await db.commit()
+        summary.imported += inserted
+        summary.skipped += len(records) - inserted
+
+    def add_errors(self, summary: ImportUsersData,
+                   errors: List[ImportUserError]) -> None:
+        """
+        Counts failed rows, keeping the first max_errors of them.
+        """
+        summary.failed += len(errors)
+        room = self.max_errors - len(summary.errors)
+        if room > 0:
+            summary.errors.extend(errors[:room])
+
+
+# create an instance of the UserImportService class
+user_import_service = UserImportService(
+    chunk_size=settings.USER_IMPORT_CHUNK_SIZE,
+    workers=settings.USER_IMPORT_WORKERS,
+    max_errors=settings.USER_IMPORT_MAX_ERRORS
+)
+
+
+async def read_file(path: str) -> AsyncIterator[bytes]:
+    """
+    Reads a file in chunks without blocking the event loop.
+    """
+    with open(path, 'rb') as import_file:
+        while True:
+            chunk = await asyncio.to_thread(import_file.read, READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def import_file(path: str) -> ImportUsersResponse:
+    """
+    Imports the users in a .csv or .ndjson file.
+    """
+    file_format = 'csv' if path.endswith('.csv') else 'ndjson'
+    try:
+        async with async_session_factory() as db:
+            return await user_import_service.import_users(read_file(path),
+                                                          file_format, db)
+    finally:
+        user_import_service.shutdown()
+
+
+# Import users: python -m api.v1.services.user_import <users.csv|users.ndjson>
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print('usage: python -m api.v1.services.user_import <users.csv|users.ndjson>')
+        sys.exit(1)
+    disposable_domains.load()
+    response = asyncio.run(import_file(sys.argv[1]))
+    print(response.data.model_dump_json(indent=2))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Measures disposable domain lookups against a list the size of the public
+disposable domain lists, and the memory the table saves over a set.
+
+    python -m benchmarks.disposable_domains [domains] [iterations]
+"""
+import os
+import sys
+import timeit
+import tempfile
+import tracemalloc
+
+from api.utils.disposable_domains import DisposableDomains
+
+
+def main(domain_count: int, iterations: int) -> None:
+    """Prints the time per lookup and the size of each structure"""
+    names = [f'disposable{number}.example{number % 50}.com'
+             for number in range(domain_count)]
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, 'domains.txt')
+        with open(source_path, 'w', encoding='utf-8') as source:
+            source.write('\n'.join(names))
+        path = os.path.join(directory, 'domains.bin')
+        disposable_domains = DisposableDomains(path, source_path,
+                                               reload_interval=3600)
+        assert names[-1] in disposable_domains
+
+        # what a worker would hold to look domains up in a set instead
+        tracemalloc.start()
+        with open(source_path, encoding='utf-8') as source:
+            domain_set = frozenset(line.strip() for line in source)
+        set_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        for name, domain in (
+            ('listed domain', names[domain_count // 2]),
+            ('subdomain of a listed domain', f'mx.{names[domain_count // 2]}'),
+            ('unlisted domain', 'gmail.com'),
+            ('unlisted subdomain', 'mail.corp.example.org'),
+        ):
+            lookup_time = timeit.timeit(lambda: domain in disposable_domains,
+                                        number=iterations) / iterations
+            print(f'{name}: {lookup_time * 1e9:.0f}ns')
+        set_time = timeit.timeit(lambda: 'gmail.com' in domain_set,
+                                 number=iterations) / iterations
+        call_time = timeit.timeit(lambda: None, number=iterations) / iterations
+        print(f'frozenset lookup: {set_time * 1e9:.0f}ns, '
+              f'empty function call: {call_time * 1e9:.0f}ns')
+        print(f'{domain_count} domains: mapped file '
+              f'{os.path.getsize(path) / 2**20:.1f}MB shared by every worker, '
+              f'frozenset {set_size / 2**20:.1f}MB per worker')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
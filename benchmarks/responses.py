@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Compares rendering the auth responses the way FastAPI does for a returned
+response model, validating, dumping and encoding with the json module,
+with returning it through model_response.
+
+    python -m benchmarks.responses [iterations]
+"""
+import sys
+import json
+import timeit
+from datetime import datetime, timezone
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from api.utils.responses import ORJSONResponse, model_response
+from api.v1.schemas.user import (LoginUserData, LoginUserResponse,
+                                 RegisterUserResponse, UserBase, UserListItem,
+                                 UsersPageData, UsersPageResponse)
+
+USER = UserBase(id='0b6c5c2e-2b6a-4a39-9d4e-6f3f1e1c2a7d',
+                email='johnson1@gmail.com', username='Johnson1234',
+                first_name='Johnson', last_name='Doe')
+TOKEN = 'eyJhbGciOiJFUzI1NiIsImtpZCI6IjEifQ.' + 'x' * 400
+RESPONSES = {
+    'login': LoginUserResponse(
+        status_code=200,
+        message='Login Successful',
+        data=LoginUserData(access_token=TOKEN, refresh_token=TOKEN,
+                           user=USER)
+    ),
+    'register': RegisterUserResponse(status_code=201, message='Successful',
+                                     data=USER),
+    'users page (100)': UsersPageResponse(
+        status_code=200,
+        message='Successful',
+        data=UsersPageData(users=[
+            UserListItem(**USER.model_dump(), is_active=True,
+                         is_blocked=False,
+                         created_at=datetime.now(timezone.utc))
+            for _ in range(100)
+        ], next_cursor='WyIyMDI0LTA5LTEwVDIw')
+    ),
+}
+
+
+def fastapi_render(field, model) -> bytes:
+    """Renders a model like a route that returns it to FastAPI"""
+    coroutine = serialize_response(field=field, response_content=model)
+    # nothing in it awaits for an async route, run it without a loop
+    try:
+        coroutine.send(None)
+    except StopIteration as result:
+        return JSONResponse(result.value).body
+    raise RuntimeError('serialize_response awaited')
+
+
+def per_call(function, iterations: int) -> float:
+    """Gets the seconds per call of a function"""
+    return timeit.timeit(function, number=iterations) / iterations
+
+
+def main(iterations: int) -> None:
+    """Prints the time per response of each path"""
+    for name, model in RESPONSES.items():
+        field = create_response_field(name='Response_' + type(model).__name__,
+                                      type_=type(model))
+        assert json.loads(fastapi_render(field, model)) == \
+            json.loads(model_response(model).body)
+        old_time = per_call(lambda: fastapi_render(field, model),
+                            iterations)
+        dict_time = per_call(lambda: ORJSONResponse(
+            model.model_dump(mode='json', by_alias=True)
+        ).body, iterations)
+        new_time = per_call(lambda: model_response(model).body, iterations)
+        print(f'{name}: fastapi {old_time * 1e6:.1f}us, orjson dict '
+              f'{dict_time * 1e6:.1f}us, model_response '
+              f'{new_time * 1e6:.1f}us ({old_time / new_time:.1f}x)')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compares the ORM and the Core repository statements for the hot user lookups.
+
+Both paths run against the same in-memory sqlite database so the
+difference is the client side cost of building, executing and loading
+each query, which is the same whatever database is behind it.
+
+    python -m benchmarks.user_lookups [iterations]
+"""
+import sys
+import timeit
+from sqlalchemy import create_engine, event, or_, pool, select
+from sqlalchemy.orm import Session
+
+from api.db.database import Base
+from api.v1.models import User
+from api.v1.repositories.user import USER_BY_ID, USER_BY_LOGIN
+from api.v1.schemas.user import CurrentUser, UserBase
+
+
+def create_database() -> Session:
+    """Creates an in-memory database with a few users"""
+    engine = create_engine('sqlite://', poolclass=pool.StaticPool)
+
+    @event.listens_for(engine, 'connect')
+    def attach_public_schema(dbapi_connection, _):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS public")
+
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    for number in range(1000):
+        session.add(User(id=str(number), email=f'user{number}@example.com',
+                         username=f'user{number}', first_name='first',
+                         last_name='last', password='hash',
+                         idempotency_key=str(number)))
+    session.commit()
+    return session
+
+
+def main(iterations: int) -> None:
+    """Prints the time per lookup of each path"""
+    session = create_database()
+
+    def orm_by_id():
+        user = session.execute(
+            select(User).where(User.id == '500')
+        ).scalar_one_or_none()
+        session.expunge_all()
+        return CurrentUser.model_validate(user)
+
+    def core_by_id():
+        row = session.execute(USER_BY_ID, {'user_id': '500'}).one_or_none()
+        return CurrentUser.model_validate(row)
+
+    def orm_by_login():
+        user = session.execute(select(User).where(or_(
+            User.email == 'user500', User.username == 'user500'
+        ))).scalar_one_or_none()
+        session.expunge_all()
+        return UserBase.model_validate(user, from_attributes=True)
+
+    def core_by_login():
+        row = session.execute(USER_BY_LOGIN, {'login': 'user500'}).one_or_none()
+        return UserBase.model_validate(row, from_attributes=True)
+
+    assert orm_by_id() == core_by_id()
+    assert orm_by_login() == core_by_login()
+    for name, orm_path, core_path in (
+        ('user by id', orm_by_id, core_by_id),
+        ('user by email or username', orm_by_login, core_by_login),
+    ):
+        orm_time = timeit.timeit(orm_path, number=iterations) / iterations
+        core_time = timeit.timeit(core_path, number=iterations) / iterations
+        print(f'{name}: orm {orm_time * 1e6:.1f}us, core {core_time * 1e6:.1f}us '
+              f'({orm_time / core_time:.1f}x)')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
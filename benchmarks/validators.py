@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compares the single pass registration and login validators with the
+per-character loops they replaced, and shows their share of a whole
+model_validate call.
+
+    python -m benchmarks.validators [iterations]
+"""
+import re
+import sys
+import timeit
+import unicodedata
+from bleach import clean
+from email_validator import validate_email
+
+from api.utils.disposable_domains import disposable_domains
+from api.utils.username_matcher import (OFFENSIVE, RESERVED,
+                                        normalize_username, username_matcher)
+from api.v1.schemas.user import LoginUserSchema, RegisterUserSchema, TEST
+
+REGISTRATION = {
+    'email': 'johnson1@gmail.com',
+    'username': 'Johnson1234',
+    'first_name': 'Johnson',
+    'last_name': 'Doe',
+    'password': 'Johnson1234#',
+    'confirm_password': 'Johnson1234#',
+}
+LOGIN = {'username': 'Johnson1234', 'password': 'Johnson1234#'}
+
+
+def loop_validate_fields(values: dict) -> dict:
+    """The registration validator before it was rewritten"""
+    password: str = values.get('password', '')
+    confirm_password = values.get('confirm_password', '')
+    email = values.get('email', '')
+    first_name: str = values.get('first_name', '')
+    last_name: str = values.get('last_name', '')
+    username: str = values.get('username', '')
+    name_disallowed_char = '1234567890!@~`#$%^&*()_+=-,.<>/?"\\|'
+    password_allowed = '!@#&-_,.'
+    found = username_matcher.search(normalize_username(username))
+    if found & RESERVED:
+        raise ValueError('Username is reserved and cannot be used')
+    if found & OFFENSIVE:
+        raise ValueError('Username contains offensive language')
+    for c in first_name:
+        if c == ' ':
+            raise ValueError('use of white space is not allowed in first_name')
+        if c in name_disallowed_char:
+            raise ValueError(f'{c} is not allowed in first_name')
+    for c in last_name:
+        if c == ' ':
+            raise ValueError('use of white space is not allowed in last_name')
+        if c in name_disallowed_char:
+            raise ValueError(f'{c} is not allowed in last_name')
+    for c in username:
+        if c == ' ':
+            raise ValueError('use of white space is not allowed in username')
+        if c in '!@~`#$%^&*()_+=,.<>/?"\\|':
+            raise ValueError(f'{c} is not allowed in username')
+    values['first_name'] = clean(first_name.lower())
+    values['first_name'] = unicodedata.normalize('NFKC', first_name)
+    values['last_name'] = clean(last_name.lower())
+    values['last_name'] = unicodedata.normalize('NFKC', last_name)
+    values['username'] = clean(username.lower())
+    values['username'] = unicodedata.normalize('NFKC', username)
+    pattern = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+    email = validate_email(email, check_deliverability=False,
+                           test_environment=TEST).normalized
+    if not pattern.match(email):
+        raise ValueError(f'{email} is invalid')
+    values['email'] = email
+    if email.split('@')[1] in disposable_domains:
+        raise ValueError('not allowed for registration')
+    if not any(char for char in password if char.islower()):
+        raise ValueError('lowercase')
+    if not any(char for char in password if char.isupper()):
+        raise ValueError('uppercase')
+    if not any(char for char in password if char.isdigit()):
+        raise ValueError('digit')
+    if not any(char for char in password if char in password_allowed):
+        raise ValueError('special')
+    if any(char for char in password if char == ' '):
+        raise ValueError('white space')
+    if password != confirm_password:
+        raise ValueError('must match')
+    return values
+
+
+def loop_validate_data(values: dict) -> dict:
+    """The login validator before it was rewritten"""
+    username: str = values.get('username', '')
+    password: str = values.get('password', '')
+    password_allowed = '!@#&-_,.'
+    values['username'] = username.lower()
+    if not any(char for char in password if char.islower()):
+        raise ValueError('lowercase')
+    if not any(char for char in password if char.isupper()):
+        raise ValueError('uppercase')
+    if not any(char for char in password if char.isdigit()):
+        raise ValueError('digit')
+    if not any(char for char in password if char in password_allowed):
+        raise ValueError('special')
+    return values
+
+
+def per_call(function, values: dict, iterations: int) -> float:
+    """Gets the seconds per call of a validator"""
+    return timeit.timeit(lambda: function(dict(values)),
+                         number=iterations) / iterations
+
+
+def main(iterations: int) -> None:
+    """Prints the time per call of each validator"""
+    assert loop_validate_fields(dict(REGISTRATION)) == \
+        RegisterUserSchema.validate_fields(dict(REGISTRATION))
+    assert loop_validate_data(dict(LOGIN)) == \
+        LoginUserSchema.validate_data(dict(LOGIN))
+    for name, schema, old_validator, new_validator, values in (
+        ('register', RegisterUserSchema, loop_validate_fields,
+         RegisterUserSchema.validate_fields, REGISTRATION),
+        ('login', LoginUserSchema, loop_validate_data,
+         LoginUserSchema.validate_data, LOGIN),
+    ):
+        old_time = per_call(old_validator, values, iterations)
+        new_time = per_call(new_validator, values, iterations)
+        model_time = per_call(schema.model_validate, values, iterations)
+        print(f'{name}: loops {old_time * 1e6:.1f}us, single pass '
+              f'{new_time * 1e6:.1f}us ({old_time / new_time:.1f}x), '
+              f'whole model_validate {model_time * 1e6:.1f}us')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
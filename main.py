@@ -1,5 +1,6 @@
+import asyncio
 from typing import AsyncIterator
-from fastapi import FastAPI, status
+from fastapi import Depends, FastAPI, status
 from fastapi.exceptions import HTTPException, RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from aioredis.exceptions import RedisError
@@ -8,9 +9,21 @@ from aio_pika.exceptions import AMQPError
 from contextlib import asynccontextmanager
 
 from api.utils.exceptions import GlobalExceptionHandler
-from api.db.database import engine
+from api.core.dependencies.internal_auth import require_internal_api_key
+from api.db.database import engine, replica_set
 from api.v1.routes import api_version_one
+from api.v1.routes.well_known import well_known
 from api.utils.rate_limits import consume_rate_limit_queue_sync
+from api.utils.settings import settings
+from api.utils.password_hashing import load_shared_cost, configure_password_context
+from api.v1.models.user import password_context
+from api.utils.metrics import metrics
+from api.utils.invalidation_listener import start_invalidation_listener
+from api.utils.token_revocation import DENYLIST_MODE, revoked_jti_filter
+from api.utils.jwt_keys import get_key_ring
+from api.utils.disposable_domains import disposable_domains
+from api.utils.responses import ORJSONResponse
+from api.v1.services.user_import import user_import_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
@@ -19,16 +32,44 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """
     # add consume_rate_limit_queue to run on startup
     print("Starting up application...")
+    # load the jwt signing keys now so a bad key fails the startup
+    get_key_ring()
+    # refuse to start without the disposable email domains
+    disposable_domains.load()
+    # recompile and remap changed domain lists off the request path
+    disposable_domains.start()
+    if settings.PASSWORD_HASH_AUTOTUNE:
+        # use the password hashing costs calibrated once for every worker
+        cost = await asyncio.to_thread(load_shared_cost)
+        configure_password_context(password_context, **cost)
+        print(f'Calibrated password hashing: {cost}')
+    # apply revocations and cache invalidations from other processes
+    start_invalidation_listener()
+    if DENYLIST_MODE:
+        # build the revoked jti filter off the request path
+        revoked_jti_filter.start()
+    # send reads to replicas only while they are caught up
+    replica_monitor = None
+    if replica_set.engines:
+        replica_monitor = asyncio.create_task(
+            replica_set.monitor(settings.DB_REPLICA_CHECK_INTERVAL)
+        )
     # Yield control back to FastAPI while app is running
     try:
         yield
     finally:
+        if replica_monitor:
+            replica_monitor.cancel()
+        # stop the import hashing workers
+        user_import_service.shutdown()
+        await replica_set.dispose()
         await engine.dispose()
         print("Shutting down application...")
 
 # Create FastAPI app with lifespan
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.include_router(api_version_one)
+app.include_router(well_known)
 
 app.get("/", tags=['HOME'])
 async def read_root():
@@ -44,6 +85,14 @@ async def root():
     """
     return {"message": "Welcome to fastapi custom ratelimite"}
 
+@app.get("/metrics", status_code=status.HTTP_200_OK, tags=['HOME'],
+         dependencies=[Depends(require_internal_api_key)])
+async def get_metrics():
+    """
+    Process metrics, for internal services only
+    """
+    return metrics.snapshot()
+
 @app.get("/raise-http-exception", tags=['TEST EXCEPTIONS'])
 async def raise_http_exception():
     """
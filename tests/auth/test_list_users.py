@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test listing and exporting users
+"""
+import json
+import pytest
+from unittest import mock
+from datetime import datetime, timezone
+from fastapi import HTTPException
+
+from api.v1.services.auth import auth_service, decode_cursor
+
+
+def user_row(number: int) -> mock.Mock:
+    """Builds a listed user row"""
+    return mock.Mock(id=str(number), email=f'user{number}@example.org',
+                     username=f'user{number}', first_name='first',
+                     last_name='last', is_active=True, is_blocked=False,
+                     created_at=datetime(2024, 9, 10, number, tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def mock_repository():
+    """Patches the user repository of the auth service"""
+    with mock.patch('api.v1.services.auth.user_repository') as repository:
+        yield repository
+
+
+class TestListUsers:
+    """
+    Test class for listing and exporting users
+    """
+    @pytest.mark.asyncio
+    async def test_full_page_has_next_cursor(self, mock_repository):
+        """Test the cursor of a full page points after its last user"""
+        mock_repository.list_users = mock.AsyncMock(
+            return_value=[user_row(1), user_row(2)]
+        )
+
+        response = await auth_service.fetch_all(mock.AsyncMock(), limit=2)
+
+        assert [user.id for user in response.data.users] == ['1', '2']
+        assert decode_cursor(response.data.next_cursor) == (
+            user_row(2).created_at, '2'
+        )
+
+    @pytest.mark.asyncio
+    async def test_next_page_uses_cursor(self, mock_repository):
+        """Test a cursor is passed on as the keyset position"""
+        mock_repository.list_users = mock.AsyncMock(return_value=[user_row(3)])
+        first = await auth_service.fetch_all(mock.AsyncMock(), limit=1)
+
+        response = await auth_service.fetch_all(mock.AsyncMock(), limit=2,
+                                                cursor=first.data.next_cursor)
+
+        _, limit, after = mock_repository.list_users.await_args.args
+        assert (limit, after) == (2, (user_row(3).created_at, '3'))
+        assert response.data.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, mock_repository):
+        """Test a malformed cursor is rejected"""
+        with pytest.raises(HTTPException) as exc_info:
+            await auth_service.fetch_all(mock.AsyncMock(), limit=2,
+                                         cursor='not-a-cursor')
+
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_export_streams_ndjson(self, mock_repository):
+        """Test every streamed batch is written as NDJSON lines"""
+        async def stream_users(db, batch_size):
+            yield [user_row(1), user_row(2)]
+            yield [user_row(3)]
+        mock_repository.stream_users = stream_users
+
+        with mock.patch('api.v1.services.auth.async_session_factory'):
+            chunks = [chunk async for chunk in auth_service.export_users()]
+
+        lines = b''.join(chunks).decode().splitlines()
+        assert len(chunks) == 2
+        assert [json.loads(line)['id'] for line in lines] == ['1', '2', '3']
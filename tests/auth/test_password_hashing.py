@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test password hashing module
+"""
+from unittest import mock
+from contextlib import contextmanager
+from passlib.context import CryptContext
+
+from api.v1.models import User
+from api.v1.models.user import password_context
+from api.utils import password_hashing
+from api.utils.password_hashing import (build_password_context,
+                                        budget_memory_cost,
+                                        load_shared_cost)
+
+
+class TestPasswordHashing:
+    """
+    Test class for password hashing
+    """
+    def test_new_hashes_use_argon2id(self):
+        """Test new passwords are hashed with argon2id"""
+        user = User()
+        user.set_password('Johnson1234#')
+
+        assert user.password.startswith('$argon2id$')
+        assert user.verify_password('Johnson1234#')
+
+    def test_outdated_bcrypt_hash_is_rehashed(self):
+        """Test a bcrypt hash is upgraded on successful verification"""
+        legacy_context = CryptContext(schemes=['bcrypt'])
+        user = User(password=legacy_context.hash('Johnson1234#'))
+
+        assert user.verify_and_update_password('Johnson1234#')
+        assert user.password.startswith('$argon2id$')
+        assert not password_context.needs_update(user.password)
+
+    def test_failed_verification_keeps_hash(self):
+        """Test a wrong password does not touch the stored hash"""
+        legacy_context = CryptContext(schemes=['bcrypt'])
+        legacy_hash = legacy_context.hash('Johnson1234#')
+        user = User(password=legacy_hash)
+
+        assert not user.verify_and_update_password('Wrong1234#')
+        assert user.password == legacy_hash
+
+    def test_changed_cost_needs_update(self):
+        """Test hashes made with different cost parameters need an update"""
+        context = build_password_context(argon2_time_cost=2)
+        stronger_context = build_password_context(argon2_time_cost=4)
+
+        hashed = context.hash('Johnson1234#')
+
+        assert not context.needs_update(hashed)
+        assert stronger_context.needs_update(hashed)
+
+    def test_memory_cost_fits_budget(self):
+        """Test concurrent argon2 hashes are kept within the memory budget"""
+        assert budget_memory_cost(65536, budget=1048576, concurrency=8) == 65536
+        assert budget_memory_cost(65536, budget=1048576, concurrency=32) == 32768
+        assert budget_memory_cost(65536, budget=65536, concurrency=32) == 19456
+        assert budget_memory_cost(65536, budget=0, concurrency=32) == 65536
+
+    def test_shared_cost_is_calibrated_once(self):
+        """Test workers use the costs stored by the first to calibrate"""
+        stored = {}
+        redis = mock.Mock()
+        redis.get.side_effect = stored.get
+        redis.set.side_effect = lambda key, value, nx: stored.setdefault(key, value)
+
+        @contextmanager
+        def get_redis_sync():
+            yield redis
+
+        with mock.patch.object(password_hashing, 'get_redis_sync', get_redis_sync), \
+             mock.patch.object(password_hashing, 'calibrate_cost',
+                               return_value={'argon2_time_cost': 5}) as calibrate:
+            assert load_shared_cost() == {'argon2_time_cost': 5}
+            calibrate.return_value = {'argon2_time_cost': 7}
+            assert load_shared_cost() == {'argon2_time_cost': 5}
+
+        calibrate.assert_called_once()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test refresh token rotation
+"""
+import pytest
+from unittest import mock
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from api.v1.services.auth import auth_service, RefreshTokenResponse
+from api.v1.schemas.user import CurrentUser
+
+
+@pytest.fixture
+def bound_request():
+    """A request matching the ip and user-agent of issued tokens"""
+    request = mock.Mock()
+    request.client.host = '10.0.0.1'
+    request.headers = {'user-agent': 'pytest'}
+    yield request
+
+
+@pytest.fixture
+def mock_token_store():
+    """Patches the redis backed token and session functions"""
+    rotated = set()
+    with mock.patch('api.v1.services.auth.get_session_generation',
+                    return_value=0) as mock_get_generation, \
+         mock.patch('api.v1.services.auth.check_active_jti',
+                    return_value=True), \
+         mock.patch('api.v1.services.auth.read_generation',
+                    side_effect=lambda user_id, value: int(value or 0)), \
+         mock.patch('api.v1.services.auth.get_redis_sync') as mock_redis, \
+         mock.patch('api.v1.services.auth.is_rotated_jti',
+                    side_effect=lambda jti: jti in rotated), \
+         mock.patch('api.v1.services.auth.rotate_refresh_jti',
+                    side_effect=lambda jti, exp, user_id: not (jti in rotated or rotated.add(jti))), \
+         mock.patch('api.v1.services.auth.release_db'), \
+         mock.patch('api.v1.services.auth.user_cache') as mock_user_cache, \
+         mock.patch('api.v1.services.auth.revoke_all_sessions') as mock_revoke_all:
+        mock_user_cache.get.return_value = CurrentUser(
+            id='123', username='user', first_name='first', last_name='last',
+            is_active=True, is_blocked=False
+        )
+        pipe = mock_redis.return_value.__enter__.return_value.pipeline.return_value
+        # the session generation is the last result of the pipeline
+        pipe.execute.return_value = [None]
+        mock_revoke_all.pipe = pipe
+        mock_revoke_all.get_generation = mock_get_generation
+        mock_revoke_all.user_cache = mock_user_cache
+        yield mock_revoke_all
+
+
+class TestRefreshToken:
+    """
+    Test class for refresh token rotation
+    """
+    def refresh_token(self, request, token_type='refresh'):
+        """Builds a token for user 123"""
+        token, _, _ = auth_service.build_jwt_token(
+            '123', request, datetime.now(timezone.utc), token_type=token_type
+        )
+        return token
+
+    @pytest.mark.asyncio
+    async def test_refresh_issues_new_pair(self, mock_token_store, bound_request):
+        """Test a refresh token is exchanged for new tokens"""
+        token = self.refresh_token(bound_request)
+
+        response = await auth_service.refresh_tokens(token, bound_request, mock.Mock())
+
+        assert isinstance(response, RefreshTokenResponse)
+        assert response.data.refresh_token != token
+        claims = auth_service.decode_jwt_token(response.data.access_token)
+        assert claims['user_id'] == '123'
+        assert claims['token_type'] == 'access'
+
+    @pytest.mark.asyncio
+    async def test_reuse_revokes_all_sessions(self, mock_token_store, bound_request):
+        """Test presenting a rotated refresh token revokes every session"""
+        token = self.refresh_token(bound_request)
+        await auth_service.refresh_tokens(token, bound_request, mock.Mock())
+
+        with pytest.raises(HTTPException) as exc_info:
+            await auth_service.refresh_tokens(token, bound_request, mock.Mock())
+
+        assert exc_info.value.status_code == 401
+        mock_token_store.assert_called_once_with('123')
+
+    @pytest.mark.asyncio
+    async def test_access_token_rejected(self, mock_token_store, bound_request):
+        """Test an access token cannot be used to refresh"""
+        token = self.refresh_token(bound_request, token_type='access')
+
+        with pytest.raises(HTTPException) as exc_info:
+            await auth_service.refresh_tokens(token, bound_request, mock.Mock())
+
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_generation_read_with_sessions(self, mock_token_store,
+                                                 bound_request):
+        """Test new tokens get the generation read in the session pipeline"""
+        token = self.refresh_token(bound_request)
+        mock_token_store.get_generation.reset_mock()
+        mock_token_store.pipe.execute.return_value = [None, '4']
+
+        response = await auth_service.refresh_tokens(token, bound_request, mock.Mock())
+
+        for new_token in (response.data.access_token,
+                          response.data.refresh_token):
+            assert auth_service.decode_jwt_token(new_token)['gen'] == 4
+        mock_token_store.pipe.execute.assert_called_once()
+        # only to verify the presented token, not to sign the new ones
+        mock_token_store.get_generation.assert_called_once_with('123')
+
+    @pytest.mark.asyncio
+    async def test_inactive_user_rejected(self, mock_token_store, bound_request):
+        """Test an inactive or blocked user gets no new tokens"""
+        token = self.refresh_token(bound_request)
+        user = mock_token_store.user_cache.get.return_value
+
+        for status_code, update in ((400, {'is_active': False}),
+                                    (403, {'is_blocked': True,
+                                           'lockout_expires_at': datetime.now(timezone.utc)})):
+            mock_token_store.user_cache.get.return_value = user.model_copy(
+                update=update
+            )
+            with pytest.raises(HTTPException) as exc_info:
+                await auth_service.refresh_tokens(token, bound_request,
+                                                  mock.Mock())
+
+            assert exc_info.value.status_code == status_code
+        mock_token_store.pipe.execute.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_redis_outage_issues_no_tokens(self, mock_token_store,
+                                                 bound_request):
+        """Test a refresh fails closed with a 503 while redis is down"""
+        token = self.refresh_token(bound_request)
+
+        for patched in ('is_rotated_jti', 'rotate_refresh_jti'):
+            with mock.patch(f'api.v1.services.auth.{patched}',
+                            side_effect=RedisConnectionError('down')):
+                with pytest.raises(HTTPException) as exc_info:
+                    await auth_service.refresh_tokens(token, bound_request,
+                                                      mock.Mock())
+
+            assert exc_info.value.status_code == 503
+        mock_token_store.pipe.execute.assert_not_called()
+        mock_token_store.assert_not_called()
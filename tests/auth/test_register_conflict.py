@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test registration conflicts
+"""
+import pytest
+from unittest import mock
+from fastapi import HTTPException
+
+from api.v1.models import User
+from api.v1.services.auth import (auth_service, generate_idempotency_key,
+                                  RegisterUserSchema, RegisterUserResponse)
+
+
+@pytest.fixture
+def schema():
+    """A registration that skips the deliverability validators"""
+    yield RegisterUserSchema.model_construct(
+        email='benson@example.com',
+        username='Benson',
+        first_name='Benson',
+        last_name='Ben',
+        password='Johnson1234#',
+        confirm_password='Johnson1234#'
+    )
+
+
+@pytest.fixture
+def conflicting_db():
+    """A session whose insert conflicts with an existing user"""
+    existing_users = []
+    db = mock.AsyncMock()
+    insert_result = mock.Mock()
+    insert_result.one_or_none.return_value = None
+    lookup_result = mock.Mock()
+    lookup_result.scalars.return_value.all.return_value = existing_users
+    db.execute.side_effect = [insert_result, lookup_result]
+    with mock.patch('api.v1.services.auth.check_email_deliverability'), \
+         mock.patch('api.v1.services.auth.password_admission.run'):
+        yield db, existing_users
+
+
+class TestRegisterConflict:
+    """
+    Test class for registration conflicts
+    """
+    @pytest.mark.asyncio
+    async def test_replay_returns_registered_user(self, schema, conflicting_db):
+        """Test a repeated registration returns the registered user"""
+        db, existing_users = conflicting_db
+        key = await generate_idempotency_key(schema.username, schema.email)
+        existing_users.append(User(id='123', email=schema.email,
+                                   username=schema.username,
+                                   first_name='Benson', last_name='Ben',
+                                   idempotency_key=key))
+
+        response = await auth_service.create(schema, db)
+
+        assert isinstance(response, RegisterUserResponse)
+        assert response.message == 'User already registered'
+        assert response.data.id == '123'
+        assert db.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_duplicate_username(self, schema, conflicting_db):
+        """Test a taken username is reported"""
+        db, existing_users = conflicting_db
+        existing_users.append(User(id='123', email='other@example.com',
+                                   username=schema.username,
+                                   first_name='Benson', last_name='Ben',
+                                   idempotency_key='other'))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await auth_service.create(schema, db)
+
+        assert exc_info.value.status_code == 409
+        assert exc_info.value.detail == 'username already taken.'
+
+    @pytest.mark.asyncio
+    async def test_duplicate_email_in_other_case(self, schema, conflicting_db):
+        """Test an email taken in another case is reported"""
+        db, existing_users = conflicting_db
+        existing_users.append(User(id='123', email='BENSON@example.com',
+                                   username='other',
+                                   first_name='Benson', last_name='Ben',
+                                   idempotency_key='other'))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await auth_service.create(schema, db)
+
+        assert exc_info.value.status_code == 409
+        assert exc_info.value.detail == 'email already exists.'
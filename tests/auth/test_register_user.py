@@ -19,12 +19,10 @@ class TestAuthService:
     """
     @pytest.mark.asyncio
     @mock.patch("api.utils.email_dns_resolver.check_email_deliverability")
-    @mock.patch("api.v1.services.auth.AuthService.check_idempotency")
     @mock.patch("api.v1.services.auth.AuthService.check_user_exists")
     @mock.patch("api.v1.services.auth.auth_service.create")
     async def test_creat_user(self, mock_create,
                               mock_check_user_exists,
-                              mock_check_idempotency,
                               mock_check_email_deliverability,
                               mock_get_db, user_two):
         """Tests create user success"""
@@ -35,7 +33,6 @@ class TestAuthService:
 
         # Mocking the database session
         mock_check_user_exists.return_value = None
-        mock_check_idempotency.return_value = None
         mock_check_email_deliverability.return_value = None
         mock_create.return_value = RegisterUserResponse(
             status_code=201,
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test bulk user import
+"""
+import json
+import pytest
+from unittest import mock
+
+from api.v1.services.user_import import (UserImportService, iter_csv_rows,
+                                         iter_lines)
+
+
+async def stream(*chunks: bytes):
+    """Yields chunks like a request body"""
+    for chunk in chunks:
+        yield chunk
+
+
+def user(number: int, **values) -> dict:
+    """Builds valid registration values"""
+    return {
+        'email': f'benson{number}@example.org',
+        'username': f'benson{number}',
+        'first_name': 'Benson',
+        'last_name': 'Bense',
+        'password': 'Johnson1234#',
+        **values
+    }
+
+
+@pytest.fixture
+def service():
+    """An import service with one hashing worker"""
+    import_service = UserImportService(chunk_size=10, workers=1, max_errors=10)
+    yield import_service
+    import_service.shutdown()
+
+
+@pytest.fixture
+def mock_repository():
+    """Patches the database calls of the import"""
+    existing = [mock.Mock(email='taken@example.org', username='taken')]
+    with mock.patch('api.v1.services.user_import.check_email_deliverability'), \
+         mock.patch('api.v1.services.user_import.user_repository') as repository:
+        repository.get_existing_logins = mock.AsyncMock(return_value=existing)
+        repository.copy_users = mock.AsyncMock(
+            side_effect=lambda db, records: len(records)
+        )
+        yield repository
+
+
+class TestUserImport:
+    """
+    Test class for UserImportService
+    """
+    @pytest.mark.asyncio
+    async def test_iter_lines_across_chunks(self):
+        """Test lines split over chunks are joined and numbered"""
+        lines = [line async for line in iter_lines(stream(b'a,b\nc', b',d\n\ne'))]
+
+        assert lines == [(1, b'a,b'), (2, b'c,d'), (4, b'e')]
+
+    @pytest.mark.asyncio
+    async def test_csv_quoted_newlines(self):
+        """Test a quoted field may span lines and chunks"""
+        body = (b'a,b\n\n"x\n', b'\ny",z\n"un\xffread",1\n', b'c,"d""e"\n"open')
+        rows = [row async for row in iter_csv_rows(stream(*body))]
+
+        assert rows == [
+            (1, ['a', 'b'], None),
+            (3, ['x\n\ny', 'z'], None),
+            (6, None, rows[2][2]),
+            (7, ['c', 'd"e'], None),
+            (8, None, 'unterminated quoted field'),
+        ]
+        assert 'utf-8' in rows[2][2]
+
+    @pytest.mark.asyncio
+    async def test_ndjson_import(self, service, mock_repository):
+        """Test valid users are copied and every bad row is reported"""
+        rows = [
+            user(1),
+            user(2, password='weak'),
+            user(3, username='Taken'),
+            user(4, email='benson1@example.org'),
+            user(5, username=123),
+            user(6, password=12345678),
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows).encode() + b'\nnot json\n'
+
+        response = await service.import_users(stream(body), 'ndjson', mock.AsyncMock())
+
+        assert response.data.imported == 1
+        assert response.data.failed == 6
+        assert {error.line: error.error for error in response.data.errors}[3] \
+            == 'username already taken.'
+        assert {error.line: error.error for error in response.data.errors}[4] \
+            == 'email already exists.'
+        (_, records), _ = mock_repository.copy_users.await_args
+        assert records[0][1] == 'benson1@example.org'
+        assert records[0][5].startswith('$argon2')
+        mock_repository.get_existing_logins.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_csv_import_in_batches(self, service, mock_repository):
+        """Test a csv file is loaded one batch at a time"""
+        header = 'email,username,first_name,last_name,password'
+        lines = [header] + [
+            ','.join(user(number).values()) for number in range(1, 6)
+        ]
+        service.chunk_size = 2
+
+        response = await service.import_users(
+            stream('\n'.join(lines).encode()), 'csv', mock.AsyncMock()
+        )
+
+        assert response.data.imported == 5
+        assert response.data.failed == 0
+        assert mock_repository.copy_users.await_count == 3
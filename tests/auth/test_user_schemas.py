@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test registration and login validation
+"""
+import pytest
+from pydantic import ValidationError
+
+from api.v1.schemas.user import (IntrospectTokenItem, LoginUserSchema,
+                                 RegisterUserSchema)
+
+REGISTRATION = {
+    'email': 'johnson1@gmail.com',
+    'username': 'Johnson1234',
+    'first_name': 'Johnson',
+    'last_name': 'Doe',
+    'password': 'Johnson1234#',
+    'confirm_password': 'Johnson1234#',
+}
+
+
+def error_of(schema, values: dict) -> str:
+    """Gets the message a schema rejects values with"""
+    with pytest.raises(ValidationError) as exc_info:
+        schema.model_validate(values)
+    return exc_info.value.errors()[0]['msg'].removeprefix('Value error, ')
+
+
+class TestUserSchemas:
+    """
+    Test class for RegisterUserSchema and LoginUserSchema validation
+    """
+    def test_valid_registration(self):
+        """Test names are kept as given and the email normalized"""
+        user = RegisterUserSchema.model_validate({**REGISTRATION,
+                                                  'email': 'Johnson1@GMAIL.com'})
+
+        assert user.email == 'Johnson1@gmail.com'
+        assert user.first_name == 'Johnson'
+
+    @pytest.mark.parametrize('values, message', [
+        ({'first_name': 'Jo hn'}, 'use of white space is not allowed in first_name'),
+        ({'last_name': 'D0e-'}, '0 is not allowed in last_name'),
+        ({'username': 'john.doe'}, '. is not allowed in username'),
+        ({'username': 'Admin'}, 'Username is reserved and cannot be used'),
+        ({'password': 'JOHNSON1234#', 'confirm_password': 'JOHNSON1234#'},
+         'JOHNSON1234# must contain at least one lowercase letter'),
+        ({'password': 'Johnson1234', 'confirm_password': 'Johnson1234'},
+         'Johnson1234 must contain at least one of these special characters !@#&-_,.'),
+        ({'password': 'Johnson 1234#', 'confirm_password': 'Johnson 1234#'},
+         'Johnson 1234# cannot contain a white space character'),
+        ({'confirm_password': 'Johnson1234@'},
+         'Johnson1234# and Johnson1234@ must match'),
+    ])
+    def test_registration_errors(self, values, message):
+        """Test the first failed check names the problem"""
+        assert error_of(RegisterUserSchema, {**REGISTRATION, **values}) == message
+
+    def test_non_ascii_password(self):
+        """Test non-ASCII letters count as lower and upper case letters"""
+        assert error_of(LoginUserSchema, {'username': 'johnson',
+                                          'password': 'ÉCOLE1234#'}) == \
+            'ÉCOLE1234# must contain at least one lowercase letter'
+        assert LoginUserSchema.model_validate({'username': 'Johnson',
+                                               'password': 'éCOLE1234#'}).username \
+            == 'johnson'
+
+    @pytest.mark.parametrize('client', [
+        {'ip': '203.0.113.7'},
+        {'user_agent': 'Mozilla/5.0'},
+    ])
+    def test_introspection_client_in_full(self, client):
+        """Test a token binding is only checked against a whole client"""
+        assert error_of(IntrospectTokenItem, {'token': 'token', **client}) \
+            == 'ip and user_agent must be given together'
+        assert IntrospectTokenItem(token='token', ip='203.0.113.7',
+                                   user_agent='Mozilla/5.0').ip
+        assert IntrospectTokenItem(token='token').ip is None
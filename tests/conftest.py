@@ -3,6 +3,15 @@ import pytest
 from uuid import uuid4
 from fastapi import Request
 
+from api.utils.disposable_domains import disposable_domains
+
+
+@pytest.fixture(scope="session", autouse=True)
+def load_disposable_domains():
+    """
+    Loads the disposable email domains the application loads on startup
+    """
+    disposable_domains.load()
 
 
 @pytest.fixture
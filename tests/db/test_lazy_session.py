@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the request database session
+"""
+import pytest
+from unittest import mock
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db.database import engine, get_db, pin_to_primary
+from api.v1.models import User
+
+
+@pytest.fixture
+def mock_commit():
+    """Patches session commits"""
+    with mock.patch.object(AsyncSession, 'commit') as commit:
+        yield commit
+
+
+async def finish(dependency) -> None:
+    """Runs the rest of a dependency after the handler returned"""
+    with pytest.raises(StopAsyncIteration):
+        await anext(dependency)
+
+
+class TestLazySession:
+    """
+    Test class for get_db
+    """
+    @pytest.mark.asyncio
+    async def test_unused_session_takes_no_connection(self, mock_commit):
+        """Test a request that never queries neither connects nor commits"""
+        dependency = get_db()
+        await anext(dependency)
+
+        await finish(dependency)
+
+        mock_commit.assert_not_awaited()
+        assert engine.pool.checkedout() == 0
+
+    @pytest.mark.asyncio
+    async def test_pending_objects_are_committed(self, mock_commit):
+        """Test added objects are committed"""
+        dependency = get_db()
+        db = await anext(dependency)
+        db.add(User(email='user@example.org', username='user'))
+
+        await finish(dependency)
+
+        mock_commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_pinned_session_is_committed(self, mock_commit):
+        """Test a session that ran writes is committed"""
+        dependency = get_db()
+        db = await anext(dependency)
+        pin_to_primary(db)
+
+        await finish(dependency)
+
+        mock_commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_request_is_rolled_back(self, mock_commit):
+        """Test a request that raised is not committed"""
+        dependency = get_db()
+        db = await anext(dependency)
+        db.add(User(email='user@example.org', username='user'))
+
+        with pytest.raises(ValueError):
+            await dependency.athrow(ValueError('handler failed'))
+
+        mock_commit.assert_not_awaited()
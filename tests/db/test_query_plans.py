@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the auth lookups are served by indexes
+
+Runs EXPLAIN against the migrated database at DB_URL, and is skipped when
+the database is unavailable.
+"""
+import json
+import pytest
+from datetime import datetime
+from typing import Iterator, List
+from sqlalchemy import pool, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection
+
+from api.v1.models import User
+from api.utils.settings import settings
+from api.v1.services.auth import registration_conflicts_lookup
+from api.v1.repositories.user import (USER_BY_ID, USER_BY_LOGIN, LOCKOUT_STATE,
+                                     NEXT_USERS_PAGE)
+
+
+@pytest.fixture
+async def plan_db():
+    """A connection that prefers any usable index over a sequential scan"""
+    engine = create_async_engine(settings.DB_URL, poolclass=pool.NullPool)
+    try:
+        conn = await engine.connect()
+    except (OSError, SQLAlchemyError) as exc:
+        await engine.dispose()
+        pytest.skip(f'database unavailable: {exc}')
+    # test tables are small enough that scanning them is cheapest, so only
+    # check that an index can serve the query
+    await conn.execute(text('SET enable_seqscan = off'))
+    yield conn
+    await conn.close()
+    await engine.dispose()
+
+
+async def explain(conn: AsyncConnection, stmt) -> dict:
+    """Gets the plan of a statement"""
+    compiled = stmt.compile(dialect=conn.dialect,
+                            compile_kwargs={'literal_binds': True})
+    result = await conn.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}'))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    """Walks every node of a plan"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def users_scans(plan: dict) -> List[dict]:
+    """Gets the nodes of a plan that read the users table or its indexes"""
+    return [node for node in plan_nodes(plan)
+            if node.get('Relation Name') == 'users'
+            or node.get('Index Name', '').startswith(('ix_users_', 'users_'))]
+
+
+def assert_indexes(plan: dict, *index_names: str) -> None:
+    """Asserts users is only read through the given indexes"""
+    scans = users_scans(plan)
+    assert scans, plan
+    assert not [node for node in scans if node['Node Type'] == 'Seq Scan'], plan
+    used = {node['Index Name'] for node in scans if 'Index Name' in node}
+    assert set(index_names) <= used, plan
+
+
+class TestQueryPlans:
+    """
+    Test class for the plans of the auth lookups
+    """
+    @pytest.mark.asyncio
+    async def test_login_lookup(self, plan_db):
+        """Test login probes the lower() email and username indexes"""
+        stmt = USER_BY_LOGIN.params(login='johnson@example.com')
+        plan = await explain(plan_db, stmt)
+
+        assert_indexes(plan, 'ix_users_lower_email', 'ix_users_lower_username')
+
+    @pytest.mark.asyncio
+    async def test_idempotency_lookup(self, plan_db):
+        """Test replays are found through the idempotency key index"""
+        stmt = select(User).where(User.idempotency_key == 'key')
+
+        assert_indexes(await explain(plan_db, stmt), 'ix_users_idempotency_key')
+
+    @pytest.mark.asyncio
+    async def test_registration_conflicts_lookup(self, plan_db):
+        """Test registration conflicts are found through the unique indexes"""
+        stmt = registration_conflicts_lookup('Johnson@example.com',
+                                             'Johnson', 'key')
+
+        assert_indexes(await explain(plan_db, stmt),
+                       'ix_users_lower_email', 'ix_users_lower_username',
+                       'ix_users_idempotency_key')
+
+    @pytest.mark.asyncio
+    async def test_current_user_lookup(self, plan_db):
+        """Test the current user is found through the primary key"""
+        stmt = USER_BY_ID.params(user_id='123')
+
+        assert_indexes(await explain(plan_db, stmt), 'users_pkey')
+
+    @pytest.mark.asyncio
+    async def test_lockout_state_lookup(self, plan_db):
+        """Test the lockout worker locks the user through the primary key"""
+        stmt = LOCKOUT_STATE.params(user_id='123')
+
+        assert_indexes(await explain(plan_db, stmt), 'users_pkey')
+
+    @pytest.mark.asyncio
+    async def test_users_page_lookup(self, plan_db):
+        """Test user pages seek through the (created_at, id) index"""
+        stmt = NEXT_USERS_PAGE.params(limit=100, after_id='123',
+                                      after_created_at=datetime(2024, 9, 10))
+
+        assert_indexes(await explain(plan_db, stmt), 'ix_users_created_at_id')
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Test bloom filter module
+"""
+from uuid import uuid4
+
+from api.utils.bloom_filter import BloomFilter
+
+
+class TestBloomFilter:
+    """
+    Test class for BloomFilter
+    """
+    def test_no_false_negatives(self):
+        """Test every added item is reported as present"""
+        bloom = BloomFilter(capacity=1000)
+        items = [str(uuid4()) for _ in range(1000)]
+
+        bloom.update(items)
+
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate(self):
+        """Test the false positive rate stays near the configured rate"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.update(str(uuid4()) for _ in range(1000))
+
+        false_positives = sum(str(uuid4()) in bloom for _ in range(10000))
+
+        assert false_positives < 300
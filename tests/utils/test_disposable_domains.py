@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test disposable email domain module
+"""
+import os
+import pytest
+
+from api.utils.settings import settings
+from api.utils.disposable_domains import (DisposableDomains, build_database,
+                                          parse_domains)
+
+
+@pytest.fixture
+def domains(tmp_path):
+    """Disposable domains compiled from a small source list"""
+    source = tmp_path / 'domains.txt'
+    source.write_text('# comment\nmailinator.com\n*.tempmail.org\n\nBÜCHER.example\n')
+    disposable_domains = DisposableDomains(str(tmp_path / 'domains.bin'),
+                                           str(source), reload_interval=0)
+    disposable_domains.load()
+    yield disposable_domains, source
+
+
+class TestDisposableDomains:
+    """
+    Test class for DisposableDomains
+    """
+    def test_domain_and_subdomains(self, domains):
+        """Test a domain blocks itself and its subdomains"""
+        disposable_domains, _ = domains
+
+        assert 'mailinator.com' in disposable_domains
+        assert 'MAILINATOR.com' in disposable_domains
+        assert 'eu.mx.mailinator.com' in disposable_domains
+        assert 'notmailinator.com' not in disposable_domains
+        assert 'com' not in disposable_domains
+        assert 'bücher.example' in disposable_domains
+
+    def test_wildcard_blocks_only_subdomains(self, domains):
+        """Test a '*.' entry blocks subdomains only"""
+        disposable_domains, _ = domains
+
+        assert 'tempmail.org' not in disposable_domains
+        assert 'x.tempmail.org' in disposable_domains
+
+    def test_hot_reload(self, domains):
+        """Test a changed source list is compiled and mapped again"""
+        disposable_domains, source = domains
+        assert 'yopmail.com' not in disposable_domains
+
+        source.write_text('yopmail.com\n')
+        # make sure the list is newer than the compiled file
+        stat = os.stat(disposable_domains.path)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        # lookups keep the mapped table until the reloader runs
+        assert 'yopmail.com' not in disposable_domains
+        disposable_domains.reload()
+
+        assert 'yopmail.com' in disposable_domains
+        assert 'mailinator.com' not in disposable_domains
+
+    def test_missing_files(self, tmp_path):
+        """Test lookups fail rather than pass without a database"""
+        disposable_domains = DisposableDomains(str(tmp_path / 'none.bin'),
+                                               str(tmp_path / 'none.txt'), 0)
+
+        with pytest.raises(RuntimeError):
+            disposable_domains.load()
+        with pytest.raises(RuntimeError):
+            'mailinator.com' in disposable_domains
+
+    def test_default_paths_ignore_working_directory(self, monkeypatch, tmp_path):
+        """Test the default lists are found from any working directory"""
+        monkeypatch.chdir(tmp_path)
+        disposable_domains = DisposableDomains(
+            settings.DISPOSABLE_DOMAINS_PATH,
+            settings.DISPOSABLE_DOMAINS_SOURCE, 0
+        )
+
+        disposable_domains.load()
+
+    def test_build_is_deterministic(self):
+        """Test the same list always compiles to the same file"""
+        domains = parse_domains(['b.com', 'a.com', '*.c.com'])
+
+        assert build_database(domains) == build_database(dict(reversed(domains.items())))
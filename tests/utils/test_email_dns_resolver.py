@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test email domain MX resolution
+"""
+import asyncio
+import pytest
+from unittest import mock
+from contextlib import contextmanager
+from aiodns.error import DNSError
+from fastapi import HTTPException
+from pycares.errno import ARES_ENOTFOUND, ARES_ETIMEOUT
+
+from api.utils import email_dns_resolver
+from api.utils.email_dns_resolver import (MXResolver, check_email_deliverability,
+                                          mx_cache_key)
+
+
+class FakeRedis:
+    """Keeps redis strings and their TTLs in dicts"""
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def ttl(self, key):
+        return self.ttls.get(key, -2)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.ttls[key] = ex
+
+
+@pytest.fixture
+def fake_redis():
+    """Patches the resolver's redis connection"""
+    redis = FakeRedis()
+
+    @contextmanager
+    def get_redis_sync():
+        yield redis
+
+    with mock.patch.object(email_dns_resolver, 'get_redis_sync', get_redis_sync):
+        yield redis
+
+
+@pytest.fixture
+def resolver(fake_redis):
+    """A resolver whose DNS queries are mocked"""
+    mx_resolver = MXResolver(max_size=10, min_ttl=60, max_ttl=3600,
+                             negative_ttl=300, timeout=1.0)
+    query = mock.AsyncMock()
+    with mock.patch.object(mx_resolver, '_get_resolver') as get_resolver, \
+         mock.patch.object(email_dns_resolver, 'mx_resolver', mx_resolver):
+        get_resolver.return_value.query = query
+        yield mx_resolver, query
+
+
+def mx_answer(host: str, ttl: int) -> mock.Mock:
+    """Builds an MX record"""
+    return mock.Mock(host=host, priority=10, ttl=ttl)
+
+
+class TestMXResolver:
+    """
+    Test class for MXResolver and check_email_deliverability
+    """
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_a_query(self, resolver, fake_redis):
+        """Test one query answers concurrent checks and is cached by its TTL"""
+        mx_resolver, query = resolver
+
+        async def slow_query(domain, qtype):
+            await asyncio.sleep(0.01)
+            return [mx_answer('mx.example.org', 120)]
+        query.side_effect = slow_query
+
+        results = await asyncio.gather(*(
+            mx_resolver.has_mx('example.org') for _ in range(5)
+        ))
+        await check_email_deliverability('user@Example.org')
+
+        assert results == [True] * 5
+        query.assert_awaited_once()
+        assert fake_redis.values[mx_cache_key('example.org')] == '1'
+        assert fake_redis.ttls[mx_cache_key('example.org')] == 120
+
+    @pytest.mark.asyncio
+    async def test_redis_result_skips_dns(self, resolver, fake_redis):
+        """Test a result cached by another process is used"""
+        mx_resolver, query = resolver
+        fake_redis.set(mx_cache_key('example.org'), '0', ex=50)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await check_email_deliverability('user@example.org')
+
+        assert exc_info.value.status_code == 400
+        query.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_missing_domain_is_cached(self, resolver, fake_redis):
+        """Test a domain without mail servers is cached for the negative TTL"""
+        mx_resolver, query = resolver
+        query.side_effect = DNSError(ARES_ENOTFOUND, 'Domain name not found')
+
+        with pytest.raises(HTTPException):
+            await check_email_deliverability('user@example.org')
+
+        assert fake_redis.ttls[mx_cache_key('example.org')] == 300
+
+    @pytest.mark.asyncio
+    async def test_null_mx_is_not_deliverable(self, resolver):
+        """Test a null MX record means no mail is accepted"""
+        mx_resolver, query = resolver
+        query.return_value = [mx_answer('', 3600)]
+
+        assert await mx_resolver.has_mx('example.org') is False
+
+    @pytest.mark.asyncio
+    async def test_resolver_failure_is_not_cached(self, resolver, fake_redis):
+        """Test a timeout fails the check without caching a result"""
+        mx_resolver, query = resolver
+        query.side_effect = DNSError(ARES_ETIMEOUT, 'Timeout while contacting DNS servers')
+
+        with pytest.raises(HTTPException) as exc_info:
+            await check_email_deliverability('user@example.org')
+
+        assert exc_info.value.status_code == 500
+        assert fake_redis.values == {}
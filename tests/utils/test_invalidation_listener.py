@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Test cache invalidation listener module
+"""
+from unittest import mock
+
+from api.utils import invalidation_listener
+from api.utils.invalidation_listener import dispatch, on_channel, reset
+
+
+class TestInvalidationListener:
+    """
+    Test class for the invalidation channel dispatcher
+    """
+    def test_dispatch(self):
+        """Test messages reach the handler of their channel only"""
+        handler = mock.Mock()
+        with mock.patch.dict(invalidation_listener.channel_handlers, clear=True):
+            on_channel('channel-1', handler)
+
+            dispatch('channel-1', 'message-1')
+            dispatch('channel-2', 'message-2')
+
+        handler.assert_called_once_with('message-1')
+
+    def test_reset_runs_every_handler(self):
+        """Test a failing reset handler does not skip the others"""
+        failing = mock.Mock(side_effect=RuntimeError('boom'))
+        other = mock.Mock()
+        with mock.patch.object(invalidation_listener, 'reset_handlers',
+                               [failing, other]):
+            reset()
+
+        failing.assert_called_once_with()
+        other.assert_called_once_with()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test jwt keys module
+"""
+import pytest
+from unittest import mock
+from jose import jwt, JWTError
+
+from api.utils import jwt_keys
+from api.utils.jwt_keys import KeyRing, generate_private_key
+
+
+class TestKeyRing:
+    """
+    Test class for KeyRing
+    """
+    @pytest.fixture
+    def keys_dir(self, tmp_path):
+        """Writes two ES256 keys"""
+        for kid in ('2024a', '2024b'):
+            (tmp_path / f'{kid}.pem').write_bytes(generate_private_key('ES256'))
+        return str(tmp_path)
+
+    def test_signs_with_active_kid(self, keys_dir):
+        """Test tokens carry the kid of the active key"""
+        key_ring = KeyRing('ES256', keys_dir=keys_dir, active_kid='2024a')
+
+        token = jwt.encode({'sub': '1'}, key_ring.signing_key,
+                           algorithm='ES256', headers=key_ring.headers)
+
+        assert jwt.get_unverified_header(token)['kid'] == '2024a'
+        assert jwt.decode(token, key_ring.verification_key('2024a'),
+                          algorithms=['ES256']) == {'sub': '1'}
+
+    def test_defaults_to_newest_key(self, keys_dir):
+        """Test the newest kid signs when none is configured"""
+        key_ring = KeyRing('ES256', keys_dir=keys_dir)
+
+        assert key_ring.kid == '2024b'
+
+    def test_jwks_publishes_public_keys(self, keys_dir):
+        """Test the JWKS lists every public key and no private parts"""
+        key_ring = KeyRing('ES256', keys_dir=keys_dir)
+
+        token = jwt.encode({'sub': '1'}, key_ring.signing_key,
+                           algorithm='ES256', headers=key_ring.headers)
+
+        assert [key['kid'] for key in key_ring.jwks['keys']] == ['2024a', '2024b']
+        assert all('d' not in key for key in key_ring.jwks['keys'])
+        assert jwt.decode(token, key_ring.jwks,
+                          algorithms=['ES256']) == {'sub': '1'}
+
+    def test_unknown_kid(self, keys_dir):
+        """Test an unknown kid is rejected"""
+        key_ring = KeyRing('ES256', keys_dir=keys_dir)
+
+        with pytest.raises(JWTError):
+            key_ring.verification_key('unknown')
+
+    def test_hmac_has_no_public_keys(self):
+        """Test HMAC keys are never published"""
+        key_ring = KeyRing('HS256', secret_key='supersecret')
+
+        assert key_ring.headers is None
+        assert key_ring.jwks == {'keys': []}
+
+    def test_unknown_kid_reloads_keys(self, keys_dir, tmp_path):
+        """Test a key added after loading verifies the tokens it signed"""
+        key_ring = KeyRing('ES256', keys_dir=keys_dir)
+        (tmp_path / '2024c.pem').write_bytes(generate_private_key('ES256'))
+
+        key_ring._loaded_at -= jwt_keys.UNKNOWN_KID_RELOAD_INTERVAL
+        assert key_ring.verification_key('2024c') is not None
+        # made up kids do not reload again within the interval
+        with mock.patch.object(key_ring, 'load') as load:
+            with pytest.raises(JWTError):
+                key_ring.verification_key('unknown')
+            load.assert_not_called()
+
+    def test_refresh_after_interval(self, keys_dir, tmp_path):
+        """Test the keys are reloaded once they are older than the interval"""
+        key_ring = KeyRing('ES256', keys_dir=keys_dir, reload_interval=60)
+        (tmp_path / '2024c.pem').write_bytes(generate_private_key('ES256'))
+
+        assert not key_ring.refresh()
+        key_ring._loaded_at -= 61
+        assert key_ring.refresh()
+        assert key_ring.kid == '2024c'
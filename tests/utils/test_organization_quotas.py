@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test organization request quotas
+"""
+import pytest
+from unittest import mock
+from contextlib import contextmanager
+from fastapi import HTTPException
+
+from api.utils import check_rate_limit
+from api.utils.check_rate_limit import check_organization_quota_sync
+from api.utils.organization_quotas import OrganizationQuotas
+
+
+@pytest.fixture
+def repository():
+    """Patches the quota query with members of three organizations"""
+    rows = {
+        'user1': mock.Mock(organization_id='org_1', requests_per_minute=100),
+        'user2': mock.Mock(organization_id='org_2', requests_per_minute=None),
+        'user3': mock.Mock(organization_id='org_3', requests_per_minute=0),
+    }
+    with mock.patch('api.utils.organization_quotas.organization_repository') \
+            as organization_repository:
+        organization_repository.get_member_quota = mock.AsyncMock(
+            side_effect=lambda db, user_id: rows.get(user_id)
+        )
+        yield organization_repository
+
+
+@pytest.fixture
+def script():
+    """Patches the quota script and its redis connection"""
+    @contextmanager
+    def get_redis_sync():
+        yield mock.Mock()
+
+    with mock.patch.object(check_rate_limit, 'get_redis_sync', get_redis_sync), \
+         mock.patch.object(check_rate_limit, 'CHARGE_ORGANIZATION') as charge:
+        charge.return_value = None
+        yield charge
+
+
+class TestOrganizationQuotas:
+    """
+    Test class for OrganizationQuotas and check_organization_quota_sync
+    """
+    @pytest.mark.asyncio
+    async def test_quota_for(self, repository):
+        """Test members get their organization's quota or the default"""
+        quotas = OrganizationQuotas(default_limit=600, max_size=10, ttl=60)
+
+        assert await quotas.quota_for('user1', mock.Mock()) == ('org_1', 100)
+        assert await quotas.quota_for('user2', mock.Mock()) == ('org_2', 600)
+        assert await quotas.quota_for('user3', mock.Mock()) is None
+        assert await quotas.quota_for('user4', mock.Mock()) is None
+
+    @pytest.mark.asyncio
+    async def test_quota_is_cached(self, repository):
+        """Test a user's quota is only queried once per ttl"""
+        quotas = OrganizationQuotas(default_limit=600, max_size=10, ttl=60)
+
+        await quotas.quota_for('user1', mock.Mock())
+        await quotas.quota_for('user4', mock.Mock())
+        assert await quotas.quota_for('user1', mock.Mock()) == ('org_1', 100)
+        assert await quotas.quota_for('user4', mock.Mock()) is None
+
+        assert repository.get_member_quota.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_lookup_error_is_not_cached(self, repository):
+        """Test a failed lookup lets the request through and is retried"""
+        quotas = OrganizationQuotas(default_limit=600, max_size=10, ttl=60)
+        repository.get_member_quota.side_effect = RuntimeError('down')
+
+        assert await quotas.quota_for('user1', mock.Mock()) is None
+        assert await quotas.quota_for('user1', mock.Mock()) is None
+        assert repository.get_member_quota.await_count == 2
+
+    def test_member_is_counted(self, script):
+        """Test a member's request is counted against its organization"""
+        check_organization_quota_sync(('org_1', 100))
+
+        assert script.call_args.kwargs['keys'] == ['organization:org_1:requests']
+        assert script.call_args.kwargs['args'] == [100, 60]
+
+    def test_no_quota_is_not_counted(self, script):
+        """Test requests without a quota never reach redis"""
+        check_organization_quota_sync(None)
+
+        script.assert_not_called()
+
+    def test_organization_quota_exceeded(self, script):
+        """Test an exhausted organization quota is rejected"""
+        script.return_value = 42
+
+        with pytest.raises(HTTPException) as exc_info:
+            check_organization_quota_sync(('org_1', 100))
+
+        assert exc_info.value.status_code == 429
+        assert '42 seconds' in exc_info.value.detail
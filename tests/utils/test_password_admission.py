@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test password admission module
+"""
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+
+from api.utils.password_admission import PasswordAdmission, get_client_key
+
+
+class TestPasswordAdmission:
+    """
+    Test class for PasswordAdmission
+    """
+    def test_client_key_groups_prefixes(self):
+        """Test clients are grouped by network prefix"""
+        assert get_client_key('10.0.0.1') == get_client_key('10.0.0.200')
+        assert get_client_key('10.0.0.1') != get_client_key('10.0.1.1')
+        assert get_client_key('2001:db8::1') == '2001:db8::/64'
+        assert get_client_key('testclient') == 'testclient'
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full(self):
+        """Test work is rejected once the queue is full"""
+        admission = PasswordAdmission(max_concurrency=1, max_queue_size=1,
+                                      max_queue_per_client=5)
+        release = threading.Event()
+
+        running = asyncio.create_task(admission.run('10.0.0.1', release.wait))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(admission.run('10.0.0.1', lambda: True))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.run('10.0.1.1', lambda: True)
+        assert exc_info.value.status_code == 503
+
+        release.set()
+        assert await running
+        assert await queued
+
+    @pytest.mark.asyncio
+    async def test_round_robin_across_clients(self):
+        """Test queued work alternates between client prefixes"""
+        admission = PasswordAdmission(max_concurrency=1, max_queue_size=10,
+                                      max_queue_per_client=5)
+        release = threading.Event()
+        order = []
+
+        running = asyncio.create_task(admission.run('10.0.0.1', release.wait))
+        await asyncio.sleep(0.05)
+        tasks = [
+            asyncio.create_task(admission.run(ip, order.append, name))
+            for ip, name in [('10.0.0.1', 'a1'), ('10.0.0.1', 'a2'),
+                             ('10.0.0.1', 'a3'), ('10.0.1.1', 'b1')]
+        ]
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(running, *tasks)
+
+        assert order == ['a1', 'b1', 'a2', 'a3']
+
+    @pytest.mark.asyncio
+    async def test_rejects_prefix_over_its_share(self):
+        """Test one prefix cannot fill the queue for everyone else"""
+        admission = PasswordAdmission(max_concurrency=1, max_queue_size=10,
+                                      max_queue_per_client=2)
+        release = threading.Event()
+
+        running = asyncio.create_task(admission.run('10.0.0.1', release.wait))
+        await asyncio.sleep(0.05)
+        queued = [
+            asyncio.create_task(admission.run('10.0.0.1', lambda: True))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.run('10.0.0.2', lambda: True)
+        assert exc_info.value.status_code == 429
+        other = asyncio.create_task(admission.run('10.0.1.1', lambda: True))
+        await asyncio.sleep(0)
+
+        release.set()
+        assert await running
+        assert all(await asyncio.gather(*queued, other))
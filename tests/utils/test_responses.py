@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test JSON response module
+"""
+import json
+from datetime import datetime, timezone
+
+from api.utils.responses import ORJSONResponse, model_response
+from api.v1.schemas.user import (UserBase, UserListItem, UsersPageData,
+                                 UsersPageResponse, LoginUserData,
+                                 LoginUserResponse)
+
+
+def login_response() -> LoginUserResponse:
+    """Builds a login response"""
+    return LoginUserResponse(
+        status_code=200,
+        message='Login Successful',
+        data=LoginUserData(
+            access_token='access-token',
+            refresh_token='refresh-token',
+            user=UserBase(id='1', email='benson@example.org',
+                          username='benson', first_name='Benson',
+                          last_name='Bense')
+        )
+    )
+
+
+class TestResponses:
+    """
+    Test class for the orjson responses
+    """
+    def test_model_matches_response_model_output(self):
+        """Test a model renders to the JSON its response_model would send"""
+        created_at = datetime(2024, 9, 10, 20, 25, 22, 804186, tzinfo=timezone.utc)
+        page = UsersPageResponse(
+            status_code=200,
+            message='Successful',
+            data=UsersPageData(users=[UserListItem(
+                id='1', email='benson@example.org', username='benson',
+                first_name='Benson', last_name='Bense', is_active=True,
+                is_blocked=False, created_at=created_at
+            )], next_cursor=None)
+        )
+        for model in (login_response(), page):
+            response = model_response(model)
+
+            assert json.loads(response.body) == model.model_dump(mode='json',
+                                                               by_alias=True)
+            assert response.headers['content-type'] == 'application/json'
+
+    def test_model_response_status_code(self):
+        """Test the status code is set on the response"""
+        response = model_response(login_response(), 201)
+
+        assert response.status_code == 201
+
+    def test_validation_error_content(self):
+        """Test values orjson cannot serialize are converted"""
+        response = ORJSONResponse({
+            'detail': [{'ctx': {'error': ValueError('bad value')}}],
+            'body': b'{"username": 1}'
+        })
+
+        assert json.loads(response.body) == {
+            'detail': [{'ctx': {'error': 'bad value'}}],
+            'body': '{"username": 1}'
+        }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test per-user session registry module
+"""
+import pytest
+from unittest import mock
+from contextlib import contextmanager
+
+from api.utils import invalidation_listener, session_registry, token_revocation
+from api.utils.session_registry import list_sessions, register_session
+from api.utils.token_revocation import revoke_jti
+
+
+class SortedSets:
+    """Keeps the sorted sets and plain keys the session registry uses"""
+    def __init__(self):
+        self.sets = {}
+        self.keys = {}
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.sets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        members = self.sets.get(key, {})
+        for member, score in list(members.items()):
+            if float(low) <= score <= float(high):
+                del members[member]
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        return sorted(
+            (member, score) for member, score in self.sets.get(key, {}).items()
+            if float(low) <= score <= float(high)
+        )
+
+    def set(self, key, value, ex=None):
+        self.keys[key] = value
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self):
+        return Pipeline(self)
+
+
+class Pipeline:
+    """Queues calls and runs them on execute"""
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(
+            (getattr(self.redis, name), args, kwargs)
+        )
+
+    def execute(self):
+        return [call(*args, **kwargs) for call, args, kwargs in self.calls]
+
+
+@pytest.fixture
+def redis():
+    """Patches redis with an in-memory store"""
+    store = SortedSets()
+
+    @contextmanager
+    def get_redis_sync():
+        yield store
+
+    with mock.patch.object(session_registry, 'get_redis_sync', get_redis_sync), \
+         mock.patch.object(token_revocation, 'get_redis_sync', get_redis_sync), \
+         mock.patch.object(token_revocation, 'publish_revocation'):
+        yield store
+
+
+class TestSessionRegistry:
+    """
+    Test class for the session registry
+    """
+    def test_revoked_token_leaves_sessions(self, redis):
+        """Test a logged out token is no longer listed as a session"""
+        register_session('123', 'jti-1', 'access', 60)
+        register_session('123', 'jti-2', 'refresh', 60)
+
+        revoke_jti('jti-1', 'access', user_id='123')
+
+        assert [(session['jti'], session['token_type'])
+                for session in list_sessions('123')] == [('jti-2', 'refresh')]
+
+    def test_rotated_token_leaves_sessions(self, redis):
+        """Test rotating a refresh token removes it from the sessions"""
+        redis.eval = mock.Mock(return_value=1)
+
+        assert token_revocation.rotate_refresh_jti('jti-2', 0, '123')
+
+        _, numkeys, *arguments = redis.eval.call_args.args
+        assert arguments[numkeys - 1] == 'sessions:123'
+        assert arguments[-1] == 'jti-2:refresh'
+
+    def test_reset_drops_generations(self, redis):
+        """Test a listener reset rereads every cached session generation"""
+        redis.keys['session_gen:123'] = '1'
+        redis.get = redis.keys.get
+        cache = session_registry.generation_cache
+        cache.invalidate('123')
+        assert cache.get('123') == 1
+
+        redis.keys['session_gen:123'] = '2'
+        invalidation_listener.reset()
+
+        assert cache.get('123') == 2
+        cache.invalidate('123')
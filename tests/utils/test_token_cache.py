@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test verified token cache module
+"""
+import time
+
+from api.utils.token_cache import VerifiedTokenCache
+
+
+class TestVerifiedTokenCache:
+    """
+    Test class for VerifiedTokenCache
+    """
+    def test_returns_cached_claims(self):
+        """Test claims are returned for a cached token"""
+        cache = VerifiedTokenCache(max_size=10, ttl=30)
+        claims = {'jti': 'jti-1', 'exp': time.time() + 60}
+
+        cache.set('token-1', claims)
+
+        assert cache.get('token-1') == claims
+        assert cache.get('token-2') is None
+
+    def test_expires_at_token_exp(self):
+        """Test entries expire with the token even if the ttl is longer"""
+        cache = VerifiedTokenCache(max_size=10, ttl=30)
+
+        cache.set('token-1', {'jti': 'jti-1', 'exp': time.time() - 1})
+
+        assert cache.get('token-1') is None
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache stays bounded"""
+        cache = VerifiedTokenCache(max_size=2, ttl=30)
+        cache.set('token-1', {'jti': 'jti-1'})
+        cache.set('token-2', {'jti': 'jti-2'})
+        cache.get('token-1')
+
+        cache.set('token-3', {'jti': 'jti-3'})
+
+        assert cache.get('token-1') is not None
+        assert cache.get('token-2') is None
+        assert cache.get('token-3') is not None
+
+    def test_invalidate_jti(self):
+        """Test revoking a jti drops its token"""
+        cache = VerifiedTokenCache(max_size=10, ttl=30)
+        cache.set('token-1', {'jti': 'jti-1'})
+
+        cache.invalidate_jti('jti-1')
+
+        assert cache.get('token-1') is None
+
+    def test_revoked_while_checking(self):
+        """Test a token checked before a revocation arrived is not cached"""
+        cache = VerifiedTokenCache(max_size=10, ttl=30)
+        generation = cache.generation
+
+        cache.invalidate_jti('jti-1')
+        cache.set('token-1', {'jti': 'jti-1'}, generation)
+
+        assert cache.get('token-1') is None
+
+        cache.set('token-1', {'jti': 'jti-1'}, cache.generation)
+
+        assert cache.get('token-1') is not None
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test token claims module
+"""
+from datetime import datetime, timedelta, timezone
+
+from api.utils.token_claims import build_claims, expand_claims, binding_error
+
+
+class TestTokenClaims:
+    """
+    Test class for token claims
+    """
+    def build(self):
+        """Builds version 2 claims"""
+        now = datetime.now(timezone.utc)
+        return build_claims(
+            user_id='123', token_type='access', jti='jti-1',
+            issued_at=now, expires_at=now + timedelta(minutes=10),
+            ip='10.0.0.1', user_agent='pytest', generation=0
+        )
+
+    def test_compact_claims(self):
+        """Test version 2 claims use short names and no raw binding data"""
+        claims = self.build()
+
+        assert claims['v'] == 2
+        assert claims['typ'] == 'a'
+        assert isinstance(claims['exp'], int)
+        assert 'ip' not in claims and 'user_agent' not in claims
+
+    def test_expand_claims(self):
+        """Test version 2 claims expand to the version 1 names"""
+        claims = expand_claims(self.build())
+
+        assert claims['user_id'] == '123'
+        assert claims['token_type'] == 'access'
+
+    def test_version_one_claims_unchanged(self):
+        """Test version 1 claims pass through expansion"""
+        claims = {'user_id': '123', 'token_type': 'refresh',
+                  'ip': '10.0.0.1', 'user_agent': 'pytest'}
+
+        assert expand_claims(claims) == claims
+        assert binding_error(claims, '10.0.0.1', 'pytest') is None
+        assert binding_error(claims, '10.0.0.2', 'pytest') == 'IP address mismatch'
+
+    def test_fingerprint_binding(self):
+        """Test version 2 tokens only match the client they were issued to"""
+        claims = expand_claims(self.build())
+
+        assert binding_error(claims, '10.0.0.1', 'pytest') is None
+        assert binding_error(claims, '10.0.0.2', 'pytest') is not None
+        assert binding_error(claims, '10.0.0.1', 'curl') is not None
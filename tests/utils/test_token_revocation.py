@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test revoked jti filter module
+"""
+from unittest import mock
+from contextlib import contextmanager
+
+from api.utils import token_revocation
+from api.utils.token_revocation import RevokedJtiFilter
+
+
+def patch_redis(revoked, during_read=None):
+    """Patches redis to return revoked jtis, calling during_read first"""
+    pipe = mock.Mock()
+
+    def execute():
+        if during_read:
+            during_read()
+        return [0, revoked]
+
+    pipe.execute.side_effect = execute
+
+    @contextmanager
+    def get_redis_sync():
+        yield mock.Mock(pipeline=mock.Mock(return_value=pipe))
+
+    return mock.patch.object(token_revocation, 'get_redis_sync', get_redis_sync)
+
+
+class TestRevokedJtiFilter:
+    """
+    Test class for RevokedJtiFilter
+    """
+    def test_unbuilt_filter_reports_every_jti(self):
+        """Test every jti may be revoked until the filter is built"""
+        jti_filter = RevokedJtiFilter(capacity=100, sync_interval=60)
+
+        assert jti_filter.might_be_revoked('jti-1')
+
+        with patch_redis(['jti-1']):
+            assert jti_filter.sync()
+
+        assert jti_filter.might_be_revoked('jti-1')
+        assert not jti_filter.might_be_revoked('jti-2')
+
+    def test_add_during_rebuild_is_kept(self):
+        """Test a jti revoked while redis is read ends up in the new filter"""
+        jti_filter = RevokedJtiFilter(capacity=100, sync_interval=60)
+
+        with patch_redis([], during_read=lambda: jti_filter.add('jti-1')):
+            assert jti_filter.sync()
+
+        assert jti_filter.might_be_revoked('jti-1')
+
+    def test_reset_during_rebuild(self):
+        """Test a rebuild that started before a reset is discarded"""
+        jti_filter = RevokedJtiFilter(capacity=100, sync_interval=60)
+
+        with patch_redis([], during_read=jti_filter.reset):
+            assert not jti_filter.sync()
+
+        assert jti_filter.might_be_revoked('jti-2')
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test cached user lookup module
+"""
+import pytest
+from unittest import mock
+from contextlib import contextmanager
+
+from api.utils.user_cache import UserCache, user_cache_key
+from api.v1.schemas.user import CurrentUser
+
+
+class FakeRedis:
+    """Keeps redis strings in a dict"""
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        return []
+
+
+@pytest.fixture
+def fake_redis():
+    """Patches the user cache's redis connection"""
+    redis = FakeRedis()
+
+    @contextmanager
+    def get_redis_sync():
+        yield redis
+
+    with mock.patch('api.utils.user_cache.get_redis_sync', get_redis_sync):
+        yield redis
+
+
+def make_user(user_id='123', is_blocked=False):
+    """Builds a cached user"""
+    return CurrentUser(id=user_id, username='johnson', first_name='Johnson',
+                       last_name='Doe', is_active=True, is_blocked=is_blocked)
+
+
+class TestUserCache:
+    """
+    Test class for UserCache
+    """
+    def test_reads_through_redis(self, fake_redis):
+        """Test a user cached by another process is read from redis"""
+        UserCache(max_size=10, ttl=30, redis_ttl=300).set(make_user())
+
+        user = UserCache(max_size=10, ttl=30, redis_ttl=300).get('123')
+
+        assert user == make_user()
+
+    def test_local_hit_skips_redis(self, fake_redis):
+        """Test a cached user is returned without redis"""
+        cache = UserCache(max_size=10, ttl=30, redis_ttl=300)
+        cache.set(make_user())
+        fake_redis.values.clear()
+
+        assert cache.get('123') == make_user()
+
+    def test_invalidate_blocks_stale_writes(self, fake_redis):
+        """Test a user read before a change is not cached after it"""
+        cache = UserCache(max_size=10, ttl=30, redis_ttl=300)
+        stale_user = make_user()
+
+        cache.invalidate('123')
+        cache.set(stale_user)
+
+        assert cache.get('123') is None
+        assert fake_redis.values[user_cache_key('123')] == ''
+        assert fake_redis.published == [('user_cache_invalidations', '123')]
+
+    def test_evicts_least_recently_used(self, fake_redis):
+        """Test the in-process cache stays bounded"""
+        cache = UserCache(max_size=1, ttl=30, redis_ttl=300)
+        cache.set(make_user('1'))
+        cache.set(make_user('2'))
+        fake_redis.values.clear()
+
+        assert cache.get('1') is None
+        assert cache.get('2') == make_user('2')
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test username matcher module
+"""
+import pytest
+
+from api.utils.settings import settings
+from api.utils.username_matcher import (OFFENSIVE, RESERVED, build_matcher,
+                                        normalize_username, read_terms)
+
+
+@pytest.fixture
+def matcher():
+    """A matcher with overlapping terms"""
+    yield build_matcher(['he', 'she', 'hers', 'pu55y', 'ＢＡＤ'],
+                        ['admin', 'root'])
+
+
+def search(matcher, username: str) -> int:
+    """Searches a normalized username"""
+    return matcher.search(normalize_username(username))
+
+
+class TestUsernameMatcher:
+    """
+    Test class for the username matcher
+    """
+    def test_offensive_terms_anywhere(self, matcher):
+        """Test terms are found at any position, overlapping or not"""
+        assert search(matcher, 'ushers') == OFFENSIVE
+        assert search(matcher, 'xxpu55yxx') == OFFENSIVE
+        assert search(matcher, 'clean') == 0
+
+    def test_normalized_like_usernames(self, matcher):
+        """Test terms and usernames are NFKC normalized and lower-cased"""
+        assert search(matcher, 'NotBad') == OFFENSIVE
+        assert search(matcher, 'ＡＤＭＩＮ') == RESERVED
+
+    def test_reserved_only_as_whole_username(self, matcher):
+        """Test reserved usernames must match the whole username"""
+        assert search(matcher, 'root') == RESERVED
+        assert search(matcher, 'admins') == 0
+        assert search(matcher, 'theadmin') == OFFENSIVE
+
+    def test_empty_lists(self):
+        """Test nothing matches without terms"""
+        assert build_matcher([], ['']).search('admin') == 0
+
+    def test_read_terms(self, monkeypatch, tmp_path):
+        """Test default lists are found from any directory, missing ones fail"""
+        monkeypatch.chdir(tmp_path)
+
+        assert read_terms(settings.RESERVED_USERNAMES_PATH)
+        with pytest.raises(OSError):
+            read_terms('reserved_usernames.txt')